@@ -0,0 +1,579 @@
+"""YaYaRename 的对话框与预览表格
+
+主窗口只在打开对话框时才导入本模块，启动时不创建这些窗口类。
+"""
+import os
+import time
+from array import array
+
+from PyQt5.QtWidgets import (QPushButton, QLineEdit, QVBoxLayout, QHBoxLayout, QLabel,
+                             QDialog, QGroupBox, QFormLayout, QDialogButtonBox, QCheckBox,
+                             QTableWidget, QTableWidgetItem, QHeaderView, QAbstractItemView,
+                             QTableView)
+from PyQt5.QtCore import Qt, QTimer, QAbstractTableModel, QModelIndex
+
+from yaya import engine
+from yaya.plan import RenamePlan
+
+
+# 规划进行中刷新预览表格的间隔（毫秒），与主窗口取走日志的间隔相同
+REFRESH_INTERVAL = 100
+
+
+class TagConfigDialog(QDialog):
+    """标签配置对话框"""
+
+    def __init__(self, parent=None, current_mappings=None):
+        super().__init__(parent)
+        self.current_mappings = current_mappings or {}
+        self.initUI()
+
+    def initUI(self):
+        self.setWindowTitle('标签配置')
+        layout = QVBoxLayout(self)
+
+        # 文件类型映射配置
+        group_box = QGroupBox("文件类型映射配置")
+        self.form_layout = QFormLayout()
+        group_box.setLayout(self.form_layout)
+        layout.addWidget(group_box)
+
+        # 显示现有映射
+        self.ext_inputs = {}
+        for tag, ext in self.current_mappings.items():
+            self.add_mapping_row(tag, ext)
+
+        # 添加新映射的输入区域
+        add_layout = QHBoxLayout()
+        self.new_tag_input = QLineEdit()
+        self.new_tag_input.setPlaceholderText('新标签')
+        self.new_ext_input = QLineEdit()
+        self.new_ext_input.setPlaceholderText('新文件类型 (如 .skp)')
+        add_layout.addWidget(self.new_tag_input)
+        add_layout.addWidget(self.new_ext_input)
+
+        add_btn = QPushButton('添加映射')
+        add_btn.clicked.connect(self.add_new_mapping)
+        add_layout.addWidget(add_btn)
+
+        layout.addLayout(add_layout)
+
+        # 添加确定和取消按钮
+        buttons = QDialogButtonBox(
+            QDialogButtonBox.Ok | QDialogButtonBox.Cancel,
+            Qt.Horizontal, self)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+    def add_mapping_row(self, tag, ext):
+        """添加一行映射配置"""
+        row_layout = QHBoxLayout()
+        tag_input = QLineEdit(tag)
+        ext_input = QLineEdit(ext)
+        self.ext_inputs[tag] = ext_input
+
+        row_layout.addWidget(tag_input)
+        row_layout.addWidget(ext_input)
+
+        delete_btn = QPushButton('删除')
+        delete_btn.clicked.connect(lambda: self.delete_mapping(tag, row_layout))
+        row_layout.addWidget(delete_btn)
+
+        self.form_layout.addRow(row_layout)
+
+    def delete_mapping(self, tag, row_layout):
+        """删除一行映射配置"""
+        # 删除UI元素
+        while row_layout.count():
+            item = row_layout.takeAt(0)
+            widget = item.widget()
+            if widget:
+                widget.deleteLater()
+        # 从字典中删除
+        if tag in self.ext_inputs:
+            del self.ext_inputs[tag]
+
+    def add_new_mapping(self):
+        """添加新的映射"""
+        tag = self.new_tag_input.text().strip()
+        ext = self.new_ext_input.text().strip()
+
+        if not tag or not ext:
+            return
+
+        if not ext.startswith('.'):
+            ext = '.' + ext
+
+        self.add_mapping_row(tag, ext)
+
+        # 清空输入框
+        self.new_tag_input.clear()
+        self.new_ext_input.clear()
+
+    def get_mappings(self):
+        """获取当前配置的映射关系"""
+        mappings = {}
+        for i in range(self.form_layout.rowCount()):
+            row_layout = self.form_layout.itemAt(i, QFormLayout.FieldRole)
+            if row_layout:
+                tag_input = row_layout.itemAt(0).widget()
+                ext_input = row_layout.itemAt(1).widget()
+                if tag_input and ext_input:
+                    tag = tag_input.text().strip()
+                    ext = ext_input.text().strip()
+                    if tag and ext:
+                        mappings[tag] = ext
+        return mappings
+
+
+class PrefixSuffixConfigDialog(QDialog):
+    """前缀后缀配置对话框"""
+
+    def __init__(self, parent=None, is_prefix=True):
+        super().__init__(parent)
+        self.is_prefix = is_prefix
+        self.initUI()
+
+    def initUI(self):
+        self.setWindowTitle('前缀配置' if self.is_prefix else '后缀配置')
+        layout = QVBoxLayout(self)
+
+        # 常用配置组
+        group_box = QGroupBox("常用配置")
+        self.form_layout = QFormLayout()
+        group_box.setLayout(self.form_layout)
+        layout.addWidget(group_box)
+
+        # 添加常用配置
+        self.add_common_items()
+
+        # 添加新配置的输入区域
+        add_layout = QHBoxLayout()
+        self.new_text_input = QLineEdit()
+        self.new_text_input.setPlaceholderText('新配置项')
+        add_layout.addWidget(self.new_text_input)
+
+        add_btn = QPushButton('添加配置')
+        add_btn.clicked.connect(self.add_new_item)
+        add_layout.addWidget(add_btn)
+
+        layout.addLayout(add_layout)
+
+        # 添加确定和取消按钮
+        buttons = QDialogButtonBox(
+            QDialogButtonBox.Ok | QDialogButtonBox.Cancel,
+            Qt.Horizontal, self)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+    def add_common_items(self):
+        """添加常用配置项"""
+        from datetime import datetime
+
+        # 常用配置项
+        common_items = []
+        if self.is_prefix:
+            common_items = [
+                ("日期", datetime.now().strftime("%Y%m%d")),
+                ("时间", datetime.now().strftime("%H%M%S")),
+                ("日期时间", datetime.now().strftime("%Y%m%d_%H%M%S")),
+                ("版本", "V1.0"),
+                ("草稿", "Draft"),
+                ("最终", "Final")
+            ]
+        else:
+            common_items = [
+                ("修改日期", datetime.now().strftime("%Y%m%d")),
+                ("版本号", "v1.0"),
+                ("状态", "完成"),
+                ("审核", "待审核"),
+                ("备份", "backup")
+            ]
+
+        for label, text in common_items:
+            self.add_config_row(label, text)
+
+    def add_config_row(self, label, text):
+        """添加一行配置"""
+        row_layout = QHBoxLayout()
+
+        label_input = QLineEdit(label)
+        text_input = QLineEdit(text)
+        row_layout.addWidget(label_input)
+        row_layout.addWidget(text_input)
+
+        # 使用按钮
+        use_btn = QPushButton('使用')
+        use_btn.clicked.connect(lambda: self.use_config(text))
+        row_layout.addWidget(use_btn)
+
+        # 删除按钮
+        delete_btn = QPushButton('删除')
+        delete_btn.clicked.connect(lambda: self.delete_config(row_layout))
+        row_layout.addWidget(delete_btn)
+
+        self.form_layout.addRow(row_layout)
+
+    def add_new_item(self):
+        """添加新配置项"""
+        text = self.new_text_input.text().strip()
+        if text:
+            self.add_config_row(f"自定义{self.form_layout.rowCount() + 1}", text)
+            self.new_text_input.clear()
+
+    def delete_config(self, row_layout):
+        """删除配置项"""
+        while row_layout.count():
+            item = row_layout.takeAt(0)
+            widget = item.widget()
+            if widget:
+                widget.deleteLater()
+
+    def use_config(self, text):
+        """使用选中的配置"""
+        self.parent().prefix_input.setText(text) if self.is_prefix else self.parent().suffix_input.setText(text)
+        self.accept()
+
+
+class MemberSearchDialog(QDialog):
+    """在成员索引中查找包含指定文件的压缩包"""
+
+    def __init__(self, index, directory='', parent=None):
+        super().__init__(parent)
+        self.index = index
+        self.directory = directory
+        self.initUI()
+
+    def initUI(self):
+        self.setWindowTitle('查找压缩包成员')
+        self.resize(800, 500)
+        layout = QVBoxLayout(self)
+
+        query_layout = QHBoxLayout()
+        self.pattern_input = QLineEdit()
+        self.pattern_input.setPlaceholderText('成员名中的文字，或通配符如 *一层*.dwg')
+        self.pattern_input.returnPressed.connect(self.search)
+        query_layout.addWidget(self.pattern_input, 1)
+        self.ext_input = QLineEdit()
+        self.ext_input.setPlaceholderText('扩展名 (如 .dwg)')
+        self.ext_input.returnPressed.connect(self.search)
+        query_layout.addWidget(self.ext_input)
+        self.under_check = QCheckBox('仅当前文件夹')
+        self.under_check.setEnabled(bool(self.directory))
+        self.under_check.setChecked(bool(self.directory))
+        query_layout.addWidget(self.under_check)
+        search_btn = QPushButton('查找')
+        search_btn.clicked.connect(self.search)
+        query_layout.addWidget(search_btn)
+        layout.addLayout(query_layout)
+
+        self.result_table = QTableWidget(0, 3)
+        self.result_table.setHorizontalHeaderLabels(['压缩包', '成员', '大小'])
+        self.result_table.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+        self.result_table.horizontalHeader().setStretchLastSection(True)
+        self.result_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.result_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        layout.addWidget(self.result_table)
+
+        archives, members = self.index.counts()
+        self.status_label = QLabel(f'索引中共 {archives} 个压缩包、{members} 个成员')
+        layout.addWidget(self.status_label)
+
+    def search(self):
+        """查询索引并显示结果"""
+        start = time.perf_counter()
+        under = self.directory if self.under_check.isChecked() else None
+        hits = self.index.search(self.pattern_input.text().strip(),
+                                 self.ext_input.text().strip() or None, under)
+        elapsed = (time.perf_counter() - start) * 1000
+
+        self.result_table.setRowCount(len(hits))
+        for row, hit in enumerate(hits):
+            self.result_table.setItem(row, 0, QTableWidgetItem(hit.archive))
+            self.result_table.setItem(row, 1, QTableWidgetItem(hit.name))
+            self.result_table.setItem(row, 2, QTableWidgetItem(str(hit.size)))
+        self.result_table.resizeColumnsToContents()
+        archives = len({hit.archive for hit in hits})
+        self.status_label.setText(
+            f'找到 {len(hits)} 个成员，位于 {archives} 个压缩包（{elapsed:.1f} 毫秒）')
+
+
+class PreviewModel(QAbstractTableModel):
+    """预览表格模型，按下标直接读取 RenamePlan 的各列，不复制条目
+
+    规划进行中由 refresh 定时把新加入的条目一次插入；排序与过滤只重建一个下标数组，
+    表格视图只为可见的行取数据，几十万个文件的预览也不会卡住界面。
+    规划完成前新加入的条目排在末尾，完成后按当前的排序重新排列。
+    """
+
+    HEADERS = ('原文件名', '新文件名', '标签来源', '冲突', '目录')
+    SOURCE_LABELS = {engine.SOURCE_FILENAME: '文件名', engine.SOURCE_CONTENT: '内容'}
+    CONFLICT_COLUMN = 3
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._plan = RenamePlan()
+        # 已显示的条目数（计划在工作线程中继续增长）
+        self._count = 0
+        # 排序或过滤后的条目下标，None 表示按加入顺序显示全部
+        self._order = None
+        self._text = ''
+        self._conflicts_only = False
+        self._sort = None
+        self._resolved = False
+
+    def attach(self, plan):
+        """显示 plan 中的条目"""
+        self.beginResetModel()
+        self._plan = plan
+        self._count = 0
+        self._order = None
+        self._resolved = False
+        self.endResetModel()
+        self.refresh()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return self._count if self._order is None else len(self._order)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.HEADERS[section]
+        return None
+
+    def position(self, row):
+        """第 row 行对应的条目下标"""
+        return row if self._order is None else self._order[row]
+
+    def entry(self, row):
+        return self._plan.entry(self.position(row))
+
+    def conflict(self, i):
+        """第 i 条的冲突说明；规划完成前只知道目标是否已存在"""
+        if self._resolved:
+            return self._plan.conflict(i) or ''
+        return f"目标文件 {self._plan.new(i)} 已存在" if self._plan.exists(i) else ''
+
+    def text(self, i, column):
+        plan = self._plan
+        if column == 0:
+            return plan.old(i)
+        if column == 1:
+            return plan.new(i)
+        if column == 2:
+            return self.SOURCE_LABELS.get(plan.source(i), '')
+        if column == 3:
+            return self.conflict(i)
+        return plan.directory(i)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        i = self.position(index.row())
+        if role == Qt.DisplayRole:
+            return self.text(i, index.column())
+        if role == Qt.ForegroundRole and self.conflict(i):
+            return Qt.red
+        if role == Qt.ToolTipRole and index.column() == 0:
+            return os.path.join(self._plan.directory(i), self._plan.old(i))
+        return None
+
+    def accepts(self, i):
+        """第 i 条是否符合当前的过滤条件"""
+        if self._conflicts_only and not self.conflict(i):
+            return False
+        if self._text:
+            plan = self._plan
+            return self._text in plan.old(i).lower() or self._text in plan.new(i).lower()
+        return True
+
+    def refresh(self):
+        """显示规划中新加入的条目"""
+        count = len(self._plan)
+        if count <= self._count:
+            return
+        start = self._count
+        if self._order is None:
+            self.beginInsertRows(QModelIndex(), start, count - 1)
+            self._count = count
+            self.endInsertRows()
+            return
+        self._count = count
+        added = [i for i in range(start, count) if self.accepts(i)]
+        if added:
+            self.beginInsertRows(QModelIndex(), len(self._order),
+                                 len(self._order) + len(added) - 1)
+            self._order.extend(added)
+            self.endInsertRows()
+
+    def finish(self):
+        """规划完成（冲突已检查）后刷新冲突列，并按当前的排序与过滤重新排列"""
+        self.refresh()
+        self._resolved = True
+        if self._order is not None:
+            self.rebuild()
+        elif self._count:
+            self.dataChanged.emit(self.index(0, self.CONFLICT_COLUMN),
+                                  self.index(self._count - 1, self.CONFLICT_COLUMN))
+
+    def set_filter(self, text, conflicts_only=False):
+        """只显示原文件名或新文件名包含 text（不区分大小写）的条目"""
+        self._text = text.lower()
+        self._conflicts_only = conflicts_only
+        self.rebuild()
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self._sort = (column, order) if column >= 0 else None
+        self.rebuild()
+
+    def rebuild(self):
+        """按排序与过滤条件重建下标数组"""
+        self.beginResetModel()
+        plan = self._plan
+        count = self._count
+        rows = range(count)
+        if self._conflicts_only:
+            rows = [i for i in rows if self.conflict(i)]
+        if self._text:
+            # 文件名整列一次读出，比逐行读取快
+            text = self._text
+            olds = plan.names(0, count)
+            news = plan.names(0, count, new=True)
+            rows = [i for i in rows if text in olds[i].lower() or text in news[i].lower()]
+        if self._sort is not None:
+            column, order = self._sort
+            if column in (0, 1):
+                keys = [key.lower() for key in plan.names(0, count, new=column == 1)]
+            else:
+                keys = [self.text(i, column).lower() for i in range(count)]
+            rows = sorted(rows, key=keys.__getitem__, reverse=order == Qt.DescendingOrder)
+        if isinstance(rows, range):
+            self._order = None
+        else:
+            self._order = array('l', rows)
+        self.endResetModel()
+
+    def entries(self, rows):
+        """第 rows 行对应的条目"""
+        return [self.entry(row) for row in rows]
+
+    def counts(self):
+        """(已显示的条目数, 其中有冲突的条目数)"""
+        conflicts = sum(1 for i in range(self._count) if self.conflict(i))
+        return self._count, conflicts
+
+
+class PreviewDialog(QDialog):
+    """预览结果：边扫描边列出计划中的重命名，确认后执行全部或所选的条目"""
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.plan = None
+        self.initUI()
+
+        # 规划进行中定时显示新加入的条目
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(REFRESH_INTERVAL)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.refresh_timer.start()
+
+    def initUI(self):
+        self.setWindowTitle('预览重命名')
+        self.resize(900, 600)
+        layout = QVBoxLayout(self)
+
+        filter_layout = QHBoxLayout()
+        self.filter_input = QLineEdit()
+        self.filter_input.setPlaceholderText('按原文件名或新文件名过滤')
+        self.filter_input.returnPressed.connect(self.apply_filter)
+        filter_layout.addWidget(self.filter_input, 1)
+        self.conflicts_check = QCheckBox('仅显示冲突')
+        self.conflicts_check.toggled.connect(self.apply_filter)
+        filter_layout.addWidget(self.conflicts_check)
+        filter_btn = QPushButton('过滤')
+        filter_btn.clicked.connect(self.apply_filter)
+        filter_layout.addWidget(filter_btn)
+        layout.addLayout(filter_layout)
+
+        self.model = PreviewModel(self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        # 固定行高，视图不必逐行计算高度
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.table.verticalHeader().hide()
+        header = self.table.horizontalHeader()
+        header.setSectionResizeMode(QHeaderView.Interactive)
+        header.setStretchLastSection(True)
+        for column, width in enumerate((240, 260, 70, 180)):
+            header.resizeSection(column, width)
+        # 初始按加入顺序显示，点击表头时才排序
+        header.setSortIndicator(-1, Qt.AscendingOrder)
+        self.table.setSortingEnabled(True)
+        layout.addWidget(self.table)
+
+        bottom_layout = QHBoxLayout()
+        self.status_label = QLabel('正在扫描...')
+        bottom_layout.addWidget(self.status_label, 1)
+        self.apply_all_btn = QPushButton('执行全部')
+        self.apply_all_btn.clicked.connect(self.apply_all)
+        bottom_layout.addWidget(self.apply_all_btn)
+        self.apply_selected_btn = QPushButton('执行所选')
+        self.apply_selected_btn.clicked.connect(self.apply_selected)
+        bottom_layout.addWidget(self.apply_selected_btn)
+        close_btn = QPushButton('关闭')
+        close_btn.clicked.connect(self.reject)
+        bottom_layout.addWidget(close_btn)
+        layout.addLayout(bottom_layout)
+        self.set_ready(False)
+
+    def set_ready(self, ready):
+        """规划完成（冲突检查完毕）后才允许执行"""
+        self.apply_all_btn.setEnabled(ready)
+        self.apply_selected_btn.setEnabled(ready)
+
+    def attach(self, plan):
+        """显示引擎新建的计划"""
+        self.plan = plan
+        self.model.attach(plan)
+
+    def refresh(self):
+        self.model.refresh()
+        self.status_label.setText(f'正在扫描... 已规划 {self.model.rowCount()} 个文件')
+
+    def finish(self, cancelled=False):
+        """规划结束后刷新冲突并显示统计"""
+        self.refresh_timer.stop()
+        self.model.finish()
+        total, conflicts = self.model.counts()
+        text = (f'共 {total} 个文件，{total - conflicts} 个将被重命名，'
+                f'{conflicts} 个有冲突（执行时跳过）')
+        if cancelled:
+            text = '已取消，仅列出取消前规划的文件。' + text
+        self.status_label.setText(text)
+        self.set_ready(self.plan is not None and total > conflicts)
+
+    def apply_filter(self):
+        self.model.set_filter(self.filter_input.text().strip(), self.conflicts_check.isChecked())
+
+    def apply_all(self):
+        self.parent().apply_preview(self.plan)
+        self.accept()
+
+    def apply_selected(self):
+        rows = []
+        for selection in self.table.selectionModel().selection():
+            rows.extend(range(selection.top(), selection.bottom() + 1))
+        if not rows:
+            self.status_label.setText('请先选择要执行的行')
+            return
+        self.parent().apply_preview(self.plan, self.model.entries(rows))
+        self.accept()
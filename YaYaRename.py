@@ -1,315 +1,184 @@
-import sys
 import os
+import sys
+import threading
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QPushButton, QFileDialog,
                              QLineEdit, QVBoxLayout, QHBoxLayout, QWidget, QProgressBar,
-                             QTextEdit, QLabel, QSpinBox, QDialog, QGroupBox, QFormLayout,
-                             QDialogButtonBox, QComboBox)
-from PyQt5.QtCore import QThread, pyqtSignal, QThreadPool, QRunnable, QObject, Qt
-import re
-import zipfile
-import rarfile
-import py7zr
-from concurrent.futures import ThreadPoolExecutor, as_completed
+                             QLabel, QSpinBox, QDialog, QGroupBox, QComboBox, QCheckBox,
+                             QListView)
+from PyQt5.QtCore import (QThread, pyqtSignal, QThreadPool, QRunnable, QObject, Qt, QTimer,
+                          QAbstractListModel, QModelIndex, QSortFilterProxyModel)
+
+from yaya import engine
+from yaya.checkpoint import default_checkpoint_dir
+from yaya.control import RunControl
+from yaya.journal import default_journal_dir
+from yaya.nested import NestedOptions
+from yaya.template import DEFAULT_TEMPLATE, RenameTemplate, TemplateError
+
+
+# 界面从事件缓冲取走日志与进度的间隔（毫秒）
+FLUSH_INTERVAL = 100
+
+# 日志最多保留的行数，超出后丢弃最早的记录
+LOG_CAPACITY = 100000
 
 
 class WorkerSignals(QObject):
     """工作线程信号"""
-    progress = pyqtSignal(int)
-    log = pyqtSignal(str)
     finished = pyqtSignal()
-    file_completed = pyqtSignal(int)  # 新增：单个文件完成信号
+    journal = pyqtSignal(str)  # 本次执行写入的撤销记录
+    plan = pyqtSignal(object)  # 规划开始时的 RenamePlan，预览时边扫描边显示
 
 
-class ArchiveWorker(QRunnable):
-    """单个文件处理工作线程"""
+class EventBuffer:
+    """工作线程写入、界面线程定时取走的日志与进度缓冲
 
-    def __init__(self, file_path, directory, ext_tag_map):
-        super().__init__()
-        self.file_path = file_path
-        self.directory = directory
-        self.ext_tag_map = ext_tag_map
-        self.signals = WorkerSignals()
-
-    def get_tag_from_filename(self, filename):
-        """从文件名中提取标签"""
-        tags = ['3D', 'SU', 'CAD']
-        for tag in tags:
-            if tag in filename:
-                return tag
-        return None
+    每个文件只在锁内追加一条记录，不再跨线程发送信号；
+    界面每 FLUSH_INTERVAL 毫秒合并处理一次，处理量与文件数无关。
+    """
 
-    def get_tag_from_content(self, archive_path):
-        """从压缩包内容判断标签"""
-        file_ext = os.path.splitext(archive_path)[1].lower()
-
-        try:
-            if file_ext == '.zip':
-                with zipfile.ZipFile(archive_path, 'r') as zip_ref:
-                    file_list = zip_ref.namelist()
-            elif file_ext == '.rar':
-                with rarfile.RarFile(archive_path, 'r') as rar_ref:
-                    file_list = rar_ref.namelist()
-            elif file_ext == '.7z':
-                with py7zr.SevenZipFile(archive_path, 'r') as sz_ref:
-                    file_list = sz_ref.getnames()
-            else:
-                return None
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._logs = []
+        self._progress = 0
 
-            for filename in file_list:
-                ext = os.path.splitext(filename)[1].lower()
-                if ext in self.ext_tag_map:
-                    return self.ext_tag_map[ext]
+    def log(self, message):
+        """记录一条日志，可在任意线程调用"""
+        with self._lock:
+            self._logs.append(message)
 
-        except Exception as e:
-            self.signals.log.emit(f"处理文件 {archive_path} 时出错: {str(e)}")
-            return None
+    def progress(self, count=1):
+        """累计已处理的文件数，可在任意线程调用"""
+        with self._lock:
+            self._progress += count
 
-        return None
+    def drain(self):
+        """取走缓冲中的全部内容，返回 (日志列表, 文件数)"""
+        with self._lock:
+            logs, self._logs = self._logs, []
+            progress, self._progress = self._progress, 0
+        return logs, progress
 
-    def run(self):
-        """处理单个文件"""
-        try:
-            filename = os.path.basename(self.file_path)
 
-            # 1. 检查文件名中是否有标签
-            tag = self.get_tag_from_filename(filename)
+class LogModel(QAbstractListModel):
+    """固定容量的环形日志模型
 
-            # 2. 如果文件名中没有标签，检查压缩包内容
-            if not tag:
-                tag = self.get_tag_from_content(self.file_path)
+    列表视图只为可见的行取数据，追加一批日志只触发一次行插入通知；
+    超出容量时从头部移除最早的记录。
+    """
 
-            # 3. 如果找到标签，重命名文件
-            if tag:
-                clean_name = re.sub(r'^(3D|SU|CAD)\s*', '', filename)
-                new_name = f"{tag} {clean_name}"
-                new_path = os.path.join(self.directory, new_name)
+    ErrorRole = Qt.UserRole + 1
 
-                if self.file_path != new_path:
-                    os.rename(self.file_path, new_path)
-                    self.signals.log.emit(f"已重命名: {filename} -> {new_name}")
+    # 含这些词的日志视为错误（包括因冲突跳过的文件）
+    ERROR_WORDS = ('出错', '错误', '失败', '无法', '跳过')
 
-            self.signals.file_completed.emit(1)
+    def __init__(self, capacity=LOG_CAPACITY, parent=None):
+        super().__init__(parent)
+        self.capacity = capacity
+        self._rows = []
+        self._start = 0
+        self._count = 0
 
-        except Exception as e:
-            self.signals.log.emit(f"处理文件 {filename} 时出错: {str(e)}")
-            self.signals.file_completed.emit(1)
+    @classmethod
+    def is_error(cls, message):
+        """是否为错误日志"""
+        return any(word in message for word in cls.ERROR_WORDS)
 
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._count
 
-class TagConfigDialog(QDialog):
-    """标签配置对话框"""
+    def row(self, row):
+        """第 row 行的 (日志, 是否错误)"""
+        return self._rows[(self._start + row) % self.capacity]
 
-    def __init__(self, parent=None, current_mappings=None):
-        super().__init__(parent)
-        self.current_mappings = current_mappings or {}
-        self.initUI()
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        message, error = self.row(index.row())
+        if role == Qt.DisplayRole:
+            return message
+        if role == Qt.ForegroundRole and error:
+            return Qt.red
+        if role == self.ErrorRole:
+            return error
+        return None
 
-    def initUI(self):
-        self.setWindowTitle('标签配置')
-        layout = QVBoxLayout(self)
-
-        # 文件类型映射配置
-        group_box = QGroupBox("文件类型映射配置")
-        self.form_layout = QFormLayout()
-        group_box.setLayout(self.form_layout)
-        layout.addWidget(group_box)
-
-        # 显示现有映射
-        self.ext_inputs = {}
-        for tag, ext in self.current_mappings.items():
-            self.add_mapping_row(tag, ext)
-
-        # 添加新映射的输入区域
-        add_layout = QHBoxLayout()
-        self.new_tag_input = QLineEdit()
-        self.new_tag_input.setPlaceholderText('新标签')
-        self.new_ext_input = QLineEdit()
-        self.new_ext_input.setPlaceholderText('新文件类型 (如 .skp)')
-        add_layout.addWidget(self.new_tag_input)
-        add_layout.addWidget(self.new_ext_input)
-
-        add_btn = QPushButton('添加映射')
-        add_btn.clicked.connect(self.add_new_mapping)
-        add_layout.addWidget(add_btn)
-
-        layout.addLayout(add_layout)
-
-        # 添加确定和取消按钮
-        buttons = QDialogButtonBox(
-            QDialogButtonBox.Ok | QDialogButtonBox.Cancel,
-            Qt.Horizontal, self)
-        buttons.accepted.connect(self.accept)
-        buttons.rejected.connect(self.reject)
-        layout.addWidget(buttons)
-
-    def add_mapping_row(self, tag, ext):
-        """添加一行映射配置"""
-        row_layout = QHBoxLayout()
-        tag_input = QLineEdit(tag)
-        ext_input = QLineEdit(ext)
-        self.ext_inputs[tag] = ext_input
-
-        row_layout.addWidget(tag_input)
-        row_layout.addWidget(ext_input)
-
-        delete_btn = QPushButton('删除')
-        delete_btn.clicked.connect(lambda: self.delete_mapping(tag, row_layout))
-        row_layout.addWidget(delete_btn)
-
-        self.form_layout.addRow(row_layout)
-
-    def delete_mapping(self, tag, row_layout):
-        """删除一行映射配置"""
-        # 删除UI元素
-        while row_layout.count():
-            item = row_layout.takeAt(0)
-            widget = item.widget()
-            if widget:
-                widget.deleteLater()
-        # 从字典中删除
-        if tag in self.ext_inputs:
-            del self.ext_inputs[tag]
-
-    def add_new_mapping(self):
-        """添加新的映射"""
-        tag = self.new_tag_input.text().strip()
-        ext = self.new_ext_input.text().strip()
-
-        if not tag or not ext:
+    def append(self, messages):
+        """追加一批日志"""
+        if not messages:
             return
+        messages = messages[-self.capacity:]
+        overflow = self._count + len(messages) - self.capacity
+        if overflow > 0:
+            self.beginRemoveRows(QModelIndex(), 0, overflow - 1)
+            self._start = (self._start + overflow) % self.capacity
+            self._count -= overflow
+            self.endRemoveRows()
+
+        self.beginInsertRows(QModelIndex(), self._count, self._count + len(messages) - 1)
+        for message in messages:
+            item = (message, self.is_error(message))
+            pos = (self._start + self._count) % self.capacity
+            if pos < len(self._rows):
+                self._rows[pos] = item
+            else:
+                self._rows.append(item)
+            self._count += 1
+        self.endInsertRows()
 
-        if not ext.startswith('.'):
-            ext = '.' + ext
+    def clear(self):
+        """清空日志"""
+        self.beginResetModel()
+        self._rows = []
+        self._start = 0
+        self._count = 0
+        self.endResetModel()
 
-        self.add_mapping_row(tag, ext)
 
-        # 清空输入框
-        self.new_tag_input.clear()
-        self.new_ext_input.clear()
+class ErrorFilterModel(QSortFilterProxyModel):
+    """只保留错误日志的过滤模型"""
 
-    def get_mappings(self):
-        """获取当前配置的映射关系"""
-        mappings = {}
-        for i in range(self.form_layout.rowCount()):
-            row_layout = self.form_layout.itemAt(i, QFormLayout.FieldRole)
-            if row_layout:
-                tag_input = row_layout.itemAt(0).widget()
-                ext_input = row_layout.itemAt(1).widget()
-                if tag_input and ext_input:
-                    tag = tag_input.text().strip()
-                    ext = ext_input.text().strip()
-                    if tag and ext:
-                        mappings[tag] = ext
-        return mappings
+    def filterAcceptsRow(self, source_row, source_parent):
+        return self.sourceModel().row(source_row)[1]
 
 
-class PrefixSuffixConfigDialog(QDialog):
-    """前缀后缀配置对话框"""
+class EngineWorker(QRunnable):
+    """后台运行重命名引擎的工作线程
 
-    def __init__(self, parent=None, is_prefix=True):
-        super().__init__(parent)
-        self.is_prefix = is_prefix
-        self.initUI()
+    目录流式扫描后放入有界队列，由引擎内固定数量的工作线程处理，
+    不再为每个文件创建 QRunnable 与信号对象；日志与进度写入事件缓冲，由界面定时取走。
+    """
 
-    def initUI(self):
-        self.setWindowTitle('前缀配置' if self.is_prefix else '后缀配置')
-        layout = QVBoxLayout(self)
-
-        # 常用配置组
-        group_box = QGroupBox("常用配置")
-        self.form_layout = QFormLayout()
-        group_box.setLayout(self.form_layout)
-        layout.addWidget(group_box)
-
-        # 添加常用配置
-        self.add_common_items()
-
-        # 添加新配置的输入区域
-        add_layout = QHBoxLayout()
-        self.new_text_input = QLineEdit()
-        self.new_text_input.setPlaceholderText('新配置项')
-        add_layout.addWidget(self.new_text_input)
-
-        add_btn = QPushButton('添加配置')
-        add_btn.clicked.connect(self.add_new_item)
-        add_layout.addWidget(add_btn)
-
-        layout.addLayout(add_layout)
-
-        # 添加确定和取消按钮
-        buttons = QDialogButtonBox(
-            QDialogButtonBox.Ok | QDialogButtonBox.Cancel,
-            Qt.Horizontal, self)
-        buttons.accepted.connect(self.accept)
-        buttons.rejected.connect(self.reject)
-        layout.addWidget(buttons)
-
-    def add_common_items(self):
-        """添加常用配置项"""
-        from datetime import datetime
-
-        # 常用配置项
-        common_items = []
-        if self.is_prefix:
-            common_items = [
-                ("日期", datetime.now().strftime("%Y%m%d")),
-                ("时间", datetime.now().strftime("%H%M%S")),
-                ("日期时间", datetime.now().strftime("%Y%m%d_%H%M%S")),
-                ("版本", "V1.0"),
-                ("草稿", "Draft"),
-                ("最终", "Final")
-            ]
-        else:
-            common_items = [
-                ("修改日期", datetime.now().strftime("%Y%m%d")),
-                ("版本号", "v1.0"),
-                ("状态", "完成"),
-                ("审核", "待审核"),
-                ("备份", "backup")
-            ]
-
-        for label, text in common_items:
-            self.add_config_row(label, text)
-
-    def add_config_row(self, label, text):
-        """添加一行配置"""
-        row_layout = QHBoxLayout()
-
-        label_input = QLineEdit(label)
-        text_input = QLineEdit(text)
-        row_layout.addWidget(label_input)
-        row_layout.addWidget(text_input)
-
-        # 使用按钮
-        use_btn = QPushButton('使用')
-        use_btn.clicked.connect(lambda: self.use_config(text))
-        row_layout.addWidget(use_btn)
-
-        # 删除按钮
-        delete_btn = QPushButton('删除')
-        delete_btn.clicked.connect(lambda: self.delete_config(row_layout))
-        row_layout.addWidget(delete_btn)
-
-        self.form_layout.addRow(row_layout)
-
-    def add_new_item(self):
-        """添加新配置项"""
-        text = self.new_text_input.text().strip()
-        if text:
-            self.add_config_row(f"自定义{self.form_layout.rowCount() + 1}", text)
-            self.new_text_input.clear()
-
-    def delete_config(self, row_layout):
-        """删除配置项"""
-        while row_layout.count():
-            item = row_layout.takeAt(0)
-            widget = item.widget()
-            if widget:
-                widget.deleteLater()
-
-    def use_config(self, text):
-        """使用选中的配置"""
-        self.parent().prefix_input.setText(text) if self.is_prefix else self.parent().suffix_input.setText(text)
-        self.accept()
+    def __init__(self, task, events, **engine_options):
+        super().__init__()
+        self.task = task
+        self.events = events
+        self.engine_options = engine_options
+        self.signals = WorkerSignals()
+
+    def run(self):
+        """在线程池中执行任务"""
+        runner = engine.RenameEngine(log=self.events.log,
+                                     progress=self.events.progress,
+                                     on_plan=self.signals.plan.emit,
+                                     **self.engine_options)
+        try:
+            # 设置环境变量 YAYA_PROFILE=文件 时在 cProfile 下运行，结果写入该文件
+            profile = os.environ.get('YAYA_PROFILE')
+            if profile:
+                from yaya.metrics import run_profiled
+                stats = run_profiled(lambda: self.task(runner), profile)
+                self.events.log(f"性能分析结果: {profile}")
+            else:
+                stats = self.task(runner)
+            for line in runner.metrics.summary(stats).splitlines():
+                self.events.log(line)
+            if runner.last_journal:
+                self.signals.journal.emit(runner.last_journal)
+        except Exception as e:
+            self.events.log(f"处理出错: {str(e)}")
+        finally:
+            self.signals.finished.emit()
 
 
 class MainWindow(QMainWindow):
@@ -318,13 +187,24 @@ class MainWindow(QMainWindow):
         self.thread_pool = QThreadPool()
         self.total_files = 0
         self.processed_files = 0
-        self.ext_tag_map = {
-            '.skp': 'SU',
-            '.max': '3D',
-            '.dwg': 'CAD'
-        }
+        self.ext_tag_map = dict(engine.DEFAULT_EXT_TAG_MAP)
+        self.cache = None
+        self.index = None
+        self.inspector = None
+        self.last_journal = None
+        # 当前任务的暂停与取消状态，没有任务运行时为 None
+        self.control = None
+        # 正在规划的预览，没有预览运行时为 None
+        self.preview_dialog = None
+        self.events = EventBuffer()
         self.initUI()
 
+        # 定时合并工作线程的日志与进度，界面刷新频率与文件数量无关
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setInterval(FLUSH_INTERVAL)
+        self.flush_timer.timeout.connect(self.flush_events)
+        self.flush_timer.start()
+
     def initUI(self):
         """初始化UI界面"""
         self.setWindowTitle('YaYaRename   Author：Sherry@https://github.com/SherryBX')
@@ -350,7 +230,17 @@ class MainWindow(QMainWindow):
         self.config_btn = QPushButton('配置文件类型映射')
         self.config_btn.clicked.connect(self.show_config_dialog)
         config_layout.addWidget(self.config_btn)
+        self.find_btn = QPushButton('查找成员')
+        self.find_btn.setToolTip('在成员索引中查找包含指定文件的压缩包，不打开压缩包')
+        self.find_btn.clicked.connect(self.show_member_search)
+        config_layout.addWidget(self.find_btn)
         config_layout.addStretch()
+
+        # 撤销上次重命名
+        self.undo_btn = QPushButton('撤销上次重命名')
+        self.undo_btn.setEnabled(False)
+        self.undo_btn.clicked.connect(self.undo_last)
+        config_layout.addWidget(self.undo_btn)
         layout.addLayout(config_layout)
 
         # 修改前缀后缀部分
@@ -390,22 +280,118 @@ class MainWindow(QMainWindow):
         suffix_group.setLayout(suffix_layout)
         prefix_suffix_layout.addWidget(suffix_group)
 
+        # 直接添加标签部分
+        tag_group = QGroupBox("直接添加标签")
+        tag_layout = QHBoxLayout()
+        self.tag_combo = QComboBox()
+        self.tag_combo.setEditable(True)
+        self.update_tag_combo()
+        tag_layout.addWidget(self.tag_combo)
+
+        self.add_tag_btn = QPushButton('添加标签')
+        self.add_tag_btn.clicked.connect(self.add_tag_directly)
+        tag_layout.addWidget(self.add_tag_btn)
+        tag_group.setLayout(tag_layout)
+        prefix_suffix_layout.addWidget(tag_group)
+
         layout.addLayout(prefix_suffix_layout)
 
+        # 模板重命名：标签、前缀、后缀一次完成
+        template_group = QGroupBox("模板重命名")
+        template_layout = QHBoxLayout()
+        self.template_input = QLineEdit(DEFAULT_TEMPLATE)
+        self.template_input.setToolTip('可用字段: {tag} {prefix} {suffix} {stem} {name} {ext} '
+                                       '{date} {time} {datetime} {mtime} {counter:03}')
+        template_layout.addWidget(self.template_input)
+        self.template_btn = QPushButton('按模板重命名')
+        self.template_btn.clicked.connect(self.rename_by_template)
+        template_layout.addWidget(self.template_btn)
+        template_group.setLayout(template_layout)
+        layout.addWidget(template_group)
+
+        # 扫描范围部分
+        scan_layout = QHBoxLayout()
+        self.recursive_check = QCheckBox('包含子文件夹')
+        scan_layout.addWidget(self.recursive_check)
+        scan_layout.addWidget(QLabel('最大深度:'))
+        self.depth_spinbox = QSpinBox()
+        self.depth_spinbox.setRange(0, 99)
+        self.depth_spinbox.setSpecialValueText('不限')
+        scan_layout.addWidget(self.depth_spinbox)
+        self.include_input = QLineEdit()
+        self.include_input.setPlaceholderText('包含 (如 *2024*;项目*)')
+        scan_layout.addWidget(self.include_input)
+        self.exclude_input = QLineEdit()
+        self.exclude_input.setPlaceholderText('排除 (如 backup*;*.tmp.zip)')
+        scan_layout.addWidget(self.exclude_input)
+        self.detect_check = QCheckBox('按文件头识别')
+        self.detect_check.setToolTip('检查所有文件的文件头，找出扩展名写错的压缩包')
+        scan_layout.addWidget(self.detect_check)
+        layout.addLayout(scan_layout)
+
         # 线程设置部分
         thread_layout = QHBoxLayout()
         thread_layout.addWidget(QLabel('处理线程数:'))
+        # 0 表示按实测吞吐自动调整；网络共享上打开与重命名以等待为主，手动设置也可超过 CPU 核数
         self.thread_spinbox = QSpinBox()
-        self.thread_spinbox.setRange(1, QThread.idealThreadCount())
-        self.thread_spinbox.setValue(min(4, QThread.idealThreadCount()))
+        self.thread_spinbox.setRange(0, 256)
+        self.thread_spinbox.setSpecialValueText('自动')
+        self.thread_spinbox.setValue(0)
+        self.thread_spinbox.setToolTip('自动：运行中按吞吐在 1-64 个线程之间调整，'
+                                       '7z/rar 解析不超过 CPU 核数')
         thread_layout.addWidget(self.thread_spinbox)
+
+        # 7z/rar 解析进程数，0 表示全部在线程中处理
+        thread_layout.addWidget(QLabel('7z/rar 解析进程数:'))
+        self.process_spinbox = QSpinBox()
+        self.process_spinbox.setRange(0, QThread.idealThreadCount())
+        self.process_spinbox.setSpecialValueText('不使用')
+        thread_layout.addWidget(self.process_spinbox)
+
+        # 外层没有命中时继续解析的内层压缩包层数
+        thread_layout.addWidget(QLabel('内层压缩包:'))
+        self.nested_spinbox = QSpinBox()
+        self.nested_spinbox.setRange(0, 5)
+        self.nested_spinbox.setSpecialValueText('不解析')
+        self.nested_spinbox.setSuffix(' 层')
+        thread_layout.addWidget(self.nested_spinbox)
         thread_layout.addStretch()
+
+        # 识别结果缓存
+        self.cache_check = QCheckBox('使用识别缓存')
+        self.cache_check.setChecked(True)
+        thread_layout.addWidget(self.cache_check)
+        self.rebuild_cache_btn = QPushButton('重建缓存')
+        self.rebuild_cache_btn.clicked.connect(self.rebuild_cache)
+        thread_layout.addWidget(self.rebuild_cache_btn)
+
+        # 成员索引：需要读取完整的成员列表，文件名中已有标签的压缩包也会打开一次
+        self.index_check = QCheckBox('建立成员索引')
+        self.index_check.setToolTip('处理时记录每个压缩包的成员，之后可用“查找成员”直接查询')
+        thread_layout.addWidget(self.index_check)
         layout.addLayout(thread_layout)
 
         # 开始处理按钮
+        run_layout = QHBoxLayout()
         self.start_btn = QPushButton('开始处理')
         self.start_btn.clicked.connect(self.start_processing)
-        layout.addWidget(self.start_btn)
+        run_layout.addWidget(self.start_btn, 1)
+
+        # 预览：各按钮只计算新文件名并列出，确认后再执行全部或所选的重命名
+        self.preview_check = QCheckBox('仅预览')
+        self.preview_check.setToolTip('只列出新文件名、标签来源与冲突，确认后再执行')
+        run_layout.addWidget(self.preview_check)
+
+        # 暂停与取消：进行中的文件处理完成后停下，取消的运行下次从断点继续
+        self.pause_btn = QPushButton('暂停')
+        self.pause_btn.setEnabled(False)
+        self.pause_btn.clicked.connect(self.toggle_pause)
+        run_layout.addWidget(self.pause_btn)
+        self.cancel_btn = QPushButton('取消')
+        self.cancel_btn.setEnabled(False)
+        self.cancel_btn.clicked.connect(self.cancel_task)
+        run_layout.addWidget(self.cancel_btn)
+        layout.addLayout(run_layout)
 
         # 进度显示
         progress_layout = QHBoxLayout()
@@ -419,6 +405,11 @@ class MainWindow(QMainWindow):
         log_layout = QVBoxLayout()
         log_header = QHBoxLayout()
         log_header.addWidget(QLabel("处理日志"))
+        log_header.addStretch()
+
+        self.errors_only_check = QCheckBox("仅显示错误")
+        self.errors_only_check.toggled.connect(self.set_errors_only)
+        log_header.addWidget(self.errors_only_check)
 
         # 清空日志按钮
         self.clear_log_btn = QPushButton("清空日志")
@@ -426,9 +417,14 @@ class MainWindow(QMainWindow):
         log_header.addWidget(self.clear_log_btn)
         log_layout.addLayout(log_header)
 
-        self.log_text = QTextEdit()
-        self.log_text.setReadOnly(True)
-        log_layout.addWidget(self.log_text)
+        self.log_model = LogModel(parent=self)
+        self.error_filter = ErrorFilterModel(self)
+        self.error_filter.setSourceModel(self.log_model)
+        self.log_view = QListView()
+        self.log_view.setModel(self.log_model)
+        self.log_view.setUniformItemSizes(True)
+        self.log_view.setSelectionMode(QListView.ExtendedSelection)
+        log_layout.addWidget(self.log_view)
         layout.addLayout(log_layout)
 
     def select_directory(self):
@@ -437,175 +433,355 @@ class MainWindow(QMainWindow):
         if directory:
             self.path_input.setText(directory)
 
-    def update_progress(self):
+    def flush_events(self):
+        """取走工作线程累积的日志与进度，一次性更新界面"""
+        logs, progress = self.events.drain()
+        if progress:
+            self.update_progress(progress)
+        if logs:
+            scrollbar = self.log_view.verticalScrollBar()
+            at_bottom = scrollbar.value() >= scrollbar.maximum()
+            self.log_model.append(logs)
+            if at_bottom:
+                self.log_view.scrollToBottom()
+
+    def set_errors_only(self, errors_only):
+        """切换是否只显示错误日志"""
+        self.log_view.setModel(self.error_filter if errors_only else self.log_model)
+        self.log_view.scrollToBottom()
+
+    def update_progress(self, count=1):
         """更新进度显示"""
-        self.processed_files += 1
-        progress = int(self.processed_files / self.total_files * 100)
-        self.progress_bar.setValue(progress)
-        self.progress_label.setText(f'{self.processed_files}/{self.total_files} 文件')
+        self.processed_files += count
+        self.progress_label.setText(f'{self.processed_files} 文件')
+
+    def scan_options(self):
+        """读取界面上的扫描范围设置"""
+        def patterns(text):
+            return [p.strip() for p in text.split(';') if p.strip()]
+
+        return {
+            'recursive': self.recursive_check.isChecked(),
+            'max_depth': self.depth_spinbox.value() or None,
+            'include': patterns(self.include_input.text()),
+            'exclude': patterns(self.exclude_input.text()),
+            'detect': self.detect_check.isChecked(),
+        }
 
-        if self.processed_files == self.total_files:
-            self.processing_finished()
+    def nested_options(self):
+        """内层压缩包解析设置，未启用时返回 None"""
+        depth = self.nested_spinbox.value()
+        return NestedOptions(depth) if depth else None
+
+    def get_cache(self):
+        """按需打开识别结果缓存，未启用或打开失败时返回 None"""
+        if not self.cache_check.isChecked():
+            return None
+        if self.cache is None:
+            from yaya.cache import ArchiveCache
+            try:
+                self.cache = ArchiveCache()
+            except Exception as e:
+                self.update_log(f"无法打开缓存，本次不使用缓存: {str(e)}")
+                return None
+        return self.cache
+
+    def open_index(self):
+        """按需打开成员索引，打开失败时返回 None"""
+        if self.index is None:
+            from yaya.index import MemberIndex
+            try:
+                self.index = MemberIndex()
+            except Exception as e:
+                self.update_log(f"无法打开成员索引: {str(e)}")
+                return None
+        return self.index
+
+    def get_index(self):
+        """处理时使用的成员索引，未启用时返回 None"""
+        return self.open_index() if self.index_check.isChecked() else None
+
+    def show_member_search(self):
+        """显示成员查找对话框"""
+        index = self.open_index()
+        if index is None:
+            return
+        from YaYaDialogs import MemberSearchDialog
+        dialog = MemberSearchDialog(index, self.path_input.text().strip(), self)
+        dialog.exec_()
+
+    def get_inspector(self):
+        """按进程数设置创建或复用进程池，设置为 0 时返回 None"""
+        processes = self.process_spinbox.value()
+        if self.inspector is not None and self.inspector.processes != processes:
+            self.inspector.close()
+            self.inspector = None
+        if processes and self.inspector is None:
+            from yaya.procpool import ProcessInspector
+            self.inspector = ProcessInspector(processes)
+        return self.inspector
+
+    def rebuild_cache(self):
+        """清空识别结果缓存，下次处理时重新识别所有压缩包"""
+        cache = self.get_cache()
+        if cache is not None:
+            cache.clear()
+            self.update_log("缓存已清空，下次处理时将重新识别所有压缩包")
 
     def start_processing(self):
         """开始处理文件"""
         directory = self.path_input.text()
         if not directory:
-            self.log_text.append("请先选择要处理的文件夹")
+            self.update_log("请先选择要处理的文件夹")
             return
 
-        # 获取所有压缩文件
-        archive_files = [f for f in os.listdir(directory)
-                         if f.lower().endswith(('.zip', '.rar', '.7z'))]
-        self.total_files = len(archive_files)
+        self.start_engine_task(lambda runner: runner.tag(directory))
 
-        if self.total_files == 0:
-            self.log_text.append("未找到压缩文件")
+    def rename_by_template(self):
+        """按模板一次完成标签、前缀、后缀重命名"""
+        directory = self.path_input.text()
+        if not directory:
+            self.update_log("请先选择要处理的文件夹")
             return
 
-        # 重置进度
-        self.processed_files = 0
-        self.progress_bar.setValue(0)
-        self.progress_label.setText(f'0/{self.total_files} 文件')
+        matcher = engine.build_tag_matcher(self.ext_tag_map)
+        try:
+            template = RenameTemplate(self.template_input.text(),
+                                      self.prefix_input.text().strip(),
+                                      self.suffix_input.text().strip(),
+                                      tag_pattern=matcher.prefix_pattern)
+        except TemplateError as e:
+            self.update_log(str(e))
+            return
 
-        # 禁用开始按钮
-        self.start_btn.setEnabled(False)
-        self.start_btn.setText("处理中...")
+        self.start_engine_task(lambda runner: runner.rename(directory, template))
 
-        # 设置线程池最大线程数
-        self.thread_pool.setMaxThreadCount(self.thread_spinbox.value())
+    def start_engine_task(self, task, preview=None, finished=None):
+        """在后台线程中运行引擎任务，进度与日志通过信号回到界面
 
-        # 创建并提交工作线程
-        for filename in archive_files:
-            file_path = os.path.join(directory, filename)
-            worker = ArchiveWorker(file_path, directory, self.ext_tag_map)
-            worker.signals.log.connect(self.update_log)
-            worker.signals.file_completed.connect(lambda: self.update_progress())
-            self.thread_pool.start(worker)
+        preview 为 None 时按“仅预览”的勾选决定是否只规划不执行；
+        finished 为任务结束后的处理，默认 processing_finished。
+        """
+        if preview is None:
+            preview = self.preview_check.isChecked()
+        # 重置进度：文件边扫描边处理，总数未知时进度条显示为忙碌状态
+        self.processed_files = 0
+        self.progress_bar.setRange(0, 0)
+        self.progress_label.setText('0 文件')
+
+        # 禁用所有重命名按钮
+        self.control = RunControl()
+        self.set_running(True)
+
+        worker = EngineWorker(task, self.events,
+                              ext_tag_map=self.ext_tag_map,
+                              threads=self.thread_spinbox.value(),
+                              cache=self.get_cache(),
+                              index=self.get_index(),
+                              inspector=self.get_inspector(),
+                              journal_dir=default_journal_dir(),
+                              nested=self.nested_options(),
+                              control=self.control,
+                              checkpoint_dir=default_checkpoint_dir(),
+                              dry_run=preview,
+                              **self.scan_options())
+        if preview:
+            from YaYaDialogs import PreviewDialog
+            self.preview_dialog = PreviewDialog(self)
+            worker.signals.plan.connect(self.preview_dialog.attach)
+            self.preview_dialog.show()
+        worker.signals.journal.connect(self.set_last_journal)
+        worker.signals.finished.connect(finished or self.processing_finished)
+        self.thread_pool.start(worker)
+
+    def apply_preview(self, plan, entries=None):
+        """执行预览中的全部或所选重命名"""
+        if plan is None:
+            return
+        if self.control is not None:
+            self.update_log("请等待当前任务完成后再执行预览中的重命名")
+            return
+        self.start_engine_task(lambda runner: runner.apply_preview(plan, entries),
+                               preview=False, finished=self.undo_finished)
+
+    def set_running(self, running):
+        """任务运行期间禁用所有会重命名文件的按钮，同一时间只运行一个任务"""
+        for button in (self.start_btn, self.template_btn, self.add_prefix_btn,
+                       self.add_suffix_btn, self.add_tag_btn, self.preview_check):
+            button.setEnabled(not running)
+        self.start_btn.setText("处理中..." if running else "开始处理")
+        self.pause_btn.setEnabled(running)
+        self.pause_btn.setText('暂停')
+        self.cancel_btn.setEnabled(running)
+
+    def toggle_pause(self):
+        """暂停或继续当前任务"""
+        if self.control is None:
+            return
+        if self.control.paused:
+            self.control.resume()
+            self.pause_btn.setText('暂停')
+            self.update_log("继续处理")
+        else:
+            self.control.pause()
+            self.pause_btn.setText('继续')
+            self.update_log("已暂停，进行中的文件处理完成后停止")
+
+    def cancel_task(self):
+        """取消当前任务，进行中的文件处理完成后结束"""
+        if self.control is None or self.control.cancelled:
+            return
+        self.control.cancel()
+        self.pause_btn.setEnabled(False)
+        self.cancel_btn.setEnabled(False)
+        self.update_log("正在取消，等待进行中的文件处理完成...")
+
+    def set_last_journal(self, path):
+        """记下最近一次重命名的撤销记录"""
+        if path:
+            self.last_journal = path
+            self.undo_btn.setEnabled(True)
+
+    def undo_last(self):
+        """在后台撤销最近一次重命名"""
+        if not self.last_journal:
+            return
+        path = self.last_journal
+        self.last_journal = None
+        self.undo_btn.setEnabled(False)
+        self.control = RunControl()
+        self.set_running(True)
+
+        worker = EngineWorker(lambda runner: runner.undo(path), self.events,
+                              threads=self.thread_spinbox.value(),
+                              control=self.control,
+                              index=self.get_index(),
+                              journal_dir=default_journal_dir())
+        worker.signals.finished.connect(self.undo_finished)
+        self.thread_pool.start(worker)
+
+    def undo_finished(self):
+        """撤销（或执行预览）完成后的操作"""
+        self.flush_events()
+        self.set_running(False)
+        self.control = None
+        self.progress_bar.setRange(0, 100)
 
     def update_log(self, message):
         """更新日志"""
-        self.log_text.append(message)
+        self.events.log(message)
+        self.flush_events()
 
     def processing_finished(self):
         """处理完成后的操作"""
-        self.start_btn.setEnabled(True)
-        self.start_btn.setText("开始处理")
-        self.log_text.append("所有文件处理完成！")
+        self.flush_events()
+        self.set_running(False)
+        cancelled = self.control is not None and self.control.cancelled
+        self.control = None
+        self.progress_bar.setRange(0, 100)
+        if self.preview_dialog is not None:
+            self.preview_dialog.finish(cancelled)
+            self.preview_dialog = None
+        if cancelled:
+            self.progress_bar.setValue(0)
+            self.progress_label.setText(f'已取消，{self.processed_files} 文件')
+            return
+
+        self.total_files = self.processed_files
+        self.progress_bar.setValue(100)
+        self.progress_label.setText(f'{self.processed_files}/{self.total_files} 文件')
+        if self.total_files == 0:
+            self.update_log("未找到压缩文件")
 
     def show_config_dialog(self):
         """显示配置对话框"""
         # 转换映射关系为对话框需要的格式
         current_mappings = {v: k for k, v in self.ext_tag_map.items()}
+        from YaYaDialogs import TagConfigDialog
         dialog = TagConfigDialog(self, current_mappings)
         if dialog.exec_() == QDialog.Accepted:
             # 更新文件类型映射
             new_mappings = dialog.get_mappings()
             self.ext_tag_map = {ext: tag for tag, ext in new_mappings.items()}
-            self.log_text.append("文件类型映射已更新")
+            self.update_tag_combo()
+            self.update_log("文件类型映射已更新")
+
+    def update_tag_combo(self):
+        """按当前映射刷新可选标签，保留已输入的内容"""
+        current = self.tag_combo.currentText()
+        self.tag_combo.clear()
+        self.tag_combo.addItems(engine.build_tag_matcher(self.ext_tag_map).tags)
+        if current:
+            self.tag_combo.setCurrentText(current)
 
     def add_tag_directly(self):
         """直接添加标签到文件名前"""
         directory = self.path_input.text()
         if not directory:
-            self.log_text.append("请先选择要处理的文件夹")
+            self.update_log("请先选择要处理的文件夹")
             return
 
-        tag = self.tag_combo.currentText()
-
-        # 获取所有压缩文件
-        archive_files = [f for f in os.listdir(directory)
-                         if f.lower().endswith(('.zip', '.rar', '.7z'))]
-
-        for filename in archive_files:
-            try:
-                file_path = os.path.join(directory, filename)
-                # 移除已存在的标签
-                clean_name = re.sub(r'^(3D|SU|CAD)\s*', '', filename)
-                new_name = f"{tag} {clean_name}"
-                new_path = os.path.join(directory, new_name)
-
-                if file_path != new_path:
-                    os.rename(file_path, new_path)
-                    self.log_text.append(f"已添加标签: {filename} -> {new_name}")
-            except Exception as e:
-                self.log_text.append(f"处理文件 {filename} 时出错: {str(e)}")
+        tag = self.tag_combo.currentText().strip()
+        if not tag:
+            self.update_log("请选择或输入要添加的标签")
+            return
 
-        self.log_text.append("标签添加完成！")
+        self.start_engine_task(lambda runner: runner.tag_directly(directory, tag))
 
     def clear_log(self):
         """清空日志"""
-        self.log_text.clear()
+        self.log_model.clear()
 
     def add_prefix(self):
         """添加前缀"""
         directory = self.path_input.text()
         if not directory:
-            self.log_text.append("请先选择要处理的文件夹")
+            self.update_log("请先选择要处理的文件夹")
             return
 
         prefix = self.prefix_input.text().strip()
         if not prefix:
-            self.log_text.append("请输入要添加的前缀")
+            self.update_log("请输入要添加的前缀")
             return
 
-        # 获取所有压缩文件
-        archive_files = [f for f in os.listdir(directory)
-                         if f.lower().endswith(('.zip', '.rar', '.7z'))]
-
-        for filename in archive_files:
-            try:
-                file_path = os.path.join(directory, filename)
-                new_name = f"{prefix} {filename}"
-                new_path = os.path.join(directory, new_name)
-
-                if file_path != new_path:
-                    os.rename(file_path, new_path)
-                    self.log_text.append(f"已添加前缀: {filename} -> {new_name}")
-            except Exception as e:
-                self.log_text.append(f"处理文件 {filename} 时出错: {str(e)}")
-
-        self.log_text.append("前缀添加完成！")
+        self.start_engine_task(lambda runner: runner.prefix(directory, prefix))
 
     def add_suffix(self):
         """添加后缀"""
         directory = self.path_input.text()
         if not directory:
-            self.log_text.append("请先选择要处理的文件夹")
+            self.update_log("请先选择要处理的文件夹")
             return
 
         suffix = self.suffix_input.text().strip()
         if not suffix:
-            self.log_text.append("请输入要添加的后缀")
+            self.update_log("请输入要添加的后缀")
             return
 
-        # 获取所有压缩文件
-        archive_files = [f for f in os.listdir(directory)
-                         if f.lower().endswith(('.zip', '.rar', '.7z'))]
-
-        for filename in archive_files:
-            try:
-                file_path = os.path.join(directory, filename)
-                # 分离文件名和扩展名
-                name, ext = os.path.splitext(filename)
-                new_name = f"{name} {suffix}{ext}"
-                new_path = os.path.join(directory, new_name)
-
-                if file_path != new_path:
-                    os.rename(file_path, new_path)
-                    self.log_text.append(f"已添加后缀: {filename} -> {new_name}")
-            except Exception as e:
-                self.log_text.append(f"处理文件 {filename} 时出错: {str(e)}")
-
-        self.log_text.append("后缀添加完成！")
+        self.start_engine_task(lambda runner: runner.suffix(directory, suffix))
+
+    def closeEvent(self, event):
+        """关闭窗口时关闭进程池，提交并关闭缓存与成员索引"""
+        if self.inspector is not None:
+            self.inspector.close()
+            self.inspector = None
+        if self.cache is not None:
+            self.cache.close()
+            self.cache = None
+        if self.index is not None:
+            self.index.close()
+            self.index = None
+        super().closeEvent(event)
 
     def show_prefix_config(self):
         """显示前缀配置对话框"""
+        from YaYaDialogs import PrefixSuffixConfigDialog
         dialog = PrefixSuffixConfigDialog(self, is_prefix=True)
         dialog.exec_()
 
     def show_suffix_config(self):
         """显示后缀配置对话框"""
+        from YaYaDialogs import PrefixSuffixConfigDialog
         dialog = PrefixSuffixConfigDialog(self, is_prefix=False)
         dialog.exec_()
 
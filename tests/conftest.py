@@ -0,0 +1,29 @@
+import os
+import sys
+import zipfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Linux 上 GBK 编码的“你好.zip”，不是合法的 UTF-8，解码后含代理字符
+GBK_NAME = os.fsdecode(b'\xc4\xe3\xba\xc3.zip')
+
+
+def write_zip(path, *members):
+    with zipfile.ZipFile(path, 'w') as z:
+        for member in members:
+            z.writestr(member, b'x')
+    return path
+
+
+@pytest.fixture
+def gbk_dir(tmp_path):
+    """含一个 GBK 文件名的 CAD 压缩包与一个普通压缩包的目录"""
+    if sys.platform == 'win32':
+        pytest.skip('Windows 文件名总是合法的 Unicode')
+    directory = tmp_path / 'files'
+    directory.mkdir()
+    write_zip(os.path.join(str(directory), GBK_NAME), 'plan.dwg')
+    write_zip(str(directory / 'normal.zip'), 'model.skp')
+    return str(directory)
@@ -0,0 +1,136 @@
+import math
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import yaya.adaptive
+from yaya.adaptive import MIN_SAMPLES, WINDOW, AdaptiveLimit
+from yaya.engine import RenameEngine
+
+from conftest import write_zip
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(yaya.adaptive, 'time', SimpleNamespace(
+        monotonic=lambda: now[0], perf_counter=time.perf_counter))
+    return now
+
+
+def window(limit, clock, rate, latency=0.01, samples=None):
+    """模拟一个统计窗口：samples 个条目，吞吐为 rate 条/秒，返回窗口结束后的限制值"""
+    if samples is None:
+        samples = max(MIN_SAMPLES, math.ceil(rate * WINDOW))
+    for i in range(samples):
+        if i == samples - 1:
+            clock[0] += samples / rate
+        limit.acquire()
+        limit.release(latency)
+    return limit.limit
+
+
+def test_climbs_with_doubling_step(clock):
+    limit = AdaptiveLimit('io', 1, 64, 4)
+    assert [window(limit, clock, rate) for rate in (20, 40, 80, 160)] == [6, 9, 13, 19]
+    assert limit.peak == 19
+    assert [value for _, value, _ in limit.history] == [6, 9, 13, 19]
+    assert limit.history[-1][2] == 160
+
+
+def test_throughput_drop_reverses(clock):
+    limit = AdaptiveLimit('io', 1, 64, 4)
+    window(limit, clock, 20)
+    window(limit, clock, 40)
+    assert window(limit, clock, 20) == 8
+    # 反向后吞吐回升，继续减少且步长加倍
+    assert window(limit, clock, 40) == 6
+
+
+def test_flat_throughput_sheds_threads(clock):
+    limit = AdaptiveLimit('io', 1, 64, 8)
+    window(limit, clock, 20)
+    assert window(limit, clock, 20.5) == limit.history[0][1] - 1
+
+
+def test_latency_rise_sheds_threads(clock):
+    limit = AdaptiveLimit('io', 1, 64, 8)
+    assert window(limit, clock, 20, latency=0.01) == 10
+    # 吞吐提高但单个条目耗时翻倍：存储接近饱和
+    assert window(limit, clock, 30, latency=0.02) == 9
+
+
+def test_window_needs_time_and_samples(clock):
+    short = AdaptiveLimit('io', 1, 64, 4)
+    assert window(short, clock, 1000, samples=MIN_SAMPLES) == 4
+    few = AdaptiveLimit('io', 1, 64, 4)
+    assert window(few, clock, (MIN_SAMPLES - 1) / WINDOW, samples=MIN_SAMPLES - 1) == 4
+    assert short.history == few.history == []
+
+
+def test_clamped_at_bounds(clock):
+    limit = AdaptiveLimit('io', 2, 5, 100)
+    assert limit.limit == 5
+    assert window(limit, clock, 20) == 5
+    assert limit.history == []
+    # 到达上限后往回试探
+    assert window(limit, clock, 40) < 5
+    assert AdaptiveLimit('io', 0, 0).limit == 1
+
+
+def test_fixed_limit_does_not_tune(clock):
+    limit = AdaptiveLimit('cpu', 1, 8, 4, adaptive=False)
+    for rate in (20, 40, 80):
+        assert window(limit, clock, rate) == 4
+    assert limit.describe() == '4（峰值 4，范围 1-8）'
+
+
+def test_restart_forgets_previous_rate(clock):
+    limit = AdaptiveLimit('io', 1, 64, 8)
+    window(limit, clock, 100)
+    limit.restart()
+    # 没有上一窗口可比较，视为改善
+    assert window(limit, clock, 10) == 12
+
+
+def test_acquire_blocks_at_limit():
+    limit = AdaptiveLimit('io', 1, 8, 2, adaptive=False)
+    lock = threading.Lock()
+    active = [0, 0]
+
+    def work():
+        with lock:
+            active[0] += 1
+            active[1] = max(active[1], active[0])
+        time.sleep(0.02)
+        with lock:
+            active[0] -= 1
+
+    threads = [threading.Thread(target=limit.run, args=(work,)) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert active[1] == 2
+
+
+def test_run_releases_on_error():
+    limit = AdaptiveLimit('io', 1, 1, 1)
+    with pytest.raises(ZeroDivisionError):
+        limit.run(lambda: 1 / 0)
+    assert limit.run(lambda x: x + 1, 1) == 2
+
+
+def test_engine_auto_threads(tmp_path):
+    d = str(tmp_path)
+    for i in range(40):
+        write_zip(os.path.join(d, f'{i}.zip'), 'plan.dwg')
+    engine = RenameEngine(threads=0, max_io_threads=8, cpu_threads=2)
+    stats = engine.tag(d)
+    assert (stats.renamed, stats.errors) == (40, 0)
+    gauges = engine.metrics.snapshot()['gauges']
+    assert 1 <= gauges['io_threads'] <= gauges['io_threads_peak'] <= 8
+    assert gauges['cpu_threads'] == 2
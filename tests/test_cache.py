@@ -0,0 +1,133 @@
+import os
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+
+import yaya.cache
+from yaya.cache import CACHE_VERSION, ArchiveCache, fingerprint
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """可控的 used 时间戳"""
+    now = [1000]
+    monkeypatch.setattr(yaya.cache, 'time', SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+def write(path, data=b'PK'):
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+
+def test_roundtrip_and_persistence(tmp_path):
+    db = str(tmp_path / 'cache.sqlite3')
+    path = write(str(tmp_path / 'a.zip'))
+    fp = fingerprint(path)
+    with ArchiveCache(db) as cache:
+        assert cache.get(fp) is None
+        cache.put(fp, 'SU', ['.skp', '.dwg'], kind='.zip', depth=1)
+        # 未提交的条目也能查到
+        entry = cache.get(fp)
+        assert (entry.tag, entry.exts, entry.complete, entry.kind, entry.depth) == (
+            'SU', ['.skp', '.dwg'], True, '.zip', 1)
+        assert (cache.hits, cache.misses) == (1, 1)
+    with ArchiveCache(db) as cache:
+        assert len(cache) == 1
+        entry = cache.get(fp)
+        assert entry.exts == ['.skp', '.dwg']
+        cache.put(fp, None, [], complete=False, kind='')
+        cache.flush()
+        entry = cache.get(fp)
+        assert (entry.tag, entry.exts, entry.complete, entry.kind) == (None, [], False, '')
+
+
+@pytest.mark.parametrize('change', ['size', 'mtime', 'inode'])
+def test_fingerprint_change_invalidates(tmp_path, change):
+    path = write(str(tmp_path / 'a.zip'))
+    with ArchiveCache(str(tmp_path / 'cache.sqlite3')) as cache:
+        old = fingerprint(path)
+        cache.put(old, 'SU', ['.skp'])
+        cache.flush()
+        st = os.stat(path)
+        if change == 'size':
+            write(path, b'PK\x03\x04')
+            os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+        elif change == 'mtime':
+            os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+        else:
+            # 另存后替换：同名同大小同时间，但 inode 不同
+            other = write(str(tmp_path / 'b.zip'))
+            os.utime(other, ns=(st.st_atime_ns, st.st_mtime_ns))
+            os.replace(other, path)
+        fp = fingerprint(path)
+        assert fp != old
+        assert cache.get(fp) is None
+        assert cache.misses == 1
+
+
+def test_volume_fingerprint(tmp_path):
+    first = write(str(tmp_path / 'x.part1.rar'), b'Rar!')
+    second = write(str(tmp_path / 'x.part2.rar'), b'123456')
+    os.utime(first, ns=(0, 10 ** 9))
+    os.utime(second, ns=(0, 5 * 10 ** 9))
+    dev, ino, size, mtime = fingerprint(first, [first, second])
+    assert (ino, size, mtime) == (os.stat(first).st_ino, 10, 5 * 10 ** 9)
+    # 后续分卷变化同样使缓存失效
+    write(second, b'1234567')
+    assert fingerprint(first, [first, second])[2] == 11
+
+
+def test_replacing_entry_does_not_grow_count(tmp_path):
+    fp = (1, 1, 10, 10)
+    with ArchiveCache(str(tmp_path / 'cache.sqlite3'), flush_every=1) as cache:
+        for size in range(5):
+            cache.put(fp[:2] + (size, 10), 'SU', ['.skp'])
+        assert len(cache) == 1
+        cache.put((1, 2, 10, 10), 'CAD', ['.dwg'])
+        assert len(cache) == 2
+
+
+def test_eviction_drops_least_recently_used(tmp_path, clock):
+    db = str(tmp_path / 'cache.sqlite3')
+    with ArchiveCache(db, max_entries=10, flush_every=1) as cache:
+        for ino in range(10):
+            clock[0] = 1000 + ino
+            cache.put((1, ino, 1, 1), 'SU', ['.skp'])
+        assert len(cache) == 10
+        # 最早写入的条目刚被使用过，不会被淘汰
+        clock[0] = 2000
+        assert cache.get((1, 0, 1, 1)) is not None
+        cache.flush()
+        clock[0] = 2001
+        cache.put((1, 10, 1, 1), 'SU', ['.skp'])
+        # 超过上限后保留 90%
+        assert len(cache) == 9
+    with sqlite3.connect(db) as conn:
+        kept = sorted(ino for (ino,) in conn.execute('SELECT ino FROM archives'))
+    assert kept == [0, 3, 4, 5, 6, 7, 8, 9, 10]
+
+
+def test_clear_and_version_change(tmp_path):
+    db = str(tmp_path / 'cache.sqlite3')
+    with ArchiveCache(db) as cache:
+        cache.put((1, 1, 1, 1), 'SU', ['.skp'])
+        cache.put((1, 2, 1, 1), 'SU', ['.skp'])
+    with ArchiveCache(db) as cache:
+        cache.clear()
+        assert len(cache) == 0 and cache.get((1, 1, 1, 1)) is None
+        cache.put((1, 1, 1, 1), 'SU', ['.skp'])
+    with sqlite3.connect(db) as conn:
+        conn.execute(f'PRAGMA user_version = {CACHE_VERSION - 1}')
+    # 旧版本的缓存整体重建
+    with ArchiveCache(db) as cache:
+        assert len(cache) == 0
+
+
+def test_missing_fingerprint_is_ignored(tmp_path):
+    with ArchiveCache(str(tmp_path / 'cache.sqlite3')) as cache:
+        cache.put(None, 'SU', ['.skp'])
+        assert cache.get(None) is None
+        assert len(cache) == 0 and cache.misses == 0
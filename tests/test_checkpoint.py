@@ -0,0 +1,78 @@
+import os
+
+from yaya.checkpoint import Checkpoint
+from yaya.control import RunControl
+from yaya.engine import RenameEngine
+
+from conftest import GBK_NAME
+
+
+def test_record_and_reload_name_not_utf8(gbk_dir, tmp_path):
+    path = os.path.join(gbk_dir, GBK_NAME)
+    key = f'["{gbk_dir}", "tag", "{GBK_NAME}"]'
+    checkpoint = Checkpoint.open(str(tmp_path), 'tag', key, batch_size=1)
+    checkpoint.record(path, 'CAD ' + GBK_NAME)
+    checkpoint.record_target(os.path.join(gbk_dir, 'CAD ' + GBK_NAME))
+    checkpoint.close()
+
+    checkpoint = Checkpoint.open(str(tmp_path), 'tag', key)
+    assert checkpoint.lookup(path) == (True, 'CAD ' + GBK_NAME)
+    assert checkpoint.is_target(os.path.join(gbk_dir, 'CAD ' + GBK_NAME))
+    checkpoint.close()
+
+
+def test_resume_name_not_utf8(gbk_dir, tmp_path):
+    checkpoints = str(tmp_path / 'checkpoints')
+    control = RunControl()
+
+    def make_name(path, name, volumes):
+        control.cancel()
+        return 'P ' + name
+
+    # 第一次运行只规划了 GBK 文件名的压缩包就被取消，断点记录保留
+    engine = RenameEngine(threads=1, checkpoint_dir=checkpoints, control=control)
+    checkpoint = engine.open_checkpoint(gbk_dir, 'prefix', 'P')
+    plan, stats = engine.plan_items([os.path.join(gbk_dir, GBK_NAME)], make_name, checkpoint)
+    stats = engine.apply(plan, stats, operation='prefix', checkpoint=checkpoint)
+    assert stats.cancelled and stats.errors == 0
+    assert sorted(os.listdir(gbk_dir)) == sorted([GBK_NAME, 'normal.zip'])
+
+    # 再次运行时沿用已记录的结果，只规划剩下的文件
+    messages = []
+    engine = RenameEngine(threads=1, checkpoint_dir=checkpoints, log=messages.append)
+    stats = engine.prefix(gbk_dir, 'P')
+    assert (stats.renamed, stats.errors) == (2, 0)
+    assert sorted(os.listdir(gbk_dir)) == sorted(['P ' + GBK_NAME, 'P normal.zip'])
+    assert any('从上次中断处继续：1' in m for m in messages)
+    assert os.listdir(checkpoints) == []
+
+
+def test_only_renamed_files_become_targets(tmp_path):
+    directory = tmp_path / 'files'
+    directory.mkdir()
+    for name in ('a.zip', 'b.zip', 'P b.zip'):
+        (directory / name).write_bytes(b'x')
+    d = str(directory)
+    checkpoints = str(tmp_path / 'checkpoints')
+    control = RunControl()
+
+    def log(message):
+        if message.startswith('已添加前缀'):
+            control.cancel()
+
+    # a.zip 重命名后取消；b.zip 的目标已存在，没有重命名
+    engine = RenameEngine(threads=1, checkpoint_dir=checkpoints, control=control, log=log)
+    checkpoint = engine.open_checkpoint(d, 'prefix', 'P')
+    plan, stats = engine.plan_items([os.path.join(d, 'a.zip'), os.path.join(d, 'b.zip')],
+                                    lambda path, name, volumes: 'P ' + name, checkpoint)
+    stats = engine.apply(plan, stats, '已添加前缀: {old} -> {new}', 'prefix', checkpoint)
+    assert stats.cancelled and (stats.renamed, stats.skipped) == (1, 1)
+
+    checkpoint = engine.open_checkpoint(d, 'prefix', 'P')
+    assert checkpoint.targets == {os.path.join(d, 'P a.zip')}
+    checkpoint.close()
+
+    # 再次运行：原有的 P b.zip 不是上次重命名得到的，照常处理
+    stats = RenameEngine(threads=1, checkpoint_dir=checkpoints).prefix(d, 'P')
+    assert (stats.renamed, stats.errors) == (2, 0)
+    assert sorted(os.listdir(d)) == ['P P b.zip', 'P a.zip', 'P b.zip']
@@ -0,0 +1,87 @@
+import gc
+import os
+import sys
+import tracemalloc
+
+from yaya.compact import (ENTRY_BYTES, GROWTH, MTIME_BYTES, PLAN_ENTRY_BYTES,
+                          TABLE_ENTRY_BYTES, EntryTable, NameColumn)
+from yaya.plan import RenamePlan
+
+from conftest import GBK_NAME
+
+COUNT = 20000
+DIRECTORIES = [os.path.join(os.sep, 'share', f'项目{d:02d}') for d in range(40)]
+
+
+def name(i):
+    return f'项目{i % 97:02d} 模型_{i:07d}.zip'
+
+
+def path(i):
+    return os.path.join(DIRECTORIES[i % len(DIRECTORIES)], name(i))
+
+
+def traced(build):
+    """build() 返回的对象每条占用的字节数"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        kept = build()
+        gc.collect()
+        size = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    del kept
+    return size / COUNT
+
+
+def name_bytes():
+    return sum(len(name(i).encode('utf-8')) for i in range(COUNT)) / COUNT
+
+
+def table_bytes():
+    return sum(sys.getsizeof(d) + TABLE_ENTRY_BYTES for d in DIRECTORIES) / COUNT
+
+
+def test_entry_table_within_budget():
+    def build():
+        table = EntryTable(['SU', '3D'], mtimes=True)
+        for i in range(COUNT):
+            table.add(path(i), ('SU', '3D', None)[i % 3], 'content', 1.7e9 + i)
+        return table
+
+    budget = (ENTRY_BYTES + MTIME_BYTES + name_bytes()) * GROWTH + table_bytes()
+    assert traced(build) <= budget
+
+
+def test_rename_plan_within_budget():
+    def build():
+        plan = RenamePlan()
+        for i in range(COUNT):
+            plan.add(path(i), 'SU ' + name(i), False, 'content')
+        return plan
+
+    budget = (PLAN_ENTRY_BYTES + 2 * name_bytes() + len(b'SU ')) * GROWTH + table_bytes()
+    assert traced(build) <= budget
+
+
+def test_entry_table_reads_back():
+    table = EntryTable(['SU'], mtimes=True)
+    table.add('/d/a.zip', 'SU', 'content', 1.5)
+    table.add('/d/' + GBK_NAME, 'NEW', None)
+    assert list(table) == [('/d/a.zip', 'SU'), ('/d/' + GBK_NAME, 'NEW')]
+    assert table[-1] == ('/d/' + GBK_NAME, 'NEW')
+    assert (table.source(0), table.mtime(0), table.mtime(1)) == ('content', 1.5, 0.0)
+    assert len(table.directories) == 1
+
+
+def test_name_column_decode():
+    column = NameColumn()
+    names = ['a', '', '名称', GBK_NAME, 'z']
+    for text in names:
+        column.append(text)
+    assert [column[i] for i in range(len(names))] == names
+    assert column.decode(0, 5) == names
+    assert column.decode(1, 5, 2) == ['', GBK_NAME]
+    assert column.raw(2) == '名称'.encode('utf-8')
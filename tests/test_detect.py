@@ -0,0 +1,66 @@
+import pytest
+
+from yaya.detect import SuffixIndex, detect_type, member_suffix, sniff_type, suffix_index
+
+from conftest import write_zip
+
+
+@pytest.mark.parametrize('header, kind', [
+    (b'PK\x03\x04', '.zip'),
+    (b'PK\x05\x06' + bytes(18), '.zip'),
+    (b'Rar!\x1a\x07\x00', '.rar'),
+    (b'Rar!\x1a\x07\x01\x00', '.rar'),
+    (b"7z\xbc\xaf'\x1c\x00\x04", '.7z'),
+    (b'%PDF-1.7', None),
+    (b'', None),
+])
+def test_sniff_type(tmp_path, header, kind):
+    path = tmp_path / 'file.bin'
+    path.write_bytes(header + bytes(16))
+    assert sniff_type(str(path)) == kind
+
+
+def test_detect_type_prefers_header(tmp_path):
+    # 扩展名写错的压缩包按文件头识别；文件头不认识时再看扩展名
+    misnamed = write_zip(str(tmp_path / 'drawing.rar'), 'plan.dwg')
+    assert detect_type(misnamed) == '.zip'
+    sfx = tmp_path / 'setup.ZIP'
+    sfx.write_bytes(b'MZ' + bytes(100))
+    assert detect_type(str(sfx)) == '.zip'
+    other = tmp_path / 'notes.txt'
+    other.write_bytes(b'hello')
+    assert detect_type(str(other)) is None
+
+
+@pytest.mark.parametrize('name, suffix', [
+    ('plan.dwg', '.dwg'),
+    ('Model.SKP.BAK', '.skp.bak'),
+    ('backup.tar.gz', '.tar.gz'),
+    ('a.b.c.d.e', '.c.d.e'),
+    ('dir/sub/plan.dwg', '.dwg'),
+    ('dir\\plan.DWG', '.dwg'),
+    ('dir.d/README', ''),
+    ('.hidden', ''),
+    ('.config.json', '.json'),
+    ('v1.2 final.skp', '.skp'),
+    ('name.averyveryverylongpart.dwg', '.dwg'),
+    ('trailing.', ''),
+])
+def test_member_suffix(name, suffix):
+    assert member_suffix(name) == suffix
+
+
+def test_suffix_index_longest_match():
+    index = SuffixIndex({'.bak': 'BAK', '.skp.bak': 'SU', 'DWG': 'CAD', '.Tar.Gz': 'TGZ'})
+    assert index.match('.skp.bak') == 'SU'
+    assert index.match('.max.bak') == 'BAK'
+    assert index.match('.dwg') == 'CAD'
+    assert index.match('.tar.gz') == 'TGZ'
+    assert index.match('.gz') is None
+    # 只在扩展名的段边界上命中
+    assert index.match('.xdwg') is None
+    assert index.match('') is None
+
+
+def test_suffix_index_is_shared():
+    assert suffix_index({'.skp': 'SU', '.dwg': 'CAD'}) is suffix_index({'.dwg': 'CAD', '.skp': 'SU'})
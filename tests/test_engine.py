@@ -0,0 +1,29 @@
+import os
+
+from yaya.engine import RenameEngine
+
+from conftest import write_zip
+
+
+def test_dry_run_tag_does_not_report_completion(tmp_path):
+    d = str(tmp_path)
+    write_zip(os.path.join(d, 'a.zip'), 'plan.dwg')
+    write_zip(os.path.join(d, 'b.zip'), 'model.skp')
+    messages = []
+    plans = []
+    engine = RenameEngine(dry_run=True, log=messages.append, on_plan=plans.append)
+    stats = engine.tag(d)
+    assert stats.renamed == 0
+    assert sorted(os.listdir(d)) == ['a.zip', 'b.zip']
+    assert messages[-1] == '预览: 2 个文件将被重命名，0 个有冲突，未执行重命名'
+    assert not [m for m in messages if '完成' in m]
+    assert engine.prefix(d, 'P').renamed == 0
+    assert not [m for m in messages if '完成' in m]
+
+    # 确认后执行预览得到的计划
+    plan = plans[0]
+    engine.dry_run = False
+    stats = engine.apply_preview(plan)
+    assert stats.renamed == 2
+    assert sorted(os.listdir(d)) == ['CAD a.zip', 'SU b.zip']
+    assert messages[-1] == '预览中的重命名已执行'
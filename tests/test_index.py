@@ -0,0 +1,45 @@
+import os
+
+from yaya.engine import RenameEngine
+from yaya.index import MemberIndex
+
+from conftest import GBK_NAME
+
+
+def scan(directory, index=None):
+    messages = []
+    engine = RenameEngine(threads=1, index=index, log=messages.append)
+    return sorted(engine.scan(directory)), messages
+
+
+def test_index_name_not_utf8(gbk_dir, tmp_path):
+    expected, _ = scan(gbk_dir)
+    assert (os.path.join(gbk_dir, GBK_NAME), 'CAD') in expected
+
+    with MemberIndex(str(tmp_path / 'index.db')) as index:
+        result, messages = scan(gbk_dir, index)
+        assert result == expected
+        assert not [m for m in messages if '出错' in m]
+        hits = index.search('plan', under=gbk_dir)
+        assert [(hit.archive, hit.name) for hit in hits] == [
+            (os.path.join(gbk_dir, GBK_NAME), 'plan.dwg')]
+        assert index.is_current(os.path.join(gbk_dir, GBK_NAME),
+                                index.stamp(os.path.join(gbk_dir, GBK_NAME)))
+
+        # 重命名后索引中的路径随之更新
+        recorder = index.journal()
+        recorder.record(gbk_dir, GBK_NAME, 'CAD ' + GBK_NAME)
+        os.rename(os.path.join(gbk_dir, GBK_NAME), os.path.join(gbk_dir, 'CAD ' + GBK_NAME))
+        assert [hit.archive for hit in index.search('plan')] == [
+            os.path.join(gbk_dir, 'CAD ' + GBK_NAME)]
+        assert index.prune() == 0
+
+
+def test_member_name_not_storable(tmp_path):
+    with MemberIndex(str(tmp_path / 'index.db')) as index:
+        index.put('/a.7z', (1, 1), '.7z', [('bad\udc80.dwg', 1)])
+        index.put('/b.zip', (1, 1), '.zip', [('good.dwg', 1)])
+        index.flush()
+        assert [hit.archive for hit in index.search('dwg')] == ['/b.zip']
+        assert not index.is_current('/a.7z', (1, 1))
+        assert index.counts() == (1, 1)
@@ -0,0 +1,103 @@
+import json
+import os
+
+import pytest
+
+from yaya.jobs import load_manifest
+
+
+def write_manifest(tmp_path, manifest, name='jobs.json'):
+    path = str(tmp_path / name)
+    with open(path, 'w', encoding='utf-8') as f:
+        if isinstance(manifest, str):
+            f.write(manifest)
+        else:
+            json.dump(manifest, f, ensure_ascii=False)
+    return path
+
+
+def test_priority_order_and_settings(tmp_path):
+    path = write_manifest(tmp_path, {
+        'defaults': {'recursive': True, 'priority': 1, 'exclude': 'tmp'},
+        'jobs': [
+            {'root': 'archive'},
+            {'name': '急件', 'root': '/srv/urgent', 'priority': 10,
+             'map': {'SKP': ' SU ', '.DWG': 'CAD'}},
+            {'root': 'low', 'priority': -1, 'recursive': False},
+            {'root': 'archive2', 'template': '{tag} {stem}{ext}'},
+        ]})
+    jobs = load_manifest(path)
+    # 优先级从高到低，相同时保持清单中的顺序
+    assert [job.name for job in jobs] == ['急件', 'archive', 'archive2', 'low']
+    urgent, archive, archive2, low = jobs
+    assert urgent.root == os.path.abspath('/srv/urgent')
+    assert urgent.ext_tag_map == {'.skp': 'SU', '.dwg': 'CAD'}
+    # 相对路径相对于清单所在目录
+    assert archive.root == os.path.join(str(tmp_path), 'archive')
+    assert (archive.priority, archive.recursive, archive.exclude) == (1, True, ['tmp'])
+    assert archive.ext_tag_map is None and archive.template is None
+    assert archive2.template == '{tag} {stem}{ext}'
+    assert (low.priority, low.recursive) == (-1, False)
+
+
+def test_command_line_defaults_are_overridden(tmp_path):
+    path = write_manifest(tmp_path, {'defaults': {'prefix': 'P'},
+                                     'jobs': [{'root': 'a'}, {'root': 'b', 'prefix': 'Q'}]})
+    base = {'prefix': 'X', 'suffix': 'S', 'max_depth': 2}
+    a, b = load_manifest(path, base)
+    assert (a.prefix, a.suffix, a.max_depth) == ('P', 'S', 2)
+    assert b.prefix == 'Q'
+
+
+def test_toml_manifest(tmp_path):
+    pytest.importorskip('tomllib')
+    path = write_manifest(tmp_path, '''
+[defaults]
+recursive = true
+
+[[jobs]]
+name = "急件"
+root = "urgent"
+priority = 10
+map = { ".skp" = "SU" }
+
+[[jobs]]
+root = "archive"
+''', 'jobs.toml')
+    assert [(job.name, job.priority, job.recursive) for job in load_manifest(path)] == [
+        ('急件', 10, True), ('archive', 0, True)]
+
+
+def test_utf8_bom(tmp_path):
+    path = str(tmp_path / 'jobs.json')
+    with open(path, 'w', encoding='utf-8-sig') as f:
+        json.dump({'jobs': [{'root': '项目'}]}, f, ensure_ascii=False)
+    assert [job.name for job in load_manifest(path)] == ['项目']
+
+
+@pytest.mark.parametrize('manifest, message', [
+    ([], '作业列表'),
+    ({'jobs': {}}, '作业列表'),
+    ({'jobs': []}, '没有作业'),
+    ({'defaults': [], 'jobs': [{'root': 'a'}]}, 'defaults 应为表'),
+    ({'jobs': ['a']}, '第 1 个作业 应为表'),
+    ({'jobs': [{'root': 'a', 'threads': 4}]}, '未知的设置 threads'),
+    ({'defaults': {'color': 1}, 'jobs': [{'root': 'a'}]}, '未知的设置 color'),
+    ({'jobs': [{'name': 'x'}]}, '缺少 root'),
+    ({'jobs': [{'root': ''}]}, '缺少 root'),
+    # defaults 中的 root 不会套用到作业
+    ({'defaults': {'root': 'a'}, 'jobs': [{}]}, '缺少 root'),
+    ({'jobs': [{'root': 'a'}, {'root': 'b/a'}]}, '第 2 个作业: 作业名称重复: a'),
+    ({'jobs': [{'root': 'a', 'map': ['.skp']}]}, 'map 应为'),
+    ({'jobs': [{'root': 'a', 'map': {'.skp': ' '}}]}, 'map 应为'),
+    ({'jobs': [{'root': 'a', 'tags': 'SU'}]}, 'tags 应为列表'),
+    ({'jobs': [{'root': 'a', 'tags': [5]}]}, '第 1 个作业: 无效的标签规则'),
+    ({'jobs': [{'root': 'a', 'priority': True}]}, 'priority 的类型不正确'),
+    ({'jobs': [{'root': 'a', 'priority': '10'}]}, 'priority 的类型不正确'),
+    ({'jobs': [{'root': 'a', 'recursive': 1}]}, 'recursive 的类型不正确'),
+    ({'jobs': [{'root': 'a', 'exclude': [1]}]}, '第 1 个作业: exclude 应为字符串或字符串列表'),
+])
+def test_invalid_manifest(tmp_path, manifest, message):
+    path = write_manifest(tmp_path, manifest)
+    with pytest.raises(ValueError, match=message):
+        load_manifest(path)
@@ -0,0 +1,111 @@
+import os
+
+from yaya.engine import RenameEngine
+from yaya.journal import RenameJournal, read_journal
+
+from conftest import GBK_NAME
+
+
+def test_record_name_not_utf8(tmp_path):
+    path = str(tmp_path / 'j.jsonl')
+    with RenameJournal(path, 'prefix', batch_size=1) as journal:
+        journal.record('/d', GBK_NAME, 'P ' + GBK_NAME)
+        journal.record('/d', 'a.zip', 'P a.zip')
+    header, by_directory = read_journal(path)
+    assert header['operation'] == 'prefix'
+    assert by_directory['/d'] == [(GBK_NAME, 'P ' + GBK_NAME), ('a.zip', 'P a.zip')]
+
+
+def test_failed_batch_is_not_retried(tmp_path):
+    path = str(tmp_path / 'j.jsonl')
+    journal = RenameJournal(path, 'prefix', batch_size=1, fsync=False)
+    real = journal._file
+    journal._file = open(os.devnull, 'r')
+    try:
+        journal.record('/d', 'a', 'b')
+    except OSError:
+        pass
+    journal._file.close()
+    journal._file = real
+    journal.record('/d', 'c', 'd')
+    journal.close()
+    assert read_journal(path)[1]['/d'] == [('c', 'd')]
+
+
+def test_prefix_and_undo_name_not_utf8(gbk_dir, tmp_path):
+    messages = []
+    engine = RenameEngine(journal_dir=str(tmp_path / 'journals'), log=messages.append)
+    stats = engine.prefix(gbk_dir, 'P')
+    assert (stats.renamed, stats.errors) == (2, 0)
+    assert sorted(os.listdir(gbk_dir)) == sorted(['P ' + GBK_NAME, 'P normal.zip'])
+    assert engine.last_journal is not None
+
+    stats = engine.undo(engine.last_journal)
+    assert (stats.renamed, stats.errors) == (2, 0)
+    assert sorted(os.listdir(gbk_dir)) == sorted([GBK_NAME, 'normal.zip'])
+    assert not [m for m in messages if '出错' in m]
+
+
+def test_apply_moves_survives_journal_error(tmp_path):
+    from yaya.plan import apply_moves
+
+    class Broken:
+        def record(self, directory, old, new):
+            raise OSError('disk full')
+
+    (tmp_path / 'a').write_text('x')
+    messages = []
+    result = apply_moves(str(tmp_path), [('a', 'b', 'a')], messages.append, journal=Broken())
+    assert result.renamed == 1
+    assert os.path.exists(str(tmp_path / 'b'))
+    assert any('撤销记录' in m for m in messages)
+
+
+def test_undo_cycle_and_chain(tmp_path):
+    from yaya.plan import RenamePlan
+
+    d = str(tmp_path / 'd')
+    os.mkdir(d)
+    for name in ('a.zip', 'b.zip', 'x.zip', 'y.zip'):
+        with open(os.path.join(d, name), 'w') as f:
+            f.write(name)
+    plan = RenamePlan()
+    # 循环 a <-> b，链 x -> y -> z
+    for old, new in (('a.zip', 'b.zip'), ('b.zip', 'a.zip'), ('x.zip', 'y.zip'),
+                     ('y.zip', 'z.zip')):
+        plan.add(os.path.join(d, old), new, check_exists=False)
+    messages = []
+    engine = RenameEngine(journal_dir=str(tmp_path / 'journals'), log=messages.append)
+    stats = engine.apply(plan)
+    assert (stats.renamed, stats.errors, stats.skipped) == (4, 0, 0)
+    assert open(os.path.join(d, 'a.zip')).read() == 'b.zip'
+
+    del messages[:]
+    stats = engine.undo(engine.last_journal)
+    # 每个文件计一次，日志中不出现临时名称
+    assert (stats.total, stats.renamed, stats.errors) == (4, 4, 0)
+    undone = sorted(m for m in messages if m.startswith('已撤销'))
+    assert undone == ['已撤销: a.zip -> b.zip', '已撤销: b.zip -> a.zip',
+                      '已撤销: y.zip -> x.zip', '已撤销: z.zip -> y.zip']
+    for name in ('a.zip', 'b.zip', 'x.zip', 'y.zip'):
+        assert open(os.path.join(d, name)).read() == name
+
+
+def test_journal_written_after_each_directory(tmp_path):
+    journals = str(tmp_path / 'journals')
+    for sub in ('one', 'two'):
+        os.mkdir(str(tmp_path / sub))
+        open(str(tmp_path / sub / 'a.zip'), 'w').close()
+    seen = []
+
+    def log(message):
+        # 开始第二个目录时，第一个目录的记录已经在磁盘上
+        if message.startswith('已添加') and not seen:
+            seen.append(None)
+        elif message.startswith('已添加'):
+            (name,) = os.listdir(journals)
+            seen.append(read_journal(os.path.join(journals, name))[1])
+
+    engine = RenameEngine(journal_dir=journals, log=log, threads=1, recursive=True)
+    assert engine.prefix(str(tmp_path), 'P').renamed == 2
+    assert len(seen) == 2 and len(seen[1]) == 1
@@ -0,0 +1,76 @@
+import io
+import os
+import sys
+import zipfile
+
+import pytest
+
+from yaya.cache import ArchiveCache
+from yaya.engine import DEFAULT_EXT_TAG_MAP, get_tag_from_content
+from yaya.nested import NestedOptions
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'rar')
+
+
+@pytest.fixture
+def outer(tmp_path):
+    """outer.zip > inner.zip > plan.dwg"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as z:
+        z.writestr('plan.dwg', b'x' * 1000)
+    path = str(tmp_path / 'outer.zip')
+    with zipfile.ZipFile(path, 'w') as z:
+        z.writestr('inner.zip', buffer.getvalue())
+    return path
+
+
+@pytest.mark.parametrize('options', [
+    NestedOptions(1, timeout=0),
+    NestedOptions(1, max_bytes=10),
+], ids=['timeout', 'skipped'])
+def test_truncated_walk_is_not_cached_as_complete(outer, tmp_path, options):
+    cache = ArchiveCache(str(tmp_path / 'cache.db'))
+    messages = []
+    try:
+        assert get_tag_from_content(outer, DEFAULT_EXT_TAG_MAP, messages.append, cache,
+                                    nested=options) is None
+        assert any('预算' in m for m in messages)
+        cache.flush()
+        assert get_tag_from_content(outer, DEFAULT_EXT_TAG_MAP, cache=cache,
+                                    nested=NestedOptions(1)) == 'CAD'
+    finally:
+        cache.close()
+
+
+def test_complete_walk_is_cached(outer, tmp_path):
+    cache = ArchiveCache(str(tmp_path / 'cache.db'))
+    try:
+        assert get_tag_from_content(outer, {'.max': '3D'}, cache=cache,
+                                    nested=NestedOptions(1)) is None
+        cache.flush()
+        entry = cache.get(cache.fingerprint(outer))
+        assert entry.complete and entry.depth == 1
+    finally:
+        cache.close()
+
+
+def zip_with_rar(tmp_path, fixture):
+    """outer.zip > 不压缩存入的 RAR 测试文件"""
+    path = str(tmp_path / 'outer.zip')
+    with zipfile.ZipFile(path, 'w') as z:
+        z.write(os.path.join(FIXTURES, fixture), 'inner.rar')
+    return path
+
+
+@pytest.mark.parametrize('fixture', ['rar3-subdirs.rar', 'rar5-subdirs.rar'])
+def test_inner_rar_listed_without_rarfile(tmp_path, monkeypatch, fixture):
+    # 内层 rar 的成员列表按块头读取，不需要 rarfile 与 UnRAR
+    monkeypatch.setitem(sys.modules, 'rarfile', None)
+    outer = zip_with_rar(tmp_path, fixture)
+    assert get_tag_from_content(outer, {'.txt': 'TXT'}, nested=NestedOptions(1)) == 'TXT'
+    assert get_tag_from_content(outer, {'.txt': 'TXT'}) is None
+
+
+def test_inner_rar_with_encrypted_headers_is_skipped(tmp_path):
+    outer = zip_with_rar(tmp_path, 'rar5-hpsw.rar')
+    assert get_tag_from_content(outer, {'.txt': 'TXT'}, nested=NestedOptions(1)) is None
@@ -0,0 +1,68 @@
+import threading
+
+import pytest
+
+from yaya.engine import run_pipeline
+from yaya.jobs import JobPool
+from yaya.metrics import run_profiled
+
+
+class BrokenLimit:
+    """acquire 抛出异常，使工作线程意外退出"""
+
+    limit = 2
+
+    def acquire(self):
+        raise RuntimeError('broken')
+
+    def release(self, elapsed=None):
+        pass
+
+
+def run_with_timeout(func, timeout=30):
+    """在线程中运行 func，返回 (是否按时结束, 返回值或异常)"""
+    result = []
+
+    def target():
+        try:
+            result.append(func())
+        except Exception as e:
+            result.append(e)
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    return not thread.is_alive(), result[0] if result else None
+
+
+@pytest.mark.filterwarnings('ignore::pytest.PytestUnhandledThreadExceptionWarning')
+def test_pipeline_raises_when_workers_die():
+    finished, result = run_with_timeout(
+        lambda: run_pipeline(range(100), lambda item: False, workers=2, queue_size=2,
+                             limit=BrokenLimit()))
+    assert finished
+    assert isinstance(result, RuntimeError)
+
+
+@pytest.mark.filterwarnings('ignore::pytest.PytestUnhandledThreadExceptionWarning')
+def test_pool_raises_when_workers_die():
+    pool = JobPool(workers=2, limit=BrokenLimit(), queue_size=2)
+    finished, result = run_with_timeout(lambda: pool.run(range(100), lambda item: False))
+    assert finished
+    assert isinstance(result, RuntimeError)
+
+
+def test_profile_worker_threads(tmp_path):
+    import pstats
+
+    path = str(tmp_path / 'run.prof')
+
+    def work(item):
+        return item % 2 == 0
+
+    finished, stats = run_with_timeout(
+        lambda: run_profiled(lambda: run_pipeline(range(200), work, workers=3), path))
+    assert finished
+    assert (stats.total, stats.renamed) == (200, 100)
+    calls = [value[1] for key, value in pstats.Stats(path).stats.items() if key[2] == 'work']
+    assert calls == [200]
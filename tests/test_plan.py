@@ -0,0 +1,135 @@
+import gc
+import os
+import tracemalloc
+
+import pytest
+
+import yaya.plan
+from yaya.compact import GROWTH, RESOLVE_INDEX_BYTES, RESOLVE_PEAK_BYTES, RESOLVED_BYTES
+from yaya.plan import RenamePlan
+
+from conftest import GBK_NAME
+
+
+def make_files(directory, *names):
+    for name in names:
+        with open(os.path.join(directory, name), 'w') as f:
+            f.write(ascii(name))
+
+
+def contents(directory):
+    result = {}
+    for name in os.listdir(directory):
+        with open(os.path.join(directory, name)) as f:
+            result[name] = f.read()
+    return result
+
+
+def apply_all(plan):
+    renamed = 0
+    for directory in plan.directories():
+        renamed += plan.apply_directory(directory).renamed
+    return renamed
+
+
+def test_chain_and_cycle(tmp_path):
+    d = str(tmp_path)
+    make_files(d, 'a', 'b', 'x', 'y')
+    plan = RenamePlan()
+    # 链：a -> b -> c；循环：x <-> y
+    for old, new in (('a', 'b'), ('b', 'c'), ('x', 'y'), ('y', 'x')):
+        plan.add(os.path.join(d, old), new)
+    assert plan.resolve() == []
+    assert apply_all(plan) == 4
+    assert contents(d) == {'b': ascii('a'), 'c': ascii('b'), 'y': ascii('x'), 'x': ascii('y')}
+
+
+def test_conflicts(tmp_path):
+    d = str(tmp_path)
+    make_files(d, 'a', 'b', 'c', 'taken', 'e', 'f')
+    plan = RenamePlan()
+    for old, new in (('a', 'same'), ('b', 'same'), ('c', 'taken'), ('e', 'c'), ('f', 'g')):
+        plan.add(os.path.join(d, old), new)
+    conflicts = {entry.old: entry.conflict for entry in plan.resolve()}
+    assert conflicts['a'] == conflicts['b'] == '与其他 1 个文件的新文件名 same 重复'
+    assert conflicts['c'] == '目标文件 taken 已存在'
+    # c 无法移走，e 也无法改名为 c
+    assert conflicts['e'] == '目标文件 c 已存在'
+    assert set(conflicts) == {'a', 'b', 'c', 'e'}
+    assert apply_all(plan) == 1
+    assert sorted(os.listdir(d)) == ['a', 'b', 'c', 'e', 'g', 'taken']
+
+
+def test_duplicate_targets(tmp_path):
+    d = str(tmp_path)
+    make_files(d, 'a', 'b', 'c', 'd', 'x', 'y')
+    plan = RenamePlan()
+    # a、b、x 都改为 c；c 照常移走为 d 的原名，d 移走为 e
+    for old, new in (('a', 'c'), ('b', 'c'), ('x', 'c'), ('c', 'd'), ('d', 'e'), ('y', 'z')):
+        plan.add(os.path.join(d, old), new)
+    conflicts = {entry.old: entry.conflict for entry in plan.resolve()}
+    assert conflicts == dict.fromkeys('abx', '与其他 2 个文件的新文件名 c 重复')
+    assert apply_all(plan) == 3
+    assert contents(d) == {'a': ascii('a'), 'b': ascii('b'), 'x': ascii('x'),
+                           'd': ascii('c'), 'e': ascii('d'), 'z': ascii('y')}
+
+
+def scenario(directory):
+    """链、环、重复与目标已存在混合的计划，返回冲突说明与执行后的目录内容"""
+    make_files(directory, 'a', 'b', 'c', 'x', 'y', 'z', 'p', 'q', 'taken', 'm', 'n')
+    plan = RenamePlan()
+    for old, new in (('a', 'b'), ('b', 'c'), ('c', 'a2'), ('x', 'y'), ('y', 'z'), ('z', 'x'),
+                     ('p', 'same'), ('q', 'same'), ('m', 'taken'), ('n', 'm')):
+        plan.add(os.path.join(directory, old), new)
+    conflicts = sorted((entry.old, entry.conflict) for entry in plan.resolve())
+    return conflicts, apply_all(plan), contents(directory)
+
+
+@pytest.mark.parametrize('fake_hash', [lambda name: 0, lambda name: len(name) % 2],
+                         ids=['all-equal', 'two-buckets'])
+def test_hash_collisions(tmp_path, monkeypatch, fake_hash):
+    # 名称按哈希排序后比较，哈希相同时必须再比较名称本身
+    os.mkdir(str(tmp_path / 'real'))
+    os.mkdir(str(tmp_path / 'collide'))
+    expected = scenario(str(tmp_path / 'real'))
+    monkeypatch.setattr(yaya.plan, 'hash', fake_hash, raising=False)
+    assert scenario(str(tmp_path / 'collide')) == expected
+    conflicts, renamed, result = expected
+    assert [old for old, _ in conflicts] == ['m', 'n', 'p', 'q']
+    assert renamed == 6
+    assert result['a2'] == ascii('c') and result['x'] == ascii('z')
+
+
+def test_name_not_utf8(tmp_path):
+    d = str(tmp_path)
+    make_files(d, GBK_NAME, 'plain.zip')
+    plan = RenamePlan()
+    plan.add(os.path.join(d, GBK_NAME), 'plain.zip', check_exists=False)
+    plan.add(os.path.join(d, 'plain.zip'), GBK_NAME)
+    assert plan.resolve() == []
+    assert apply_all(plan) == 2
+    assert contents(d) == {GBK_NAME: ascii('plain.zip'), 'plain.zip': ascii(GBK_NAME)}
+
+
+def test_resolve_peak_memory():
+    count = 20000
+    d = os.path.join(os.sep, 'nonexistent', '目录')
+    plan = RenamePlan()
+    for i in range(count):
+        old = f'项目文件_{i:07d}.zip'
+        # 每 4 条中一条改为下一条的原名，构成链
+        new = f'项目文件_{i + 1:07d}.zip' if i % 4 == 0 else 'SU ' + old
+        plan.add(os.path.join(d, old), new, check_exists=False)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        assert plan.resolve() == []
+        (directory,) = plan.directories()
+        steps = sum(1 for _ in plan.moves(*plan._resolved[plan._directories.id(directory)]))
+        peak = tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+    assert steps == count
+    budget = (RESOLVED_BYTES + RESOLVE_INDEX_BYTES) * GROWTH + RESOLVE_PEAK_BYTES
+    assert peak / count < budget
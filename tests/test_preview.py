@@ -0,0 +1,117 @@
+import os
+
+import pytest
+
+from yaya.engine import SOURCE_CONTENT, SOURCE_FILENAME
+from yaya.plan import RenamePlan
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+QtWidgets = pytest.importorskip('PyQt5.QtWidgets')
+Qt = pytest.importorskip('PyQt5.QtCore').Qt
+
+D = os.path.join(os.sep, 'share', '项目')
+
+
+@pytest.fixture(scope='module')
+def app():
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+@pytest.fixture
+def model(app):
+    from YaYaDialogs import PreviewModel
+    return PreviewModel()
+
+
+def add(plan, old, new, source=SOURCE_CONTENT, directory=D):
+    plan.add(os.path.join(directory, old), new, check_exists=False, source=source)
+
+
+def column(model, col=0):
+    return [model.data(model.index(row, col)) for row in range(model.rowCount())]
+
+
+def test_refresh_inserts_new_entries(model):
+    inserted = []
+    model.rowsInserted.connect(lambda parent, first, last: inserted.append((first, last)))
+    plan = RenamePlan()
+    model.attach(plan)
+    assert model.rowCount() == 0
+    add(plan, 'a.zip', 'SU a.zip')
+    add(plan, 'b.zip', 'CAD b.zip', SOURCE_FILENAME)
+    # 计划在工作线程中增长，定时 refresh 后才显示
+    assert model.rowCount() == 0
+    model.refresh()
+    model.refresh()
+    assert inserted == [(0, 1)]
+    assert column(model, 1) == ['SU a.zip', 'CAD b.zip']
+    assert column(model, 2) == ['内容', '文件名']
+    assert column(model, 4) == [D, D]
+    assert model.columnCount() == 5
+    assert model.headerData(1, Qt.Horizontal) == '新文件名'
+    assert model.data(model.index(0, 0), Qt.ToolTipRole) == os.path.join(D, 'a.zip')
+
+
+def test_filter_and_sort(model):
+    plan = RenamePlan()
+    for name in ('b.zip', 'A.zip', 'c.rar'):
+        add(plan, name, 'SU ' + name)
+    model.attach(plan)
+    model.set_filter('ZIP')
+    assert column(model) == ['b.zip', 'A.zip']
+    model.sort(0)
+    assert column(model) == ['A.zip', 'b.zip']
+    model.sort(0, Qt.DescendingOrder)
+    assert column(model) == ['b.zip', 'A.zip']
+    # 过滤时新加入的条目只追加符合条件的，排在末尾
+    add(plan, 'd.rar', 'SU d.rar')
+    add(plan, 'e.zip', 'SU e.zip')
+    model.refresh()
+    assert column(model) == ['b.zip', 'A.zip', 'e.zip']
+    # 完成后按当前排序重新排列
+    model.finish()
+    assert column(model) == ['e.zip', 'b.zip', 'A.zip']
+    assert [entry.old for entry in model.entries([0, 2])] == ['e.zip', 'A.zip']
+    model.set_filter('')
+    model.sort(-1)
+    assert column(model) == ['b.zip', 'A.zip', 'c.rar', 'd.rar', 'e.zip']
+
+
+def test_conflicts(model, tmp_path):
+    d = str(tmp_path)
+    open(os.path.join(d, 'SU taken.zip'), 'wb').close()
+    plan = RenamePlan()
+    for old, new in (('taken.zip', 'SU taken.zip'), ('x.zip', 'SU same.zip'),
+                     ('y.zip', 'SU same.zip'), ('ok.zip', 'SU ok.zip')):
+        plan.add(os.path.join(d, old), new)
+    model.attach(plan)
+    # 规划完成前只知道目标是否已存在
+    assert [bool(text) for text in column(model, 3)] == [True, False, False, False]
+    assert model.counts() == (4, 1)
+    changed = []
+    model.dataChanged.connect(lambda first, last: changed.append((first.row(), last.row())))
+    plan.resolve()
+    model.finish()
+    assert changed == [(0, 3)]
+    assert [bool(text) for text in column(model, 3)] == [True, True, True, False]
+    assert model.counts() == (4, 3)
+    assert model.data(model.index(1, 0), Qt.ForegroundRole) == Qt.red
+    assert model.data(model.index(3, 0), Qt.ForegroundRole) is None
+    model.set_filter('', conflicts_only=True)
+    assert column(model) == ['taken.zip', 'x.zip', 'y.zip']
+    model.set_filter('Y', conflicts_only=True)
+    assert column(model) == ['y.zip']
+
+
+def test_attach_replaces_plan(model):
+    first = RenamePlan()
+    add(first, 'a.zip', 'SU a.zip')
+    model.attach(first)
+    model.set_filter('a')
+    second = RenamePlan()
+    add(second, 'b.zip', 'SU b.zip')
+    add(second, 'a.zip', 'SU a.zip')
+    model.attach(second)
+    # 不再使用上一个计划排序或过滤得到的下标，按加入顺序显示新计划
+    assert model.rowCount() == 2
+    assert column(model) == ['b.zip', 'a.zip']
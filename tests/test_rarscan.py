@@ -0,0 +1,143 @@
+import os
+import shutil
+import tarfile
+
+import pytest
+
+from yaya import engine
+from yaya.rarscan import RarFormatError, _vint, iter_rar_entries, next_volume
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'rar')
+
+SUBDIRS = [('sub/dir2/file2.txt', 6), ('sub/with space/long fn.txt', 8),
+           ('sub/üȵĩöḋè/file.txt', 5), ('sub/dir1/file1.txt', 6)]
+SOLID = [('stest1.txt', 2048), ('stest2.txt', 2048)]
+VOLUMES = [('vols/bigfile.txt', 205000), ('vols/smallfile.txt', 2050)]
+
+
+def fixture(name):
+    return os.path.join(FIXTURES, name)
+
+
+def volumes(tmp_path, name):
+    """解开 name.tar.gz 中的一组分卷，返回第一卷的路径"""
+    with tarfile.open(fixture(name + '.tar.gz')) as tar:
+        names = tar.getnames()
+        if hasattr(tarfile, 'data_filter'):
+            tar.extractall(str(tmp_path), filter='data')
+        else:
+            tar.extractall(str(tmp_path))
+    return str(tmp_path / min(names, key=lambda n: (not n.endswith('.rar'), n)))
+
+
+@pytest.mark.parametrize('name, expected', [
+    ('rar3-subdirs.rar', SUBDIRS),
+    ('rar5-subdirs.rar', SUBDIRS),
+    ('rar3-solid.rar', SOLID),
+    ('rar5-solid.rar', SOLID),
+    # 同名文件的旧版本只报告最新的一个
+    ('rar3-versions.rar', [('versioned.txt', 2)]),
+    ('rar5-versions.rar', [('versioned.txt', 2)]),
+    # RAR 3.x 的 Unicode 文件名编码，含 BMP 之外的字符
+    ('unicode.rar', [('уииоотивл.txt', 2), ('𝐀𝐁𝐁𝐂.txt', 2)]),
+])
+def test_entries(name, expected):
+    assert list(iter_rar_entries(fixture(name))) == expected
+    with open(fixture(name), 'rb') as f:
+        assert list(iter_rar_entries(f)) == expected
+
+
+@pytest.mark.parametrize('name', ['rar3-vols', 'rar5-vols', 'rar3-old'])
+def test_volumes(tmp_path, name):
+    first = volumes(tmp_path, name)
+    # 跨卷的文件只报告一次
+    assert list(iter_rar_entries(first)) == VOLUMES
+    assert engine.list_member_entries(first, '.rar') == VOLUMES
+
+
+def test_missing_volume(tmp_path):
+    first = volumes(tmp_path, 'rar5-vols')
+    os.remove(str(tmp_path / 'rar5-vols.part3.rar'))
+    with pytest.raises(RarFormatError):
+        list(iter_rar_entries(first))
+
+
+def test_next_volume():
+    assert next_volume('/d/x.part1.rar') == '/d/x.part2.rar'
+    assert next_volume('/d/x.part09.rar') == '/d/x.part10.rar'
+    assert next_volume('/d/x.rar', False) == '/d/x.r00'
+    assert next_volume('/d/x.r00', False) == '/d/x.r01'
+    assert next_volume('/d/x.r99', False) == '/d/x.s00'
+
+
+@pytest.mark.parametrize('name', ['rar3-comment-hpsw.rar', 'rar5-hpsw.rar'])
+def test_encrypted_headers(name):
+    with pytest.raises(RarFormatError):
+        list(iter_rar_entries(fixture(name)))
+    # 改用 rarfile：没有密码读不出任何文件名
+    assert list(engine.iter_rar_members(fixture(name))) == []
+
+
+@pytest.mark.parametrize('name, offset', [
+    # 文件头中的文件名
+    ('rar3-subdirs.rar', 60),
+    ('rar5-subdirs.rar', 70),
+])
+def test_header_crc(tmp_path, name, offset):
+    path = str(tmp_path / name)
+    shutil.copy(fixture(name), path)
+    with open(path, 'r+b') as f:
+        f.seek(offset)
+        byte = f.read(1)
+        f.seek(offset)
+        f.write(bytes([byte[0] ^ 0xff]))
+    with pytest.raises(RarFormatError):
+        list(iter_rar_entries(path))
+
+
+def test_truncated(tmp_path):
+    path = str(tmp_path / 'cut.rar')
+    with open(fixture('rar5-subdirs.rar'), 'rb') as f:
+        data = f.read()
+    with open(path, 'wb') as f:
+        f.write(data[:100])
+    with pytest.raises(RarFormatError):
+        list(iter_rar_entries(path))
+
+
+def test_vint():
+    assert _vint(b'\x05', 0) == (5, 1)
+    assert _vint(b'\x00\xff\x01', 1) == (255, 3)
+    assert _vint(b'\x80\x80\x01', 0) == (1 << 14, 3)
+    with pytest.raises(RarFormatError):
+        _vint(b'\x80', 0)
+    with pytest.raises(RarFormatError):
+        _vint(b'\xff' * 10, 0)
+
+
+def test_fallback_old_format():
+    # RAR 1.5 的块头校验方式不同，直接读取失败后改用 rarfile
+    with pytest.raises(RarFormatError):
+        list(iter_rar_entries(fixture('rar15-comment.rar')))
+    assert list(engine.iter_rar_members(fixture('rar15-comment.rar'))) == [
+        ('FILE1.TXT', 7), ('FILE2.TXT', 8)]
+
+
+@pytest.mark.parametrize('source', ['path', 'stream'])
+def test_fallback_after_partial_read(monkeypatch, source):
+    """直接读取产出部分成员后出错，rarfile 补齐其余成员，不重复也不依赖成员顺序"""
+    def partial(source):
+        # 先产出 rarfile 列表中的最后一个成员，再报错
+        yield SUBDIRS[-1]
+        raise RarFormatError('块头损坏')
+
+    monkeypatch.setattr(engine, 'iter_rar_entries', partial)
+    path = fixture('rar5-subdirs.rar')
+    if source == 'path':
+        entries = list(engine.iter_rar_members(path))
+    else:
+        with open(path, 'rb') as f:
+            f.seek(50)
+            entries = list(engine.iter_rar_members(f))
+    assert entries[0] == SUBDIRS[-1]
+    assert sorted(entries) == sorted(SUBDIRS)
@@ -0,0 +1,121 @@
+import inspect
+import os
+import sys
+
+import pytest
+
+from yaya.scanner import accepts_file, iter_archives
+
+
+def make_tree(root, *paths):
+    for path in paths:
+        full = os.path.join(root, *path.split('/'))
+        os.makedirs(os.path.dirname(full), exist_ok=True)
+        open(full, 'wb').close()
+
+
+def scan(root, *args, **kwargs):
+    return sorted(os.path.relpath(p, root).replace(os.sep, '/')
+                  for p in iter_archives(root, *args, **kwargs))
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = str(tmp_path)
+    make_tree(root, 'a.zip', 'b.RAR', 'notes.txt', 'sub/c.7z', 'sub/deep/d.zip',
+              'sub/deep/deeper/e.zip', 'skip/f.zip', 'skip.zip')
+    return root
+
+
+def test_flat_scan(tree):
+    assert scan(tree, ('.zip', '.rar')) == ['a.zip', 'b.RAR', 'skip.zip']
+
+
+def test_recursive_scan_and_depth(tree):
+    exts = ('.zip', '.rar', '.7z')
+    assert scan(tree, exts, True) == ['a.zip', 'b.RAR', 'skip.zip', 'skip/f.zip', 'sub/c.7z',
+                                      'sub/deep/d.zip', 'sub/deep/deeper/e.zip']
+    assert scan(tree, exts, True, 1) == ['a.zip', 'b.RAR', 'skip.zip', 'skip/f.zip', 'sub/c.7z']
+    assert scan(tree, exts, True, 0) == scan(tree, exts)
+
+
+def test_accept_function_and_all_files(tree):
+    assert scan(tree, lambda name: name.startswith('n')) == ['notes.txt']
+    assert scan(tree, None) == ['a.zip', 'b.RAR', 'notes.txt', 'skip.zip']
+
+
+def test_include_and_exclude(tree):
+    # exclude 同时作用于子目录
+    assert scan(tree, ('.zip',), True, exclude=['skip*']) == ['a.zip', 'sub/deep/d.zip',
+                                                             'sub/deep/deeper/e.zip']
+    assert scan(tree, None, True, include=['*.7z', 'a.*']) == ['a.zip', 'sub/c.7z']
+
+
+def test_files_before_subdirectories_in_listing_order(tmp_path):
+    root = str(tmp_path)
+    make_tree(root, 'x/1.zip', 'x/y/2.zip', 'x/z/3.zip', 'top.zip')
+    paths = [os.path.relpath(p, root).replace(os.sep, '/')
+             for p in iter_archives(root, ('.zip',), True)]
+    assert paths[0] == 'top.zip'
+    assert paths.index('x/1.zip') < paths.index('x/y/2.zip')
+    assert paths.index('x/1.zip') < paths.index('x/z/3.zip')
+
+
+def test_deeper_than_recursion_limit(tmp_path):
+    # 显式栈：目录层数超过解释器的递归上限也能扫描
+    path = str(tmp_path)
+    for _ in range(300):
+        path = os.path.join(path, 'd')
+        os.mkdir(path)
+    open(os.path.join(path, 'bottom.zip'), 'wb').close()
+    depth = len(inspect.stack(0))
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(depth + 100)
+    try:
+        (found,) = iter_archives(str(tmp_path), ('.zip',), True)
+    finally:
+        sys.setrecursionlimit(limit)
+    assert found == os.path.join(path, 'bottom.zip')
+
+
+@pytest.mark.skipif(not hasattr(os, 'symlink') or sys.platform == 'win32',
+                    reason='需要符号链接')
+def test_symlinked_directories_not_followed(tmp_path):
+    root = str(tmp_path / 'root')
+    make_tree(root, 'real/a.zip')
+    os.symlink(os.path.join(root, 'real'), os.path.join(root, 'link'))
+    assert scan(root, ('.zip',), True) == ['real/a.zip']
+
+
+def test_unreadable_subdirectory_is_skipped(tree, monkeypatch):
+    real = os.scandir
+    blocked = os.path.join(tree, 'sub')
+
+    def scandir(path):
+        if path == blocked:
+            raise PermissionError(13, 'denied', path)
+        return real(path)
+
+    monkeypatch.setattr(os, 'scandir', scandir)
+    assert scan(tree, ('.zip',), True) == ['a.zip', 'skip.zip', 'skip/f.zip']
+    with pytest.raises(OSError):
+        list(iter_archives(blocked, ('.zip',)))
+
+
+def test_snapshot_lists_directory_before_yielding(tmp_path):
+    root = str(tmp_path)
+    make_tree(root, *[f'{i}.zip' for i in range(50)])
+    seen = []
+    for path in iter_archives(root, ('.zip',), snapshot=True):
+        seen.append(path)
+        directory, name = os.path.split(path)
+        os.rename(path, os.path.join(directory, 'SU ' + name))
+    assert len(seen) == len(set(seen)) == 50
+
+
+def test_accepts_file():
+    assert accepts_file('a.zip', lambda n: n.endswith('.zip'))
+    assert not accepts_file('a.rar', lambda n: n.endswith('.zip'))
+    assert not accepts_file('a.zip', exclude=['a.*'])
+    assert accepts_file('a.zip', include=['*.zip'])
+    assert not accepts_file('a.zip', include=['*.rar'])
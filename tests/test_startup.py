@@ -0,0 +1,46 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 与 yaya.bench 的 --startup 检查相同：这些模块只在需要时导入
+HEAVY_MODULES = ('PyQt5', 'py7zr', 'rarfile', 'sqlite3')
+
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+import %s
+elapsed = time.perf_counter() - start
+print(json.dumps({'ms': elapsed * 1000,
+                  'loaded': sorted(m for m in json.loads(sys.argv[1]) if m in sys.modules)}))
+"""
+
+
+def import_in_child(module, lazy):
+    """在新进程中导入 module，返回耗时（毫秒）与 lazy 中已被加载的模块"""
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(p for p in (ROOT, env.get('PYTHONPATH')) if p)
+    out = subprocess.run([sys.executable, '-c', CHILD % module, json.dumps(lazy)], env=env,
+                         cwd=ROOT, stdout=subprocess.PIPE, check=True)
+    return json.loads(out.stdout)
+
+
+def test_cli_import_is_lazy():
+    result = import_in_child('yaya.cli', HEAVY_MODULES)
+    assert result['loaded'] == []
+    # 本机约 15 毫秒，上限留足余量，只拦截明显的退化
+    assert result['ms'] < 1000
+
+
+def test_gui_import_is_lazy():
+    pytest.importorskip('PyQt5.QtWidgets')
+    # 对话框与预览表格在打开时才导入
+    lazy = ('YaYaDialogs',) + HEAVY_MODULES[1:]
+    result = import_in_child('YaYaRename', lazy)
+    assert result['loaded'] == []
+    # 本机约 100 毫秒（其中 PyQt5 约 65 毫秒）
+    assert result['ms'] < 3000
@@ -0,0 +1,92 @@
+import pytest
+
+from yaya.engine import DEFAULT_TAGS
+from yaya.tags import TagMatcher, TagRule
+
+
+@pytest.fixture
+def default():
+    return TagMatcher(DEFAULT_TAGS)
+
+
+@pytest.mark.parametrize('filename, tag', [
+    ('SU 别墅.zip', 'SU'),
+    ('别墅SU.zip', 'SU'),
+    ('模型3D.rar', '3D'),
+    ('SU_别墅.zip', 'SU'),
+    ('(CAD)平面.zip', 'CAD'),
+    # 整词匹配：前后紧挨英文字母或数字时不算
+    ('SUMMER house.zip', None),
+    ('ASU.zip', None),
+    ('SU2 别墅.zip', None),
+    ('x3D.zip', None),
+    ('CADX.zip', None),
+    ('普通文件.zip', None),
+])
+def test_default_tags_match_whole_words(default, filename, tag):
+    assert default.match(filename) == tag
+
+
+def test_word_false_matches_substrings():
+    matcher = TagMatcher([{'tag': 'SU', 'word': False}])
+    assert matcher.match('SUMMER.zip') == 'SU'
+    assert matcher.match('ASU.zip') == 'SU'
+
+
+def test_same_priority_takes_first_position(default):
+    # 与原来按 ['3D', 'SU', 'CAD'] 顺序查找不同：优先级相同时取文件名中最靠前的
+    assert default.match('SU 3D.zip') == 'SU'
+    assert default.match('CAD SU.zip') == 'CAD'
+
+
+def test_priority_wins_over_position():
+    matcher = TagMatcher(['SU', {'tag': 'CAD', 'priority': 5}, {'tag': '3D', 'priority': 1}])
+    assert matcher.match('SU 3D CAD.zip') == 'CAD'
+    assert matcher.match('SU 3D.zip') == '3D'
+    assert matcher.match('SU.zip') == 'SU'
+
+
+def test_case_rules():
+    matcher = TagMatcher(['SU', {'tag': 'CAD', 'case_sensitive': False,
+                                 'aliases': ['AutoCAD']}])
+    # 默认区分大小写
+    assert matcher.match('su 别墅.zip') is None
+    assert matcher.match('cad 平面.zip') == 'CAD'
+    assert matcher.match('autocad 平面.zip') == 'CAD'
+
+
+def test_aliases_and_longest_match():
+    matcher = TagMatcher([{'tag': 'SU', 'aliases': ['SketchUp', 'Sketch']}, 'Sketch2'])
+    assert matcher.match('SketchUp 模型.zip') == 'SU'
+    assert matcher.match('Sketch 模型.zip') == 'SU'
+    assert matcher.match('Sketch2 模型.zip') == 'Sketch2'
+    assert matcher.tags == ['SU', 'Sketch2']
+
+
+def test_later_rule_replaces_same_tag():
+    matcher = TagMatcher([{'tag': 'SU', 'aliases': ['SketchUp']}, 'SU'])
+    assert len(matcher) == 1
+    assert matcher.match('SketchUp.zip') is None
+
+
+def test_strip_prefix(default):
+    assert default.strip_prefix('SU  别墅.zip') == '别墅.zip'
+    assert default.strip_prefix('3D别墅.zip') == '别墅.zip'
+    # 原来的 ^(3D|SU|CAD)\s* 会把 SUMMER 改成 MMER
+    assert default.strip_prefix('SUMMER.zip') == 'SUMMER.zip'
+    assert default.strip_prefix('别墅 SU.zip') == '别墅 SU.zip'
+    matcher = TagMatcher([{'tag': 'SU', 'aliases': ['SketchUp']}])
+    # 别名不算已有的标签
+    assert matcher.strip_prefix('SketchUp 别墅.zip') == 'SketchUp 别墅.zip'
+
+
+def test_empty_matcher():
+    matcher = TagMatcher()
+    assert matcher.match('SU.zip') is None
+    assert matcher.strip_prefix('SU.zip') == 'SU.zip'
+
+
+@pytest.mark.parametrize('value', ['', {'tag': ''}, {'tag': 'SU', 'colour': 'red'}, 3])
+def test_invalid_rules(value):
+    with pytest.raises(ValueError):
+        TagRule.parse(value)
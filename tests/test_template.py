@@ -0,0 +1,90 @@
+import re
+from datetime import datetime
+
+import pytest
+
+from yaya.template import DEFAULT_TEMPLATE, RenameTemplate, TemplateError
+
+NOW = datetime(2024, 3, 5, 14, 7, 9)
+# 2024-01-02 的本地时间
+MTIME = datetime(2024, 1, 2, 8, 0).timestamp()
+
+
+def render(text, filename='a.zip', tag=None, mtime=None, counter=None, **options):
+    return RenameTemplate(text, now=NOW, **options).render(filename, tag, mtime, counter)
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('{tag} {stem}{ext}', 'SU 别墅.zip'),
+    ('{name}.bak', '别墅.zip.bak'),
+    ('{prefix}-{stem}-{suffix}{ext}', 'P-别墅-S.zip'),
+    ('{date}_{stem}{ext}', '20240305_别墅.zip'),
+    ('{time} {datetime} {date:%Y-%m-%d}{ext}', '140709 20240305_140709 2024-03-05.zip'),
+    ('{mtime} {stem}{ext}', '20240102 别墅.zip'),
+    ('{mtime:%y.%m} {stem}{ext}', '24.01 别墅.zip'),
+    ('{counter:03} {stem}{ext}', '007 别墅.zip'),
+])
+def test_fields(text, expected):
+    assert render(text, '别墅.zip', 'SU', MTIME, 7, prefix='P', suffix='S') == expected
+
+
+@pytest.mark.parametrize('tag, prefix, suffix, expected', [
+    ('SU', 'P', 'S', 'SU P 别墅 S.zip'),
+    (None, 'P', 'S', 'P 别墅 S.zip'),
+    ('SU', '', 'S', 'SU 别墅 S.zip'),
+    ('SU', 'P', '', 'SU P 别墅.zip'),
+    (None, '', '', '别墅.zip'),
+])
+def test_empty_fields_drop_one_space(tag, prefix, suffix, expected):
+    assert render(DEFAULT_TEMPLATE, '别墅.zip', tag, prefix=prefix, suffix=suffix) == expected
+
+
+def test_empty_field_between_other_separators():
+    assert render('{stem}_{tag}{ext}', 'a.zip') == 'a_.zip'
+    assert render('[{tag}] {stem}{ext}', 'a.zip') == '[] a.zip'
+    # 没有修改时间时 {mtime} 为空
+    assert render('{stem} {mtime}{ext}', 'a.zip') == 'a.zip'
+
+
+def test_counter_defaults_to_start():
+    assert render('{counter} {name}', counter_start=5) == '5 a.zip'
+
+
+def test_existing_tag_is_replaced():
+    template = RenameTemplate('{tag} {stem}{ext}', tag_pattern=re.compile(r'^(?:SU|CAD)\s*'))
+    assert template.render('CAD 别墅.zip', 'SU') == 'SU 别墅.zip'
+    assert template.uses_tag and not template.uses_counter and not template.uses_mtime
+
+
+@pytest.mark.parametrize('text', ['{nope}{ext}', '{stem!r}', '{stem', 'a}b'])
+def test_invalid_templates(text):
+    with pytest.raises(TemplateError):
+        RenameTemplate(text)
+
+
+@pytest.mark.parametrize('text, options', [
+    ('{stem}: {ext}', {}),
+    ('{stem}?{ext}', {}),
+    ('{date:%H:%M} {name}', {}),
+    ('{mtime:%Y/%m} {name}', {}),
+    ('{counter:*>4} {name}', {}),
+    ('{prefix} {name}', {'prefix': 'a|b'}),
+    ('{name} {suffix}', {'suffix': '"final"'}),
+    ('<{name}>', {}),
+    ('{stem}\\{ext}', {}),
+    ('{stem}\t{ext}', {}),
+])
+def test_windows_invalid_characters_rejected(text, options):
+    with pytest.raises(TemplateError):
+        RenameTemplate(text, **options)
+
+
+def test_invalid_characters_in_tag_rejected():
+    template = RenameTemplate('{tag} {name}')
+    with pytest.raises(TemplateError):
+        template.render('a.zip', 'S:U')
+
+
+def test_empty_result_rejected():
+    with pytest.raises(TemplateError):
+        render('{tag}', 'a.zip')
@@ -0,0 +1,119 @@
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+from yaya.engine import RenameEngine
+from yaya.volumes import VolumeSet, group_volumes, is_volume_name, open_volumes, parse_volume
+
+from conftest import write_zip
+
+D = os.path.join(os.sep, 'share', '项目')
+
+
+@pytest.mark.parametrize('name, expected', [
+    ('x.part1.rar', ('part', 'x', 1, '.rar')),
+    ('x.PART02.RAR', ('part', 'x', 2, '.rar')),
+    ('x.7z.001', ('split', 'x', 1, '.7z')),
+    ('x.ZIP.002', ('split', 'x', 2, '.zip')),
+    ('x.r00', ('rar-old', 'x', 0, '.rar')),
+    ('x.z01', ('zip-old', 'x', 1, '.zip')),
+    ('x.rar', None),
+    ('x.zip', None),
+    ('x.7z.1', None),
+    ('x.part.rar', None),
+])
+def test_parse_volume(name, expected):
+    assert parse_volume(name) == expected
+    assert is_volume_name(name) == (expected is not None)
+
+
+def group(*names, directory=D):
+    return list(group_volumes(os.path.join(directory, name) for name in names))
+
+
+def summary(items):
+    """路径原样返回，VolumeSet 记为 (分卷方式, 读取的分卷, [各卷])"""
+    return [item if isinstance(item, str)
+            else (item.family, item.head[1], [name for _, name, _ in item.volumes])
+            for item in items]
+
+
+def test_plain_files_pass_through():
+    assert group('a.zip', 'b.7z', 'c.rar') == [os.path.join(D, name)
+                                               for name in ('b.7z', 'a.zip', 'c.rar')]
+
+
+@pytest.mark.parametrize('order', [('x.rar', 'x.r00', 'x.r01'), ('x.r01', 'x.r00', 'x.rar')])
+def test_old_rar_head_found_in_listing(order):
+    # 路径都不存在：是否为分卷只看路径流中的文件名，不查询文件系统
+    assert summary(group(*order)) == [('rar-old', 'x.rar', ['x.rar', 'x.r00', 'x.r01'])]
+
+
+def test_old_zip_head_is_read_last():
+    (volumes,) = group('x.z02', 'x.ZIP', 'x.z01')
+    assert summary([volumes]) == [('zip-old', 'x.ZIP', ['x.z01', 'x.z02', 'x.ZIP'])]
+    assert volumes.name == 'x.zip'
+    assert volumes.path == os.path.join(D, 'x.ZIP')
+
+
+def test_mixed_directory():
+    items = group('a.zip', 'y.part2.rar', 's.7z.001', 'y.part1.rar', 'b.rar', 's.7z.002',
+                  'x.r00', 'x.rar')
+    assert summary(items) == [
+        os.path.join(D, 'a.zip'),
+        os.path.join(D, 'b.rar'),
+        ('part', 'y.part1.rar', ['y.part1.rar', 'y.part2.rar']),
+        ('split', 's.7z.001', ['s.7z.001', 's.7z.002']),
+        ('rar-old', 'x.rar', ['x.rar', 'x.r00']),
+    ]
+
+
+def test_directories_are_grouped_separately():
+    other = os.path.join(D, '子目录')
+    paths = [os.path.join(D, 'x.r00'), os.path.join(other, 'x.rar'), os.path.join(other, 'y.zip')]
+    assert summary(group_volumes(paths)) == [
+        ('rar-old', 'x.r00', ['x.r00']),
+        os.path.join(other, 'x.rar'),
+        os.path.join(other, 'y.zip'),
+    ]
+
+
+def test_renames_keep_volume_suffixes():
+    (volumes,) = group('x.part1.rar', 'x.part2.rar')
+    assert isinstance(volumes, VolumeSet) and volumes.name == 'x.rar'
+    assert volumes.renames('SU x.rar') == [(os.path.join(D, 'x.part1.rar'), 'SU x.part1.rar'),
+                                           (os.path.join(D, 'x.part2.rar'), 'SU x.part2.rar')]
+    (old,) = group('x.zip', 'x.z01')
+    assert [new for _, new in old.renames('SU x.zip')] == ['SU x.z01', 'SU x.zip']
+
+
+def test_open_volumes_reads_split_zip(tmp_path):
+    data = open(write_zip(str(tmp_path / 'whole.zip'), 'plan.dwg', 'model.skp'), 'rb').read()
+    paths = []
+    for i, start in enumerate(range(0, len(data), 100)):
+        path = str(tmp_path / f'x.zip.{i + 1:03d}')
+        with open(path, 'wb') as f:
+            f.write(data[start:start + 100])
+        paths.append(path)
+    with open_volumes(paths) as f:
+        assert f.read() == data
+        f.seek(-10, os.SEEK_END)
+        assert f.read() == data[-10:]
+        f.seek(95)
+        assert f.read(10) == data[95:105]
+        with zipfile.ZipFile(f) as z:
+            assert z.namelist() == ['plan.dwg', 'model.skp']
+
+
+def test_tag_renames_old_rar_set_together(tmp_path):
+    fixture = os.path.join(os.path.dirname(__file__), 'fixtures', 'rar', 'rar3-old.tar.gz')
+    with tarfile.open(fixture) as tar:
+        names = tar.getnames()
+        tar.extractall(str(tmp_path))
+    engine = RenameEngine({'.txt': 'TXT'}, threads=2)
+    stats = engine.tag(str(tmp_path))
+    # 整组只识别一次，每个分卷各计一次重命名
+    assert (stats.renamed, stats.errors) == (3, 0)
+    assert sorted(os.listdir(str(tmp_path))) == sorted('TXT ' + name for name in names)
@@ -0,0 +1,114 @@
+import os
+import threading
+import time
+
+from yaya.control import RunControl
+from yaya.engine import RenameEngine
+from yaya.watch import Debouncer, PollingWatcher, volume_key, watch, with_volume_siblings
+
+from conftest import write_zip
+
+
+def touch(path, data=b'x'):
+    with open(path, 'ab') as f:
+        f.write(data)
+    return path
+
+
+def test_debouncer_waits_until_settled(tmp_path):
+    path = touch(str(tmp_path / 'a.zip'))
+    debouncer = Debouncer(settle=2)
+    debouncer.touch(path, now=100)
+    assert debouncer.ready(now=101) == []
+    # 仍在写入：从最近一次变化重新计时
+    touch(path)
+    assert debouncer.ready(now=101.5) == []
+    assert debouncer.ready(now=103) == []
+    assert debouncer.ready(now=103.5) == [path]
+    assert len(debouncer) == 0
+
+
+def test_debouncer_drops_removed_files(tmp_path):
+    path = touch(str(tmp_path / 'a.zip'))
+    debouncer = Debouncer(settle=0)
+    debouncer.touch(path, now=0)
+    os.remove(path)
+    assert debouncer.ready(now=10) == []
+    assert len(debouncer) == 0
+
+
+def test_debouncer_holds_volume_set_while_one_part_changes(tmp_path):
+    first = touch(str(tmp_path / 'x.part1.rar'))
+    second = touch(str(tmp_path / 'x.part2.rar'))
+    other = touch(str(tmp_path / 'y.zip'))
+    debouncer = Debouncer(settle=1)
+    for path in (first, second, other):
+        debouncer.touch(path, now=0)
+    debouncer.touch(second, now=5)
+    assert debouncer.ready(now=5.5) == [other]
+    assert sorted(debouncer.ready(now=6)) == [first, second]
+
+
+def test_volume_key_and_siblings(tmp_path):
+    d = str(tmp_path)
+    for name in ('x.rar', 'x.r00', 'x.R01', 'y.zip', 'z.7z.001', 'z.7z.002'):
+        touch(os.path.join(d, name))
+    assert volume_key(os.path.join(d, 'x.R01')) == volume_key(os.path.join(d, 'x.rar'))
+    assert volume_key(os.path.join(d, 'note.txt')) is None
+    assert with_volume_siblings([os.path.join(d, 'x.r00')]) == [
+        os.path.join(d, name) for name in ('x.R01', 'x.r00', 'x.rar')]
+    assert with_volume_siblings([os.path.join(d, 'z.7z.002')]) == [
+        os.path.join(d, 'z.7z.001'), os.path.join(d, 'z.7z.002')]
+
+
+def test_polling_watcher_reports_new_and_changed_files(tmp_path):
+    d = str(tmp_path)
+    old = touch(os.path.join(d, 'old.zip'))
+    touch(os.path.join(d, 'same.zip'))
+    os.mkdir(os.path.join(d, 'skip'))
+    watcher = PollingWatcher(d, recursive=True, exclude=['skip'], interval=0)
+    assert watcher.changes(0) == []
+    new = touch(os.path.join(d, 'new.zip'))
+    touch(old, b'more')
+    touch(os.path.join(d, 'skip', 'hidden.zip'))
+    assert sorted(watcher.changes(0)) == [new, old]
+    assert watcher.changes(0) == []
+
+
+def test_polling_watcher_waits_for_interval(tmp_path):
+    watcher = PollingWatcher(str(tmp_path), interval=60)
+    touch(str(tmp_path / 'a.zip'))
+    assert watcher.changes(0.01) == []
+
+
+def test_tag_paths_reports_only_renamed_files(tmp_path):
+    d = str(tmp_path)
+    a = write_zip(os.path.join(d, 'a.zip'), 'plan.dwg')
+    b = write_zip(os.path.join(d, 'b.zip'), 'plan.dwg')
+    # b.zip 的目标已存在，不会重命名
+    touch(os.path.join(d, 'CAD b.zip'))
+    stats, renamed = RenameEngine().tag_paths([a, b])
+    assert (stats.renamed, stats.skipped) == (1, 1)
+    assert renamed == [os.path.join(d, 'CAD a.zip')]
+
+
+def test_watch_tags_arriving_archives(tmp_path):
+    d = str(tmp_path)
+    control = RunControl()
+    messages = []
+    runner = RenameEngine(control=control, log=messages.append)
+    thread = threading.Thread(target=watch, args=(runner, d),
+                              kwargs={'settle': 0.1, 'interval': 0.05, 'poll': True})
+    thread.start()
+    try:
+        while not any(m.startswith('正在监视') for m in messages):
+            time.sleep(0.01)
+        write_zip(os.path.join(d, 'model.zip'), 'model.skp')
+        deadline = time.monotonic() + 10
+        while 'SU model.zip' not in os.listdir(d) and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        control.cancel()
+        thread.join(10)
+    assert os.listdir(d) == ['SU model.zip']
+    assert messages[-1] == '已停止监视'
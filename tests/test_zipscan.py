@@ -0,0 +1,134 @@
+import struct
+import zipfile
+
+import pytest
+
+from yaya.zipscan import (CENTRAL_STRUCT, EOCD_STRUCT, ZIP64_EOCD_STRUCT, ZIP64_LOCATOR_STRUCT,
+                          ZipFormatError, iter_zip_entries, iter_zip_names)
+
+from conftest import write_zip
+
+
+def names(path):
+    return list(iter_zip_names(str(path)))
+
+
+def build_zip(members, comment=b'', zip64=False, prefix=b''):
+    """手工拼出只有中央目录的 ZIP：members 为 [(名称字节, 未压缩大小, 标志)]
+
+    zip64 为 True 时大小与条目数写入 ZIP64 字段。
+    """
+    central = b''
+    for raw, size, flags in members:
+        extra = b''
+        if zip64:
+            extra = struct.pack('<2HQ', 0x0001, 8, size)
+            size = 0xFFFFFFFF
+        central += CENTRAL_STRUCT.pack(b'PK\x01\x02', 20, 20, flags, 0, 0, 0, 0, 0, size,
+                                       len(raw), len(extra), 0, 0, 0, 0, 0) + raw + extra
+    if not zip64:
+        eocd = EOCD_STRUCT.pack(b'PK\x05\x06', 0, 0, len(members), len(members),
+                                len(central), 0, len(comment))
+        return prefix + central + eocd + comment
+    zip64_eocd = ZIP64_EOCD_STRUCT.pack(b'PK\x06\x06', ZIP64_EOCD_STRUCT.size - 12, 45, 45,
+                                        0, 0, len(members), len(members), len(central), 0)
+    locator = ZIP64_LOCATOR_STRUCT.pack(b'PK\x06\x07', 0, len(central), 1)
+    eocd = EOCD_STRUCT.pack(b'PK\x05\x06', 0, 0, 0xFFFF, 0xFFFF, 0xFFFFFFFF, 0xFFFFFFFF,
+                            len(comment))
+    return prefix + central + zip64_eocd + locator + eocd + comment
+
+
+def test_matches_zipfile(tmp_path):
+    path = write_zip(str(tmp_path / 'a.zip'), 'dir/', 'dir/plan.dwg', '模型/一层.skp', 'z.txt')
+    with zipfile.ZipFile(path) as z:
+        expected = [(info.filename, info.file_size) for info in z.infolist()]
+    assert list(iter_zip_entries(path)) == expected
+
+
+def test_cp437_and_utf8_names(tmp_path):
+    # 未设置 UTF-8 标志的名称与 zipfile 一样按 cp437 解码
+    path = tmp_path / 'a.zip'
+    path.write_bytes(build_zip([('café.dwg'.encode('cp437'), 1, 0),
+                                ('一层.skp'.encode('utf-8'), 2, 0x800)]))
+    assert names(path) == ['café.dwg', '一层.skp']
+
+
+def test_comment_after_eocd(tmp_path):
+    path = str(tmp_path / 'a.zip')
+    with zipfile.ZipFile(path, 'w') as z:
+        z.writestr('plan.dwg', b'x')
+        z.comment = b'comment ' * 1000
+    assert names(path) == ['plan.dwg']
+
+
+def test_eocd_signature_inside_comment(tmp_path):
+    path = tmp_path / 'a.zip'
+    path.write_bytes(build_zip([(b'plan.dwg', 1, 0)], comment=b'see PK\x05\x06 here'))
+    assert names(path) == ['plan.dwg']
+
+
+def test_data_before_archive(tmp_path):
+    # 自解压程序等前置数据
+    path = tmp_path / 'a.zip'
+    path.write_bytes(build_zip([(b'plan.dwg', 1, 0)], prefix=b'MZ' + bytes(300)))
+    assert names(path) == ['plan.dwg']
+
+
+def test_zip64(tmp_path):
+    path = tmp_path / 'a.zip'
+    path.write_bytes(build_zip([(b'big.dwg', 5 << 32, 0), (b'small.txt', 3, 0)], zip64=True,
+                               prefix=b'MZ' + bytes(30)))
+    assert list(iter_zip_entries(str(path))) == [('big.dwg', 5 << 32), ('small.txt', 3)]
+
+
+def test_zip64_written_by_zipfile(tmp_path):
+    # 条目数超过 65535 时 zipfile 写入 ZIP64 结束记录
+    path = str(tmp_path / 'many.zip')
+    with zipfile.ZipFile(path, 'w') as z:
+        for i in range(0x10000):
+            z.writestr(f'{i}.txt', b'')
+    result = names(path)
+    assert len(result) == 0x10000 and result[-1] == '65535.txt'
+
+
+def test_early_exit(tmp_path):
+    # 只读到命中的条目为止，后面损坏的记录不会被读取
+    data = bytearray(build_zip([(b'plan.dwg', 1, 0), (b'next.txt', 1, 0)]))
+    second = data.index(b'PK\x01\x02', 1)
+    data[second:second + 4] = b'XXXX'
+    path = tmp_path / 'a.zip'
+    path.write_bytes(bytes(data))
+    entries = iter_zip_names(str(path))
+    assert next(entries) == 'plan.dwg'
+    entries.close()
+    with pytest.raises(ZipFormatError):
+        names(path)
+
+
+def test_empty_and_not_zip(tmp_path):
+    empty = tmp_path / 'empty.zip'
+    empty.write_bytes(b'')
+    other = tmp_path / 'other.zip'
+    other.write_bytes(b'Rar!\x1a\x07\x00' + bytes(100))
+    for path in (empty, other):
+        with pytest.raises(ZipFormatError):
+            names(path)
+
+
+@pytest.mark.parametrize('zip64', [False, True])
+def test_truncated_or_corrupt_raise_zip_format_error(tmp_path, zip64):
+    # 截断或改坏任意一个字节时，只会得到 ZipFormatError 或（名称可能不同的）结果
+    big = 2 << 32 if zip64 else 2
+    data = build_zip([(b'plan.dwg', 1, 0), ('一层.skp'.encode('utf-8'), big, 0x800)],
+                     comment=b'c', zip64=zip64, prefix=b'MZ')
+    path = tmp_path / 'a.zip'
+    variants = [data[:n] for n in range(len(data))]
+    for i in range(len(data)):
+        for value in (0x00, 0xFF):
+            variants.append(data[:i] + bytes([value]) + data[i + 1:])
+    for variant in variants:
+        path.write_bytes(variant)
+        try:
+            list(iter_zip_entries(str(path)))
+        except ZipFormatError:
+            pass
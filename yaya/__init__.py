@@ -0,0 +1,3 @@
+"""YaYaRename 核心包：不依赖 PyQt5 的重命名引擎与命令行入口"""
+
+__version__ = '1.0'
@@ -0,0 +1,6 @@
+"""支持 python -m yaya 方式运行命令行"""
+import sys
+
+from yaya.cli import main
+
+sys.exit(main())
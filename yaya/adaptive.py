@@ -0,0 +1,150 @@
+"""自适应并发：按实测吞吐在运行中调整同时工作的线程数
+
+固定线程数很难同时适合本地磁盘和网络共享：本地 7z 解析主要消耗 CPU，线程多了只是争抢 GIL；
+SMB/NFS 上打开与重命名以等待网络往返为主，需要远多于 CPU 核数的并发才能掩盖延迟。
+自动模式下工作线程取下一个条目前先取得 AdaptiveLimit 的许可，同时工作的线程数由限制值决定，
+线程只在限制值提高时才按需启动。限制值在运行中按爬山法调整：
+
+- 每个统计窗口（至少 WINDOW 秒且完成 MIN_SAMPLES 个条目）结束时计算吞吐（条目/秒）；
+- 吞吐比上一个窗口明显提高时沿同一方向继续调整，步长逐次加倍；明显下降时反向，步长回到 1；
+- 吞吐变化不大时减少线程（用更少的线程达到同样的吞吐）；
+- 吞吐虽有提高但条目平均耗时上升超过 LATENCY_RISE 倍（存储接近饱和）时也减少线程。
+
+I/O 与 CPU 阶段使用各自的限制：条目处理（打开、读取目录、重命名）受 I/O 限制，上限较高；
+在线程中解析 7z/rar 还要取得 CPU 限制的许可，上限为 CPU 核数。7z/rar 位于网络共享时
+打开本身也要等待网络，可适当提高 CPU 限制的上限。
+"""
+import os
+import threading
+import time
+
+
+DEFAULT_MAX_IO = 64
+DEFAULT_INITIAL = 4
+
+# 统计窗口的最短时长（秒）与最少完成数
+WINDOW = 0.5
+MIN_SAMPLES = 8
+# 吞吐变化在此比例内视为不变
+TOLERANCE = 0.05
+# 平均耗时上升超过此倍数且吞吐没有提高时减少线程
+LATENCY_RISE = 1.5
+
+# 在线程中解析时主要消耗 CPU 的压缩包类型
+CPU_TYPES = ('.7z', '.rar')
+
+
+def default_cpu_threads():
+    """CPU 阶段的默认上限：CPU 核数"""
+    return os.cpu_count() or 1
+
+
+class AdaptiveLimit:
+    """可在运行中调整的并发限制
+
+    minimum/maximum 为限制值的范围，initial 为起始值。adaptive 为 False 时限制值保持不变。
+    history 记录每次调整：(距创建的秒数, 新限制值, 上一窗口的吞吐)。
+    """
+
+    def __init__(self, name, minimum=1, maximum=DEFAULT_MAX_IO, initial=None, adaptive=True):
+        self.name = name
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = self._clamp(initial or self.minimum)
+        self.peak = self.limit
+        self.adaptive = adaptive
+        self.history = []
+        self._cond = threading.Condition()
+        self._active = 0
+        self._created = time.monotonic()
+        self._window_start = self._created
+        self._done = 0
+        self._busy = 0.0
+        self._last_rate = None
+        self._last_latency = None
+        self._direction = 1
+        self._step = 1
+
+    def _clamp(self, value):
+        return max(self.minimum, min(self.maximum, value))
+
+    def acquire(self):
+        """等待许可"""
+        with self._cond:
+            while self._active >= self.limit:
+                self._cond.wait()
+            self._active += 1
+
+    def release(self, elapsed=None):
+        """归还许可；elapsed 为本次处理的耗时（秒），不为 None 时计入吞吐统计"""
+        with self._cond:
+            self._active -= 1
+            if elapsed is not None:
+                self._done += 1
+                self._busy += elapsed
+                if self.adaptive:
+                    self._tune()
+            # 空出的许可（限制值提高时可能不止一个）交给等待的线程
+            self._cond.notify(max(1, self.limit - self._active))
+
+    def run(self, func, *args):
+        """在许可内执行 func(*args)"""
+        self.acquire()
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self.release(time.perf_counter() - start)
+
+    def restart(self):
+        """开始新一轮统计（如监视模式的下一批），保留当前限制值"""
+        with self._cond:
+            self._window_start = time.monotonic()
+            self._done = 0
+            self._busy = 0.0
+            self._last_rate = None
+            self._last_latency = None
+            self._step = 1
+
+    def _tune(self):
+        """统计窗口结束时按吞吐调整限制值；调用方持有锁"""
+        now = time.monotonic()
+        elapsed = now - self._window_start
+        if elapsed < WINDOW or self._done < MIN_SAMPLES:
+            return
+        rate = self._done / elapsed
+        latency = self._busy / self._done
+        previous, previous_latency = self._last_rate, self._last_latency
+
+        improved = previous is None or rate > previous * (1 + TOLERANCE)
+        if not improved:
+            if rate < previous * (1 - TOLERANCE):
+                self._direction = -self._direction
+            else:
+                # 吞吐不变：用更少的线程达到同样的吞吐
+                self._direction = -1
+            self._step = 1
+        elif previous is not None and latency > previous_latency * LATENCY_RISE:
+            self._direction = -1
+            self._step = 1
+        else:
+            # 连续改善时步长加倍，延迟高的网络共享上能较快爬升到几十个线程
+            self._step = min(self._step * 2, max(1, self.limit // 2))
+
+        value = self._clamp(self.limit + self._direction * self._step)
+        if value == self.limit:
+            # 到达边界，下一个窗口往回试探
+            self._direction = -self._direction
+        else:
+            self.limit = value
+            self.peak = max(self.peak, value)
+            self.history.append((round(now - self._created, 3), value, round(rate, 1)))
+
+        self._last_rate = rate
+        self._last_latency = latency
+        self._window_start = now
+        self._done = 0
+        self._busy = 0.0
+
+    def describe(self):
+        return f"{self.limit}（峰值 {self.peak}，范围 {self.minimum}-{self.maximum}）"
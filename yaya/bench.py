@@ -0,0 +1,575 @@
+"""性能测试：生成合成压缩包目录，测量不同线程数、进程数与缓存状态下的识别吞吐
+
+    python -m yaya.bench --files 2000 --threads 1,4,8 --processes 0,2 --cache off,cold,warm -o bench.json
+
+合成目录按参数生成 zip/7z 压缩包：成员数量随机，按比例包含映射中的扩展名，
+按比例在文件名中带标签；相同参数生成的目录可重复使用。
+每个组合在独立的子进程中运行，峰值内存互不影响；warm 状态先用另一个子进程填充缓存。
+结果为 JSON（每个组合的文件数/秒、单文件耗时 p50/p99、峰值内存），便于在版本之间对比。
+
+    python -m yaya.bench --startup --max-startup-ms 300
+
+--startup 改为测量启动耗时：在新进程中分别导入引擎、命令行与图形界面（并创建主窗口），
+记录耗时与加载的模块数，同时检查压缩包后端等按需加载的模块没有在启动时被导入；
+超出 --max-startup-ms 或加载了不该加载的模块时返回 1，可在发布前检查启动是否变慢。
+
+    python -m yaya.bench --memory --entries 1000000
+
+--memory 改为测量扫描结果（EntryTable）与重命名计划（RenamePlan）每条实际占用的内存
+（tracemalloc），与 yaya.compact 中的预算比较，并换算为 500 万条的总量；
+作为对照，同时测量按对象逐条保存（每条一个 PlannedRename）时的占用。超出预算时返回 1。
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from yaya import __version__, engine
+
+
+BENCH_VERSION = 1
+MANIFEST_NAME = 'bench-corpus.json'
+
+# 不命中映射的成员扩展名
+FILLER_EXTS = ('.txt', '.jpg', '.png', '.pdf', '.docx', '.xlsx', '.psd', '.mp4')
+
+CACHE_STATES = ('off', 'cold', 'warm')
+
+# 启动测量的对象：(名称, 在子进程中执行的代码)
+STARTUP_TARGETS = (
+    ('engine', 'import yaya.engine'),
+    ('cli', 'import yaya.cli'),
+    ('gui', 'import YaYaRename\n'
+            'from PyQt5.QtWidgets import QApplication\n'
+            'app = QApplication([])\n'
+            'window = YaYaRename.MainWindow()'),
+)
+
+# 第一次用到时才加载的模块，启动时出现说明有模块在顶层导入了它们
+LAZY_MODULES = ('py7zr', 'rarfile', 'zipfile', 'sqlite3', 'ctypes', 'hashlib',
+                'multiprocessing', 'concurrent.futures', 'platform', 'YaYaDialogs')
+
+_STARTUP_CHILD = """
+import json, sys, time
+start = time.perf_counter()
+exec(sys.argv[1])
+elapsed = time.perf_counter() - start
+json.dump({'ms': round(elapsed * 1000, 1), 'modules': len(sys.modules),
+           'loaded': [m for m in json.loads(sys.argv[2]) if m in sys.modules]}, sys.stdout)
+"""
+OPERATIONS = ('scan', 'tag')
+
+# --memory 换算总量时的条目数
+PROJECTED_ENTRIES = 5_000_000
+# 对照组（逐条保存对象）最多测量的条目数
+BASELINE_ENTRIES = 200_000
+
+
+def generate_corpus(directory, files=1000, min_members=1, max_members=50, match_ratio=0.5,
+                    tagged_ratio=0.2, types=('.zip', '.7z'), seed=0):
+    """在 directory 下生成合成压缩包，返回生成参数；目录中已有相同参数的压缩包时直接复用
+
+    match_ratio 为包含映射扩展名的压缩包比例，命中的成员放在随机位置，
+    tagged_ratio 为文件名中带标签的比例（这类文件不必打开压缩包）。
+    """
+    params = {
+        'files': files, 'min_members': min_members, 'max_members': max_members,
+        'match_ratio': match_ratio, 'tagged_ratio': tagged_ratio,
+        'types': list(types), 'seed': seed,
+    }
+    manifest = os.path.join(directory, MANIFEST_NAME)
+    try:
+        with open(manifest, 'r', encoding='utf-8') as f:
+            if json.load(f) == params:
+                return params
+    except (OSError, ValueError):
+        pass
+
+    if os.path.isdir(directory):
+        shutil.rmtree(directory)
+    os.makedirs(directory)
+    rng = random.Random(seed)
+    mapped = list(engine.DEFAULT_EXT_TAG_MAP.items())
+    for i in range(files):
+        kind = types[i % len(types)]
+        count = rng.randint(min_members, max_members)
+        names = [f'dir{rng.randint(0, 9)}/file{j}{rng.choice(FILLER_EXTS)}' for j in range(count)]
+        name = f'archive{i:06d}'
+        if rng.random() < match_ratio:
+            ext, tag = rng.choice(mapped)
+            names[rng.randrange(count)] = f'model/model{i}{ext}'
+        if rng.random() < tagged_ratio:
+            name = f'{rng.choice(engine.DEFAULT_TAGS)} {name}'
+        members = [(member, rng.randbytes(rng.randint(64, 1024))) for member in names]
+        _write_archive(os.path.join(directory, name + kind), kind, members)
+
+    with open(manifest, 'w', encoding='utf-8') as f:
+        json.dump(params, f)
+    return params
+
+
+def _write_archive(path, kind, members):
+    if kind == '.zip':
+        import zipfile
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as z:
+            for name, data in members:
+                z.writestr(name, data)
+    elif kind == '.7z':
+        import py7zr
+        with py7zr.SevenZipFile(path, 'w') as z:
+            for name, data in members:
+                z.writestr(data, name)
+    else:
+        raise ValueError(f"不支持生成的压缩包类型: {kind}")
+
+
+def percentile(values, p):
+    """最近秩百分位数，values 须已排序"""
+    if not values:
+        return None
+    k = max(0, min(len(values) - 1, int(round(p / 100 * len(values) + 0.5)) - 1))
+    return values[k]
+
+
+def peak_rss():
+    """返回 (本进程, 已结束子进程) 的峰值内存字节数，平台不支持时为 (None, None)"""
+    try:
+        import resource
+    except ImportError:
+        return None, None
+    # Linux 上 ru_maxrss 以 KB 为单位，macOS 上以字节为单位
+    unit = 1 if sys.platform == 'darwin' else 1024
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit
+    # Linux 的 ru_maxrss 跨 exec 保留父进程的峰值，VmHWM 只统计当前程序
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    rss = int(line.split()[1]) * 1024
+                    break
+    except OSError:
+        pass
+    return rss, children
+
+
+def run_once(config):
+    """在当前进程中按 config 运行一次，返回测量结果"""
+    directory = config['directory']
+    cache = None
+    if config['cache'] != 'off':
+        from yaya.cache import ArchiveCache
+        cache = ArchiveCache(config['cache_path'])
+    inspector = None
+    if config['processes'] > 0:
+        from yaya.procpool import ProcessInspector
+        inspector = ProcessInspector(config['processes'])
+
+    runner = engine.RenameEngine(threads=config['threads'], cache=cache, inspector=inspector)
+    latencies = []
+    classify = runner.classify
+
+    def timed_classify(file_path, volumes=None):
+        start = time.perf_counter()
+        try:
+            return classify(file_path, volumes)
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    runner.classify = timed_classify
+    try:
+        start = time.perf_counter()
+        if config['operation'] == 'tag':
+            total = runner.tag(directory).total
+        else:
+            total = len(runner.scan(directory))
+        seconds = time.perf_counter() - start
+    finally:
+        if inspector is not None:
+            inspector.close()
+        if cache is not None:
+            cache.close()
+
+    latencies.sort()
+    rss, children_rss = peak_rss()
+    return {
+        'files': total,
+        'seconds': round(seconds, 4),
+        'files_per_sec': round(total / seconds, 1) if seconds else None,
+        'p50_ms': _ms(percentile(latencies, 50)),
+        'p99_ms': _ms(percentile(latencies, 99)),
+        'peak_rss_mb': _mb(rss),
+        'children_peak_rss_mb': _mb(children_rss),
+        'cache_hits': cache.hits if cache is not None else None,
+        'cache_misses': cache.misses if cache is not None else None,
+        # 自动调整线程数时的最终与峰值线程数
+        'io_threads': runner.io_limit.limit if runner.io_limit else None,
+        'io_threads_peak': runner.io_limit.peak if runner.io_limit else None,
+        'cpu_threads': runner.cpu_limit.limit if runner.cpu_limit else None,
+        # 交给进程池的批数
+        'process_batches': inspector.batches if inspector is not None else None,
+    }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 3)
+
+
+def _mb(size):
+    return None if size is None else round(size / (1024 * 1024), 1)
+
+
+def run_child(config):
+    """在新的 Python 进程中运行一次，峰值内存只包含这一次运行"""
+    env = dict(os.environ)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env['PYTHONPATH'] = os.pathsep.join(p for p in (root, env.get('PYTHONPATH')) if p)
+    out = subprocess.run([sys.executable, '-m', 'yaya.bench', '--child', json.dumps(config)],
+                         env=env, stdout=subprocess.PIPE, check=True)
+    return json.loads(out.stdout)
+
+
+def run_matrix(directory, threads, processes, caches, operation='scan', repeat=1, report=None):
+    """按线程数 × 进程数 × 缓存状态运行，返回结果列表；重复多次时取文件数/秒的中位数那一次"""
+    report = report or (lambda result: None)
+    results = []
+    with tempfile.TemporaryDirectory(prefix='yaya-bench-') as work_dir:
+        for t in threads:
+            for p in processes:
+                for state in caches:
+                    runs = []
+                    for n in range(repeat):
+                        target = directory
+                        if operation == 'tag':
+                            # 重命名会改变目录内容，每次在副本上执行，复制不计入耗时；
+                            # 缓存按 inode 识别文件，warm 状态的预热也在同一副本上进行
+                            target = os.path.join(work_dir, 'corpus')
+                            shutil.rmtree(target, ignore_errors=True)
+                            shutil.copytree(directory, target)
+                        config = {'directory': target, 'threads': t, 'processes': p,
+                                  'cache': state, 'operation': operation,
+                                  'cache_path': os.path.join(work_dir, f'{t}-{p}-{state}-{n}.db')}
+                        if state == 'warm':
+                            run_child(dict(config, operation='scan'))
+                        runs.append(run_child(config))
+                    runs.sort(key=lambda r: r['files_per_sec'] or 0)
+                    result = {'threads': t or 'auto', 'processes': p, 'cache': state,
+                              'operation': operation, 'repeat': repeat}
+                    result.update(runs[len(runs) // 2])
+                    results.append(result)
+                    report(result)
+    return results
+
+
+def measure_startup(repeat=5, targets=STARTUP_TARGETS, report=None):
+    """在新进程中测量各对象的启动耗时，返回结果列表；每项取 repeat 次的中位数
+
+    图形界面使用 offscreen 平台，不需要显示器；未安装 PyQt5 时跳过。
+    """
+    report = report or (lambda result: None)
+    env = dict(os.environ)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env['PYTHONPATH'] = os.pathsep.join(p for p in (root, env.get('PYTHONPATH')) if p)
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    results = []
+    for name, code in targets:
+        runs = []
+        for _ in range(max(1, repeat)):
+            out = subprocess.run([sys.executable, '-c', _STARTUP_CHILD, code,
+                                  json.dumps(LAZY_MODULES)],
+                                 env=env, cwd=root, stdout=subprocess.PIPE,
+                                 stderr=subprocess.PIPE)
+            if out.returncode != 0:
+                break
+            runs.append(json.loads(out.stdout))
+        if not runs:
+            error = out.stderr.decode(errors='replace').strip().splitlines()
+            result = {'target': name, 'skipped': error[-1] if error else f'退出码 {out.returncode}'}
+        else:
+            runs.sort(key=lambda r: r['ms'])
+            result = dict(runs[len(runs) // 2], target=name, repeat=len(runs))
+        results.append(result)
+        report(result)
+    return results
+
+
+def _memory_name(i):
+    """--memory 的合成文件名：中英文混合，UTF-8 约 30 字节"""
+    return f'项目{i % 97:02d} 模型_{i:07d}.zip'
+
+
+def _traced(build, peak=False):
+    """build() 返回的对象占用的内存（字节）；peak 为 True 时改为执行期间的峰值"""
+    import gc
+    import tracemalloc
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        kept = build()
+        gc.collect()
+        current, highest = tracemalloc.get_traced_memory()
+        return kept, (highest if peak else current) - before
+    finally:
+        tracemalloc.stop()
+
+
+def measure_memory(entries=200_000, directories=None, report=None):
+    """测量扫描结果与重命名计划每条占用的内存，返回结果列表
+
+    directories 为目录数（默认每 500 个文件一个目录）。预算为 yaya.compact 中每条的固定开销
+    加名称的 UTF-8 长度，乘以扩容预留的比例，再加上分摊到每条的目录表。
+    plan-resolve 为已建好的计划 resolve 并生成全部步骤期间的峰值，不含计划本身。
+    """
+    from yaya.compact import (ENTRY_BYTES, GROWTH, MTIME_BYTES, PLAN_ENTRY_BYTES,
+                              RESOLVE_INDEX_BYTES, RESOLVE_PEAK_BYTES, RESOLVED_BYTES,
+                              TABLE_ENTRY_BYTES, EntryTable)
+    from yaya.plan import PlannedRename, RenamePlan
+
+    report = report or (lambda result: None)
+    directories = max(1, directories or entries // 500)
+    dirs = [os.path.join(os.sep, 'share', f'项目{d % 97:02d}', f'图纸{d:05d}')
+            for d in range(directories)]
+    name_bytes = sum(len(_memory_name(i).encode('utf-8')) for i in range(entries)) / entries
+    tag_bytes = len('SU '.encode('utf-8'))
+    dir_bytes = sum(sys.getsizeof(d) + TABLE_ENTRY_BYTES for d in dirs) / entries
+
+    def paths():
+        for i in range(entries):
+            yield os.path.join(dirs[i % directories], _memory_name(i))
+
+    def build_table():
+        table = EntryTable(engine.DEFAULT_TAGS, mtimes=True)
+        tags = engine.DEFAULT_TAGS + [None]
+        for i, path in enumerate(paths()):
+            table.add(path, tags[i % len(tags)], engine.SOURCE_CONTENT, 1.7e9 + i)
+        return table
+
+    def build_plan():
+        plan = RenamePlan()
+        for path in paths():
+            plan.add(path, 'SU ' + os.path.basename(path), False, engine.SOURCE_CONTENT)
+        return plan
+
+    def build_objects():
+        # 对照：原来每条一个对象，目录由 os.path.split 得到，每条各有一份
+        objects = []
+        for i, path in zip(range(BASELINE_ENTRIES), paths()):
+            directory, old = os.path.split(path)
+            objects.append(PlannedRename(directory, old, 'SU ' + old, False,
+                                         engine.SOURCE_CONTENT))
+        return objects
+
+    def resolve_plan():
+        plan.resolve()
+        for start, stop in plan._resolved.values():
+            for _ in plan.moves(start, stop):
+                pass
+        return plan._order, plan._steps
+
+    plan = build_plan()
+    largest = -(-entries // directories)
+    cases = (
+        ('scan', build_table, entries,
+         (ENTRY_BYTES + MTIME_BYTES + name_bytes) * GROWTH + dir_bytes),
+        ('plan', build_plan, entries,
+         (PLAN_ENTRY_BYTES + 2 * name_bytes + tag_bytes) * GROWTH + dir_bytes),
+        ('plan-resolve', resolve_plan, entries,
+         (RESOLVED_BYTES + RESOLVE_INDEX_BYTES) * GROWTH + RESOLVE_PEAK_BYTES * largest / entries),
+        ('plan-objects', build_objects, min(entries, BASELINE_ENTRIES), None),
+    )
+    results = []
+    for name, build, count, budget in cases:
+        start = time.perf_counter()
+        kept, size = _traced(build, peak=name == 'plan-resolve')
+        elapsed = time.perf_counter() - start
+        del kept
+        per_entry = size / count
+        result = {'structure': name, 'entries': count, 'directories': directories,
+                  'bytes_per_entry': round(per_entry, 1),
+                  'budget_bytes_per_entry': round(budget, 1) if budget else None,
+                  'projected_mb': round(per_entry * PROJECTED_ENTRIES / 1024 / 1024, 1),
+                  'build_seconds': round(elapsed, 2)}
+        results.append(result)
+        report(result)
+    return results
+
+
+def _int_list(text):
+    return [int(x) for x in text.split(',') if x.strip()]
+
+
+def _threads_list(text):
+    """线程数列表，auto 记为 0（自动调整）"""
+    from yaya.cli import parse_threads
+    return [parse_threads(x) for x in text.split(',') if x.strip()]
+
+
+def _choice_list(choices):
+    def parse(text):
+        values = [x.strip() for x in text.split(',') if x.strip()]
+        for value in values:
+            if value not in choices:
+                raise argparse.ArgumentTypeError(f"无效的取值: {value}（可选 {','.join(choices)}）")
+        return values
+    return parse
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m yaya.bench',
+                                     description='YaYaRename 识别吞吐性能测试')
+    parser.add_argument('--dir', help='合成目录位置（默认位于临时目录，相同参数时复用）')
+    parser.add_argument('--files', type=int, default=1000, help='压缩包数量（默认 1000）')
+    parser.add_argument('--min-members', type=int, default=1, help='每个压缩包最少成员数')
+    parser.add_argument('--max-members', type=int, default=50, help='每个压缩包最多成员数')
+    parser.add_argument('--match-ratio', type=float, default=0.5,
+                        help='包含映射扩展名的压缩包比例（默认 0.5）')
+    parser.add_argument('--tagged-ratio', type=float, default=0.2,
+                        help='文件名中带标签的比例（默认 0.2）')
+    parser.add_argument('--types', type=_choice_list(('zip', '7z')), default=['zip', '7z'],
+                        help='压缩包类型，逗号分隔（默认 zip,7z）')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    parser.add_argument('--threads', type=_threads_list, default=[1, 4],
+                        help='线程数列表，可包含 auto（默认 1,4）')
+    parser.add_argument('--processes', type=_int_list, default=[0],
+                        help='7z/rar 解析进程数列表（默认 0）')
+    parser.add_argument('--cache', type=_choice_list(CACHE_STATES), default=['off'],
+                        help='缓存状态列表 off,cold,warm（默认 off）')
+    parser.add_argument('--operation', choices=OPERATIONS, default='scan',
+                        help='scan 只识别；tag 在副本上识别并重命名（默认 scan）')
+    parser.add_argument('--repeat', type=int,
+                        help='每个组合重复次数，取中位数（默认 1；--startup 时默认 5）')
+    parser.add_argument('--startup', action='store_true',
+                        help='测量启动耗时（引擎、命令行、图形界面），不生成合成目录')
+    parser.add_argument('--max-startup-ms', type=float,
+                        help='启动耗时上限（毫秒），任一对象超出时返回 1')
+    parser.add_argument('--memory', action='store_true',
+                        help='测量扫描结果与重命名计划每条占用的内存，超出预算时返回 1')
+    parser.add_argument('--entries', type=int, default=200_000,
+                        help='--memory 的条目数（默认 200000）')
+    parser.add_argument('-o', '--output', help='结果写入的 JSON 文件（默认输出到标准输出）')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.child:
+        json.dump(run_once(json.loads(args.child)), sys.stdout)
+        return 0
+
+    if args.startup:
+        return startup_main(args)
+    if args.memory:
+        return memory_main(args)
+
+    directory = args.dir or os.path.join(tempfile.gettempdir(), 'yaya-bench-corpus')
+    print(f"准备合成目录 {directory} ...", file=sys.stderr)
+    corpus = generate_corpus(directory, args.files, args.min_members, args.max_members,
+                             args.match_ratio, args.tagged_ratio,
+                             tuple('.' + t for t in args.types), args.seed)
+
+    def report(r):
+        print(f"threads={r['threads']:<4} processes={r['processes']:<3} cache={r['cache']:<5} "
+              f"{r['files_per_sec']:>9} 文件/秒  p50={r['p50_ms']}ms  p99={r['p99_ms']}ms  "
+              f"峰值内存={r['peak_rss_mb']}MB"
+              + (f"  I/O 线程={r['io_threads']}（峰值 {r['io_threads_peak']}）"
+                 if r['io_threads'] else ''), file=sys.stderr)
+
+    results = run_matrix(directory, args.threads, args.processes, args.cache, args.operation,
+                         max(1, args.repeat or 1), report)
+    document = {
+        'bench': BENCH_VERSION,
+        'version': __version__,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'started': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'corpus': corpus,
+        'results': results,
+    }
+    _write_document(document, args.output)
+    return 0
+
+
+def startup_main(args):
+    """--startup：测量启动耗时，超出上限或启动时加载了按需加载的模块时返回 1"""
+    def report(r):
+        if 'skipped' in r:
+            print(f"{r['target']:<7} 跳过: {r['skipped']}", file=sys.stderr)
+            return
+        print(f"{r['target']:<7} {r['ms']:>8} 毫秒  模块 {r['modules']}"
+              + (f"  启动时加载了: {', '.join(r['loaded'])}" if r['loaded'] else ''),
+              file=sys.stderr)
+
+    results = measure_startup(args.repeat or 5, report=report)
+    failures = []
+    for r in results:
+        if 'skipped' in r:
+            continue
+        if r['loaded']:
+            failures.append(f"{r['target']} 启动时加载了 {', '.join(r['loaded'])}")
+        if args.max_startup_ms is not None and r['ms'] > args.max_startup_ms:
+            failures.append(f"{r['target']} 启动耗时 {r['ms']} 毫秒，超出 {args.max_startup_ms:g} 毫秒")
+    document = {
+        'bench': BENCH_VERSION,
+        'version': __version__,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'started': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'startup': results,
+        'failures': failures,
+    }
+    _write_document(document, args.output)
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    return 1 if failures else 0
+
+
+def memory_main(args):
+    """--memory：测量每条占用的内存，超出 yaya.compact 中的预算时返回 1"""
+    def report(r):
+        budget = (f"（预算 {r['budget_bytes_per_entry']}）"
+                  if r['budget_bytes_per_entry'] is not None else '（对照）')
+        print(f"{r['structure']:<13} {r['bytes_per_entry']:>7} 字节/条{budget}  "
+              f"{PROJECTED_ENTRIES // 10000} 万条约 {r['projected_mb']} MB", file=sys.stderr)
+
+    results = measure_memory(max(1, args.entries), report=report)
+    failures = [f"{r['structure']} 每条 {r['bytes_per_entry']} 字节，超出预算 "
+                f"{r['budget_bytes_per_entry']} 字节"
+                for r in results if r['budget_bytes_per_entry'] is not None
+                and r['bytes_per_entry'] > r['budget_bytes_per_entry']]
+    document = {
+        'bench': BENCH_VERSION,
+        'version': __version__,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'started': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'memory': results,
+        'failures': failures,
+    }
+    _write_document(document, args.output)
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    return 1 if failures else 0
+
+
+def _write_document(document, path):
+    if path:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(document, f, ensure_ascii=False, indent=2)
+    else:
+        json.dump(document, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
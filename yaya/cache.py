@@ -0,0 +1,204 @@
+"""压缩包识别结果的持久化缓存
+
+以 (设备号, inode) 为主键，记录文件大小与修改时间作为指纹；
+指纹未变的压缩包直接使用缓存的成员扩展名摘要与文件头识别出的类型，不再打开压缩包。
+"""
+import os
+import sqlite3
+import threading
+import time
+
+
+DEFAULT_MAX_ENTRIES = 200000
+
+# 表结构或摘要格式变化时递增，旧版本的缓存直接重建
+CACHE_VERSION = 3
+
+# 扩展名中不会出现路径分隔符，用作摘要的分隔符
+EXT_SEPARATOR = '/'
+
+
+def default_cache_path():
+    """默认缓存文件位置"""
+    base = (os.environ.get('LOCALAPPDATA') or os.environ.get('XDG_CACHE_HOME')
+            or os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(base, 'YaYaRename', 'archive_cache.sqlite3')
+
+
+def fingerprint(path, volumes=None):
+    """返回文件指纹 (dev, ino, size, mtime_ns)；无法获得稳定 inode 时返回 None
+
+    volumes 为同组分卷的路径时，以 path 的 inode 为键，大小取各卷之和，修改时间取最新的一卷。
+    """
+    st = os.stat(path)
+    if not st.st_ino:
+        return None
+    size, mtime = st.st_size, st.st_mtime_ns
+    for volume in volumes or ():
+        if volume != path:
+            vst = os.stat(volume)
+            size += vst.st_size
+            mtime = max(mtime, vst.st_mtime_ns)
+    return (st.st_dev, st.st_ino, size, mtime)
+
+
+class CacheEntry:
+    """缓存中的一条识别结果
+
+    kind 为文件头识别出的类型（'.zip'/'.rar'/'.7z'），空串表示不是压缩包，None 表示未识别。
+    depth 为摘要覆盖的嵌套层数（见 yaya.nested），内层成员的扩展名带层级标记。
+    """
+
+    __slots__ = ('tag', 'exts', 'complete', 'kind', 'depth')
+
+    def __init__(self, tag, exts, complete, kind=None, depth=0):
+        self.tag = tag
+        self.exts = exts
+        self.complete = complete
+        self.kind = kind
+        self.depth = depth
+
+
+class ArchiveCache:
+    """基于 SQLite 的识别结果缓存，可在多个工作线程间共享
+
+    写入先缓存在内存中，每 flush_every 条批量提交一次；
+    条目数超过 max_entries 时按最近使用时间淘汰。
+    hits/misses 统计 get 的命中与未命中次数，由 yaya.bench 报告。
+    """
+
+    fingerprint = staticmethod(fingerprint)
+
+    def __init__(self, path=None, max_entries=DEFAULT_MAX_ENTRIES, flush_every=500):
+        self.path = path or default_cache_path()
+        self.max_entries = max_entries
+        self.flush_every = flush_every
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._touched = {}
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        if self._conn.execute('PRAGMA user_version').fetchone()[0] != CACHE_VERSION:
+            # 旧版本的摘要只记录最后一段扩展名，无法匹配 .tar.gz 这类映射
+            self._conn.execute('DROP TABLE IF EXISTS archives')
+            self._conn.execute(f'PRAGMA user_version = {CACHE_VERSION}')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS archives ('
+            ' dev INTEGER NOT NULL, ino INTEGER NOT NULL,'
+            ' size INTEGER NOT NULL, mtime INTEGER NOT NULL,'
+            ' tag TEXT, exts TEXT NOT NULL, complete INTEGER NOT NULL,'
+            ' kind TEXT, depth INTEGER NOT NULL, used INTEGER NOT NULL,'
+            ' PRIMARY KEY (dev, ino))')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS archives_used ON archives (used)')
+        self._conn.commit()
+        self._count = self._conn.execute('SELECT COUNT(*) FROM archives').fetchone()[0]
+
+    def get(self, fp):
+        """按指纹查找缓存，大小或修改时间不一致视为未命中"""
+        if fp is None:
+            return None
+        dev, ino, size, mtime = fp
+        with self._lock:
+            row = self._pending.get((dev, ino))
+            if row is None:
+                try:
+                    row = self._conn.execute(
+                        'SELECT dev, ino, size, mtime, tag, exts, complete, kind, depth'
+                        ' FROM archives WHERE dev = ? AND ino = ?', (dev, ino)).fetchone()
+                except sqlite3.Error:
+                    row = None
+            if row is None or row[2] != size or row[3] != mtime:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._touched[(dev, ino)] = int(time.time())
+        exts = row[5].split(EXT_SEPARATOR) if row[5] else []
+        return CacheEntry(row[4], exts, bool(row[6]), row[7], row[8])
+
+    def put(self, fp, tag, exts, complete=True, kind=None, depth=0):
+        """写入识别结果；exts 为按出现顺序去重的成员扩展名，kind 与 depth 见 CacheEntry"""
+        if fp is None:
+            return
+        dev, ino, size, mtime = fp
+        row = (dev, ino, size, mtime, tag, EXT_SEPARATOR.join(exts),
+               1 if complete else 0, kind, depth, int(time.time()))
+        with self._lock:
+            self._pending[(dev, ino)] = row
+            if len(self._pending) >= self.flush_every:
+                self._flush_locked()
+
+    def flush(self):
+        """提交所有待写入的条目"""
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._pending and not self._touched:
+            return
+        added = 0
+        try:
+            with self._conn:
+                if self._pending:
+                    # INSERT OR REPLACE 覆盖已有条目时不增加条目数
+                    added = sum(1 for key in self._pending if self._conn.execute(
+                        'SELECT 1 FROM archives WHERE dev = ? AND ino = ?', key).fetchone() is None)
+                    self._conn.executemany(
+                        'INSERT OR REPLACE INTO archives'
+                        ' (dev, ino, size, mtime, tag, exts, complete, kind, depth, used)'
+                        ' VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', list(self._pending.values()))
+                if self._touched:
+                    self._conn.executemany(
+                        'UPDATE archives SET used = ? WHERE dev = ? AND ino = ?',
+                        [(used, dev, ino) for (dev, ino), used in self._touched.items()])
+            self._count += added
+            if self._count > self.max_entries:
+                self._evict_locked()
+        except sqlite3.Error:
+            # 缓存只是加速手段，写入失败（如数据库被其他进程锁定）不影响处理
+            pass
+        self._pending.clear()
+        self._touched.clear()
+
+    def _evict_locked(self):
+        """淘汰最久未使用的条目，保留 max_entries 的 90%"""
+        self._count = self._conn.execute('SELECT COUNT(*) FROM archives').fetchone()[0]
+        excess = self._count - self.max_entries * 9 // 10
+        if self._count <= self.max_entries or excess <= 0:
+            return
+        with self._conn:
+            self._conn.execute(
+                'DELETE FROM archives WHERE rowid IN'
+                ' (SELECT rowid FROM archives ORDER BY used LIMIT ?)', (excess,))
+        self._count -= excess
+
+    def clear(self):
+        """清空缓存（重建缓存）"""
+        with self._lock:
+            self._pending.clear()
+            self._touched.clear()
+            with self._conn:
+                self._conn.execute('DELETE FROM archives')
+            self._count = 0
+
+    def __len__(self):
+        with self._lock:
+            return self._count
+
+    def close(self):
+        """提交剩余条目并关闭数据库"""
+        with self._lock:
+            self._flush_locked()
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
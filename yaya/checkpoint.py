@@ -0,0 +1,186 @@
+"""断点记录：保存一次运行中已完成规划的文件，中断后再次运行时从断点继续
+
+每行一条 JSON：首行为运行信息（含运行参数的摘要），其后每条记录一个文件的规划结果：
+原路径、新文件名（不重命名时为 null）、文件大小与修改时间；
+执行阶段每次重命名成功后另记一条目标路径（有冲突或重命名失败的文件不记）。
+与撤销记录相同，记录每 batch_size 条写入并 fsync 一次，读取时忽略被截断的末行；
+非 ASCII 字符按 JSON 转义写入，无法用 UTF-8 编码的文件名也能记录。
+
+再次运行时：
+- 记录中的文件大小与修改时间未变时直接使用记录的新文件名，不再解析压缩包；
+- 上次已重命名过的文件（路径为记录中的目标路径）不再处理，前缀、后缀不会重复添加；
+- 运行正常完成后删除记录文件，取消或中断时保留。
+"""
+import json
+import os
+import threading
+import time
+
+from yaya.journal import default_journal_dir
+from yaya.plan import is_temp_name
+
+
+CHECKPOINT_VERSION = 2
+
+
+def default_checkpoint_dir():
+    """默认断点记录目录，与撤销记录目录相邻"""
+    return os.path.join(os.path.dirname(default_journal_dir()), 'checkpoints')
+
+
+def run_key(*parts):
+    """把运行参数（目录、操作、映射、扫描选项等）序列化为断点记录的键"""
+    return json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+
+
+def file_stamp(path):
+    """文件大小与修改时间，用于判断记录后文件是否变化"""
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+class Checkpoint:
+    """断点记录文件，可在多个工作线程间共享"""
+
+    def __init__(self, path, key, batch_size=1000, fsync=True):
+        self.path = path
+        self.key = key
+        self.batch_size = batch_size
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._pending = []
+        # {原路径: (新文件名, 大小与修改时间)}
+        self.entries = {}
+        self.targets = set()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if not self._load():
+            self._pending.append(json.dumps({
+                'checkpoint': CHECKPOINT_VERSION,
+                'key': key,
+                'started': time.strftime('%Y-%m-%d %H:%M:%S'),
+            }))
+            mode = 'w'
+        else:
+            mode = 'a'
+        self._file = open(path, mode, encoding='utf-8')
+
+    @classmethod
+    def open(cls, directory, operation, key, **kwargs):
+        """打开 directory 下与 key 对应的断点记录，不存在时新建"""
+        import hashlib
+        digest = hashlib.sha1(key.encode('utf-8', 'surrogatepass')).hexdigest()[:16]
+        return cls(os.path.join(directory, f'{operation}-{digest}.jsonl'), key, **kwargs)
+
+    def _load(self):
+        """读取已有记录，返回记录是否可以继续使用"""
+        try:
+            f = open(self.path, 'r', encoding='utf-8')
+        except FileNotFoundError:
+            return False
+        with f:
+            header = None
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if header is None:
+                    header = record
+                    if (record.get('checkpoint') != CHECKPOINT_VERSION
+                            or record.get('key') != self.key):
+                        return False
+                    continue
+                if 'target' in record:
+                    self.targets.add(record['target'])
+                else:
+                    self.entries[record['path']] = (record['name'], record['stamp'])
+        return header is not None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def lookup(self, path):
+        """返回 (是否有可用记录, 新文件名)；记录后文件有变化时视为没有记录"""
+        entry = self.entries.get(path)
+        if entry is None:
+            return False, None
+        try:
+            if file_stamp(path) != entry[1]:
+                return False, None
+        except OSError:
+            return False, None
+        return True, entry[0]
+
+    def is_target(self, path):
+        """path 是否为上次运行中已重命名得到的文件"""
+        return path in self.targets
+
+    def record(self, path, new_name):
+        """记录一个文件的规划结果"""
+        self._append(json.dumps({'path': path, 'name': new_name, 'stamp': file_stamp(path)}))
+
+    def record_target(self, path):
+        """记录一个已重命名得到的文件，再次运行时不再处理"""
+        self._append(json.dumps({'target': path}))
+
+    def _append(self, line):
+        with self._lock:
+            self._pending.append(line)
+            if len(self._pending) >= self.batch_size:
+                self._flush_locked()
+
+    def journal(self, journal=None):
+        """返回记录重命名的对象：转发给 journal（可为 None），同时记下重命名得到的文件"""
+        return _CheckpointJournal(self, journal)
+
+    def flush(self):
+        """写入并同步所有待写入的记录"""
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        """写入待写入的记录；写入失败时这一批记录丢弃，对应的文件下次重新处理"""
+        if not self._pending:
+            return
+        try:
+            self._file.write('\n'.join(self._pending) + '\n')
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+        finally:
+            self._pending.clear()
+
+    def close(self):
+        """写入剩余记录并关闭，保留文件供下次继续"""
+        with self._lock:
+            if not self._file.closed:
+                try:
+                    self._flush_locked()
+                finally:
+                    self._file.close()
+
+    def remove(self):
+        """运行完成：关闭并删除记录文件"""
+        with self._lock:
+            self._pending.clear()
+            self._file.close()
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+
+class _CheckpointJournal:
+    """与 RenameJournal.record 接口相同；移到临时名称的中间步骤不是目标"""
+
+    def __init__(self, checkpoint, journal):
+        self._checkpoint = checkpoint
+        self._journal = journal
+
+    def record(self, directory, old, new):
+        if self._journal is not None:
+            self._journal.record(directory, old, new)
+        if not is_temp_name(new):
+            self._checkpoint.record_target(os.path.join(directory, new))
@@ -0,0 +1,429 @@
+"""命令行入口：python -m yaya scan|tag|prefix|suffix DIR ... / python -m yaya undo JOURNAL
+
+python -m yaya find PATTERN 查询成员索引；python -m yaya jobs MANIFEST 按作业清单处理多个目录。
+"""
+import argparse
+import json
+import signal
+import sys
+import threading
+
+from yaya import engine
+from yaya.control import RunControl
+from yaya.tags import TagMatcher
+from yaya.template import DEFAULT_TEMPLATE, TemplateError
+from yaya.jobs import DEFAULT_PROGRESS_INTERVAL
+from yaya.watch import DEFAULT_INTERVAL, DEFAULT_SETTLE
+
+
+def parse_mapping(items, map_file=None):
+    """解析 --map-file 与 --map .skp=SU 形式的映射参数"""
+    if map_file:
+        with open(map_file, 'r', encoding='utf-8') as f:
+            ext_tag_map = json.load(f)
+    elif items:
+        ext_tag_map = {}
+    else:
+        return dict(engine.DEFAULT_EXT_TAG_MAP)
+
+    for item in items or []:
+        ext, sep, tag = item.partition('=')
+        if not sep or not ext.strip() or not tag.strip():
+            raise argparse.ArgumentTypeError(f"无效的映射: {item}（应为 .skp=SU）")
+        ext_tag_map[ext.strip()] = tag.strip()
+
+    # 与配置对话框一致：扩展名统一为小写并带点
+    return {(ext if ext.startswith('.') else '.' + ext).lower(): tag
+            for ext, tag in ext_tag_map.items()}
+
+
+def parse_tags(items, tag_file=None):
+    """解析 --tag-file 与 --tag 形式的文件名标签规则，都未指定时返回 None（使用默认标签）"""
+    if not tag_file and not items:
+        return None
+    rules = []
+    if tag_file:
+        with open(tag_file, 'r', encoding='utf-8') as f:
+            rules = json.load(f)
+        if not isinstance(rules, list):
+            raise ValueError(f"{tag_file}: 标签规则应为列表")
+    rules.extend(items or [])
+    # 提前编译一次，规则有误时在处理文件之前报错
+    TagMatcher(rules)
+    return rules
+
+
+def parse_threads(text):
+    """线程数，auto 表示自动调整（对应 RenameEngine 的 threads=0）"""
+    if text.strip().lower() == 'auto':
+        return 0
+    try:
+        value = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"无效的线程数: {text}（应为正整数或 auto）")
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"无效的线程数: {text}（应为正整数或 auto）")
+    return value
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m yaya',
+        description='压缩包批量重命名工具（命令行版）')
+    parser.add_argument('-j', '--threads', type=parse_threads, default=4, metavar='N|auto',
+                        help='处理线程数（默认 4）；auto 按实测吞吐自动调整')
+    parser.add_argument('--max-io-threads', type=int, metavar='N',
+                        help=f'自动模式下同时工作的线程数上限（默认 {engine.DEFAULT_MAX_IO}）')
+    parser.add_argument('--cpu-threads', type=int, metavar='N',
+                        help='自动模式下同时在线程中解析 7z/rar 的上限（默认 CPU 核数）')
+    parser.add_argument('-m', '--map', action='append', metavar='EXT=TAG',
+                        help='文件类型映射，可多次指定，如 --map .skp=SU')
+    parser.add_argument('--map-file', metavar='JSON',
+                        help='从 JSON 文件读取映射，如 {".skp": "SU"}')
+    parser.add_argument('-t', '--tag', action='append', metavar='TAG',
+                        help='按文件名识别的标签，可多次指定（不指定时为 3D、SU、CAD）')
+    parser.add_argument('--tag-file', metavar='JSON',
+                        help='从 JSON 文件读取标签规则，支持别名、优先级、大小写与整词设置')
+    parser.add_argument('-n', '--dry-run', action='store_true',
+                        help='只列出将要执行的重命名、标签来源与冲突，不重命名')
+    parser.add_argument('-q', '--quiet', action='store_true',
+                        help='不输出处理日志')
+    parser.add_argument('-r', '--recursive', action='store_true',
+                        help='递归处理子文件夹')
+    parser.add_argument('--max-depth', type=int, metavar='N',
+                        help='递归深度上限（0 表示只处理指定文件夹）')
+    parser.add_argument('--include', action='append', metavar='GLOB',
+                        help='只处理匹配的文件名，可多次指定')
+    parser.add_argument('--exclude', action='append', metavar='GLOB',
+                        help='跳过匹配的文件或文件夹，可多次指定')
+    parser.add_argument('--detect', action='store_true',
+                        help='按文件头检查所有文件，找出扩展名写错的压缩包')
+    parser.add_argument('--nested', type=int, default=0, metavar='N',
+                        help='外层没有命中时继续解析 N 层内层压缩包（默认 0 不解析）')
+    parser.add_argument('--nested-max-mb', type=int, default=64, metavar='MB',
+                        help='每个压缩包解析内层时最多读取的数据量（默认 64 MB）')
+    parser.add_argument('--nested-timeout', type=float, default=10.0, metavar='SEC',
+                        help='每个压缩包解析内层的时间上限（默认 10 秒）')
+    parser.add_argument('--queue-size', type=int, metavar='N',
+                        help='待处理队列长度上限（默认线程数的 4 倍）')
+    parser.add_argument('-p', '--processes', type=int, default=0, metavar='N',
+                        help='用 N 个子进程解析 7z/rar（默认 0 表示不使用进程池）')
+    parser.add_argument('--cache', metavar='PATH',
+                        help='识别结果缓存文件（默认位于用户缓存目录）')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='不使用识别结果缓存')
+    parser.add_argument('--rebuild-cache', action='store_true',
+                        help='清空缓存后重新识别所有压缩包')
+    parser.add_argument('--cache-size', type=int, metavar='N',
+                        help='缓存条目上限，超出后淘汰最久未使用的条目')
+    parser.add_argument('--index', action='store_true',
+                        help='识别时把成员列表写入成员索引，之后可用 find 查询（需要读取完整的成员列表）')
+    parser.add_argument('--index-file', metavar='PATH',
+                        help='成员索引文件（默认位于用户缓存目录）')
+    parser.add_argument('--journal-dir', metavar='DIR',
+                        help='撤销记录目录（默认位于用户缓存目录）')
+    parser.add_argument('--no-journal', action='store_true',
+                        help='不写撤销记录')
+    parser.add_argument('--checkpoint-dir', metavar='DIR',
+                        help='断点记录目录（默认位于用户缓存目录），中断后以相同参数再次运行时从断点继续')
+    parser.add_argument('--no-checkpoint', action='store_true',
+                        help='不写断点记录，每次都从头开始')
+    parser.add_argument('--metrics', metavar='FILE',
+                        help='运行结束后把各阶段耗时与计数写入文件')
+    parser.add_argument('--metrics-format', choices=('json', 'prometheus'),
+                        help='--metrics 的格式（默认按扩展名判断，.prom 为 Prometheus 文本格式，其余为 JSON）')
+    parser.add_argument('--profile', metavar='FILE',
+                        help='在 cProfile 下运行并把统计写入文件（用 python -m pstats FILE 查看）')
+
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('scan', help='只判断标签，不重命名')
+    p.add_argument('directory')
+
+    p = sub.add_parser('tag', help='按文件名或压缩包内容添加标签')
+    p.add_argument('directory')
+
+    p = sub.add_parser('tag-direct', help='不识别内容，直接给所有压缩包添加指定标签')
+    p.add_argument('directory')
+    p.add_argument('text', metavar='tag')
+
+    p = sub.add_parser('prefix', help='添加前缀')
+    p.add_argument('directory')
+    p.add_argument('text')
+
+    p = sub.add_parser('suffix', help='添加后缀')
+    p.add_argument('directory')
+    p.add_argument('text')
+
+    p = sub.add_parser('rename', help='按模板一次完成标签、前缀、后缀等重命名')
+    p.add_argument('directory')
+    p.add_argument('template', nargs='?', default=DEFAULT_TEMPLATE,
+                   help=f'重命名模板（默认 "{DEFAULT_TEMPLATE}"），'
+                        '可用 {tag} {prefix} {suffix} {stem} {name} {ext} '
+                        '{date} {time} {datetime} {mtime} {counter}')
+    p.add_argument('--prefix', default='', help='{prefix} 的值')
+    p.add_argument('--suffix', default='', help='{suffix} 的值')
+    p.add_argument('--counter-start', type=int, default=1, metavar='N',
+                   help='{counter} 的起始值（默认 1）')
+
+    p = sub.add_parser('watch', help='持续监视目录，给新到达的压缩包添加标签（按 Ctrl+C 停止）')
+    p.add_argument('directory')
+    p.add_argument('--settle', type=float, default=DEFAULT_SETTLE, metavar='SEC',
+                   help=f'文件大小多少秒不再变化后才处理（默认 {DEFAULT_SETTLE:g}）')
+    p.add_argument('--interval', type=float, default=DEFAULT_INTERVAL, metavar='SEC',
+                   help=f'定时扫描的间隔（默认 {DEFAULT_INTERVAL:g}）')
+    p.add_argument('--poll', action='store_true', default=None,
+                   help='强制定时扫描（默认仅在网络挂载或 inotify 不可用时使用）')
+    p.add_argument('--scan-existing', action='store_true',
+                   help='开始监视前先处理目录中已有的文件')
+
+    p = sub.add_parser('jobs', help='按作业清单（JSON 或 TOML）同时处理多个目录，共享线程池并按优先级调度')
+    p.add_argument('manifest')
+    p.add_argument('--progress-interval', type=float, default=DEFAULT_PROGRESS_INTERVAL,
+                   metavar='SEC',
+                   help=f'每隔多少秒输出各作业的进度（默认 {DEFAULT_PROGRESS_INTERVAL:g}，0 表示不输出）')
+
+    p = sub.add_parser('find', help='在成员索引中查找包含指定文件的压缩包，不打开压缩包')
+    p.add_argument('pattern', nargs='?', default='',
+                   help='成员名中的文字，或通配符如 "*一层*.dwg"（不区分大小写）')
+    p.add_argument('--ext', metavar='EXT', help='只查找该扩展名的成员，如 .dwg')
+    p.add_argument('--under', metavar='DIR', help='只查找该目录下的压缩包')
+    p.add_argument('--limit', type=int, default=1000, metavar='N',
+                   help='最多显示的结果数（默认 1000，0 表示不限）')
+    p.add_argument('--archives', action='store_true', help='只列出压缩包路径')
+    p.add_argument('--prune', action='store_true', help='先删除索引中已不存在的压缩包')
+
+    p = sub.add_parser('undo', help='按撤销记录恢复原文件名')
+    p.add_argument('journal')
+
+    return parser
+
+
+def find(args):
+    """find 命令：查询成员索引，有结果时返回 0"""
+    from yaya.index import MemberIndex
+    try:
+        index = MemberIndex(args.index_file)
+    except Exception as e:
+        print(f"无法打开成员索引: {e}", file=sys.stderr)
+        return 2
+    with index:
+        if args.prune:
+            removed = index.prune()
+            print(f"已从索引中删除 {removed} 个不存在的压缩包", file=sys.stderr)
+        hits = index.search(args.pattern, args.ext, args.under, args.limit)
+    if args.archives:
+        for path in dict.fromkeys(hit.archive for hit in hits):
+            print(path)
+    else:
+        for hit in hits:
+            print(f"{hit.archive}\t{hit.name}\t{hit.size}")
+    return 0 if hits else 1
+
+
+SOURCE_LABELS = {engine.SOURCE_FILENAME: '文件名', engine.SOURCE_CONTENT: '内容'}
+
+
+def print_plan(plan, echo):
+    """--dry-run：按路径顺序输出计划中的每条重命名，格式为 原路径<TAB>新文件名<TAB>标签来源<TAB>冲突"""
+    for entry in sorted(plan.entries, key=lambda e: (e.directory, e.old)):
+        echo(f"{entry.path}\t{entry.new}\t{SOURCE_LABELS.get(entry.source, '-')}\t"
+             f"{entry.conflict or '-'}")
+
+
+def print_progress(text):
+    """作业进度输出到标准错误，与结果分开"""
+    print(text, file=sys.stderr, flush=True)
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == 'find':
+        return find(args)
+    if args.dry_run and args.command in ('watch', 'undo'):
+        parser.error(f"{args.command} 不支持 --dry-run")
+
+    try:
+        ext_tag_map = parse_mapping(args.map, args.map_file)
+        tag_rules = parse_tags(args.tag, args.tag_file)
+        jobs = None
+        if args.command == 'jobs':
+            # 命令行的映射、标签与扫描范围作为清单的默认设置
+            from yaya.jobs import load_manifest
+            jobs = load_manifest(args.manifest, {
+                'map': ext_tag_map, 'tags': tag_rules, 'recursive': args.recursive,
+                'max_depth': args.max_depth, 'include': args.include, 'exclude': args.exclude})
+    except (OSError, ValueError, argparse.ArgumentTypeError) as e:
+        parser.error(str(e))
+
+    # 日志与扫描结果可能来自多个工作线程，统一加锁输出
+    lock = threading.Lock()
+
+    def echo(message):
+        with lock:
+            print(message, flush=True)
+
+    log = (lambda message: None) if args.quiet else echo
+
+    cache = None
+    if args.command in ('scan', 'tag', 'rename', 'watch', 'jobs') and not args.no_cache:
+        from yaya.cache import ArchiveCache, DEFAULT_MAX_ENTRIES
+        try:
+            cache = ArchiveCache(args.cache, max_entries=args.cache_size or DEFAULT_MAX_ENTRIES)
+            if args.rebuild_cache:
+                cache.clear()
+        except Exception as e:
+            print(f"无法打开缓存，本次不使用缓存: {e}", file=sys.stderr)
+            cache = None
+
+    # 前缀、后缀与撤销不读取成员，但仍需同步索引中的路径
+    index = None
+    if args.index:
+        from yaya.index import MemberIndex
+        try:
+            index = MemberIndex(args.index_file)
+        except Exception as e:
+            print(f"无法打开成员索引，本次不建立索引: {e}", file=sys.stderr)
+
+    inspector = None
+    if args.command in ('scan', 'tag', 'rename', 'watch', 'jobs') and args.processes > 0:
+        from yaya.procpool import ProcessInspector
+        inspector = ProcessInspector(args.processes)
+
+    nested = None
+    if args.nested > 0:
+        from yaya.nested import NestedOptions
+        nested = NestedOptions(args.nested, args.nested_max_mb * 1024 * 1024, args.nested_timeout)
+
+    journal_dir = None
+    if not args.no_journal:
+        from yaya.journal import default_journal_dir
+        journal_dir = args.journal_dir or default_journal_dir()
+
+    checkpoint_dir = None
+    if not args.no_checkpoint:
+        from yaya.checkpoint import default_checkpoint_dir
+        checkpoint_dir = args.checkpoint_dir or default_checkpoint_dir()
+
+    # 第一次 Ctrl+C 等待进行中的文件处理完成后退出，再按一次立即退出
+    control = RunControl()
+
+    def interrupt(signum, frame):
+        if control.cancelled:
+            raise KeyboardInterrupt
+        control.cancel()
+        print("正在取消，等待进行中的文件处理完成（再按一次 Ctrl+C 立即退出）",
+              file=sys.stderr, flush=True)
+
+    # 信号处理只能在主线程中设置（如被其他程序在线程中调用时不设置）
+    previous_handler = None
+    if threading.current_thread() is threading.main_thread():
+        previous_handler = signal.signal(signal.SIGINT, interrupt)
+
+    plans = []
+    # 作业清单中的各作业共用这些设置
+    options = dict(threads=args.threads, log=log, queue_size=args.queue_size, cache=cache,
+                   inspector=inspector, journal_dir=journal_dir, detect=args.detect,
+                   nested=nested, checkpoint_dir=checkpoint_dir,
+                   max_io_threads=args.max_io_threads, cpu_threads=args.cpu_threads,
+                   index=index, dry_run=args.dry_run,
+                   on_plan=plans.append if args.dry_run else None)
+    runner = engine.RenameEngine(ext_tag_map, recursive=args.recursive,
+                                 max_depth=args.max_depth, include=args.include,
+                                 exclude=args.exclude, tag_rules=tag_rules, control=control,
+                                 **options)
+    job_runner = None
+
+    def run_jobs():
+        nonlocal job_runner
+        from yaya.jobs import JobRunner, build_pool
+        pool = build_pool(args.threads, control, args.max_io_threads, args.cpu_threads,
+                          inspector.processes if inspector is not None else 0, args.queue_size)
+        try:
+            job_runner = JobRunner(jobs, pool, metrics=runner.metrics, **options)
+        except Exception:
+            pool.close()
+            raise
+        if args.quiet or args.progress_interval <= 0:
+            report = None
+        else:
+            report = print_progress
+        return job_runner.run(report, args.progress_interval or None)
+
+    def run():
+        if args.command == 'scan':
+            runner.scan(args.directory, lambda path, tag: echo(f"{tag or '-'}\t{path}"))
+            return None
+        elif args.command == 'tag':
+            return runner.tag(args.directory)
+        elif args.command == 'tag-direct':
+            return runner.tag_directly(args.directory, args.text)
+        elif args.command == 'prefix':
+            return runner.prefix(args.directory, args.text)
+        elif args.command == 'suffix':
+            return runner.suffix(args.directory, args.text)
+        elif args.command == 'watch':
+            from yaya.watch import watch
+            return watch(runner, args.directory, args.settle, args.interval, args.poll,
+                         args.scan_existing)
+        elif args.command == 'jobs':
+            return run_jobs()
+        elif args.command == 'rename':
+            template = runner.compile_template(args.template, args.prefix, args.suffix,
+                                               args.counter_start)
+            return runner.rename(args.directory, template)
+        else:
+            return runner.undo(args.journal)
+
+    try:
+        if args.profile:
+            from yaya.metrics import run_profiled
+            stats = run_profiled(run, args.profile)
+        else:
+            stats = run()
+    except TemplateError as e:
+        print(str(e), file=sys.stderr)
+        return 2
+    except OSError as e:
+        target = {'undo': 'journal', 'jobs': 'manifest'}.get(args.command, 'directory')
+        target = getattr(args, target)
+        print(f"无法处理 {target}: {e}", file=sys.stderr)
+        return 2
+    finally:
+        if previous_handler is not None:
+            signal.signal(signal.SIGINT, previous_handler)
+        if inspector is not None:
+            inspector.close()
+        if cache is not None:
+            cache.close()
+        if index is not None:
+            index.close()
+
+    for plan in plans:
+        print_plan(plan, echo)
+    if job_runner is not None:
+        print(job_runner.summary(), file=sys.stderr)
+    if not args.quiet:
+        print(runner.metrics.summary(stats), file=sys.stderr)
+    if args.metrics:
+        fmt = args.metrics_format or ('prometheus' if args.metrics.endswith('.prom') else 'json')
+        try:
+            runner.metrics.write(args.metrics, fmt, stats)
+        except OSError as e:
+            print(f"无法写入 {args.metrics}: {e}", file=sys.stderr)
+    if args.profile:
+        print(f"性能分析结果: {args.profile}", file=sys.stderr)
+
+    if stats is None:
+        return 130 if control.cancelled else 0
+    if args.command == 'watch':
+        # 监视模式以 Ctrl+C 正常结束
+        return 1 if stats.errors else 0
+    if stats.cancelled:
+        return 130
+    return 1 if stats.errors or stats.skipped else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
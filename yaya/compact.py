@@ -0,0 +1,176 @@
+"""大量条目的紧凑存储
+
+扫描结果与重命名计划可能有几百万条。每条用一个 Python 对象加几个 str 保存时，对象头、
+属性、字符串头部与列表指针合计每条三四百字节；这里改为按列存储：
+
+- 文件名按 UTF-8 连续存入一个 bytearray，另用 array('Q') 记录每个名称的结束位置，读取时才解码；
+- 父目录、标签、标签来源、分卷组等重复出现的字符串放入 StringTable，条目中只存编号；
+- 标签编号即配置的标签表中的位置加一（0 表示没有标签），修改时间存入 array('d')。
+
+每条的固定开销（字节，另加名称的 UTF-8 长度；array 与 bytearray 扩容时最多多预留约 1/8）：
+- EntryTable（扫描结果）：ENTRY_BYTES，即目录 4 + 名称结束位置 8 + 标签 2 + 来源 1，
+  记录修改时间时另加 8；
+- RenamePlan（重命名计划）：PLAN_ENTRY_BYTES，即目录 4 + 原名与新名的结束位置 16 + 标志 1
+  + 来源 1 + 分卷组 4，名称长度按原名与新名之和计算；resolve 之后每条可执行的步骤另占
+  RESOLVED_BYTES（条目下标 4 + 步骤类型 1）。resolve 先按目录分组（每条 RESOLVE_INDEX_BYTES），
+  再逐个目录计算，计算时另需临时内存，每条约 RESOLVE_PEAK_BYTES，按最大的一个目录的条目数计算。
+
+每个目录、标签只保存一份，另占字符串本身加 TABLE_ENTRY_BYTES。按平均 30 字节的文件名计算，
+500 万条扫描结果约 250 MB，500 万条重命名计划约 450 MB；`python -m yaya.bench --memory` 实测每条的占用并与预算比较。
+"""
+import os
+import threading
+from array import array
+
+
+ENTRY_BYTES = 4 + 8 + 2 + 1
+MTIME_BYTES = 8
+PLAN_ENTRY_BYTES = 4 + 16 + 1 + 1 + 4
+RESOLVED_BYTES = 4 + 1
+RESOLVE_INDEX_BYTES = 4
+# 实测约 170（排序时的临时 int 列表约占一半）
+RESOLVE_PEAK_BYTES = 200
+
+# array 与 bytearray 扩容时预留的比例上限
+GROWTH = 1.125
+# StringTable 中每个不同的值另占的表项（字典与列表），不含字符串本身
+TABLE_ENTRY_BYTES = 100
+
+
+class StringTable:
+    """字符串与编号的双向映射，相同的字符串只保存一份
+
+    编号按加入顺序从 0 开始分配，values 中可以预先放入固定编号的值（如 None 占用 0）。
+    不加锁，并发调用 intern 时由调用方加锁。
+    """
+
+    __slots__ = ('values', '_ids')
+
+    def __init__(self, values=()):
+        self.values = list(values)
+        self._ids = {value: i for i, value in enumerate(self.values)}
+
+    def __len__(self):
+        return len(self.values)
+
+    def intern(self, value):
+        """value 的编号，首次出现时加入"""
+        index = self._ids.get(value)
+        if index is None:
+            index = self._ids[value] = len(self.values)
+            self.values.append(value)
+        return index
+
+    def id(self, value):
+        """value 的编号，不在表中时返回 None"""
+        return self._ids.get(value)
+
+
+class NameColumn:
+    """按加入顺序存储的字符串列，以 UTF-8 编码连续存放
+
+    用 surrogatepass 编码，Linux 上无法解码的文件名（surrogateescape 产生的代理字符）
+    与 Windows 上不成对的代理字符都能原样取回。
+    """
+
+    __slots__ = ('_data', '_ends')
+
+    def __init__(self):
+        self._data = bytearray()
+        self._ends = array('Q')
+
+    def __len__(self):
+        return len(self._ends)
+
+    def append(self, text):
+        self._data += text.encode('utf-8', 'surrogatepass')
+        self._ends.append(len(self._data))
+
+    def __getitem__(self, index):
+        ends = self._ends
+        start = ends[index - 1] if index else 0
+        return self._data[start:ends[index]].decode('utf-8', 'surrogatepass')
+
+    def raw(self, index):
+        """第 index 个名称的 UTF-8 字节，不解码，用于比较与计算哈希"""
+        ends = self._ends
+        start = ends[index - 1] if index else 0
+        return bytes(self._data[start:ends[index]])
+
+    def decode(self, start, stop, step=1):
+        """第 start 到 stop（不含）个名称中每隔 step 个的列表，整段读取比逐个下标读取快"""
+        ends = self._ends
+        stops = ends[start:stop:step]
+        if start:
+            starts = ends[start - 1:stop - 1:step]
+        else:
+            starts = array('Q', [0]) + ends[step - 1:stop - 1:step]
+        data = self._data
+        return [data[a:b].decode('utf-8', 'surrogatepass') for a, b in zip(starts, stops)]
+
+
+class EntryTable:
+    """按列存储的扫描结果：路径、标签、标签来源，以及可选的修改时间
+
+    tags 为配置的标签表，不在表中的标签首次出现时追加。可在多个工作线程中并发 add；
+    按下标读取时不加锁，只读取已加入的条目。迭代与下标访问得到 (路径, 标签)，
+    与原来的 [(路径, 标签)] 列表用法相同。
+    """
+
+    def __init__(self, tags=(), mtimes=False):
+        self.directories = StringTable()
+        self.tags = StringTable([None] + [tag for tag in tags if tag is not None])
+        self.sources = StringTable([None])
+        self._dirs = array('I')
+        self._names = NameColumn()
+        self._tags = array('H')
+        self._sources = bytearray()
+        self._mtimes = array('d') if mtimes else None
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def add(self, path, tag=None, source=None, mtime=None):
+        """加入一条，返回其下标；未记录修改时间的表忽略 mtime"""
+        directory, name = os.path.split(path)
+        with self._lock:
+            self._dirs.append(self.directories.intern(directory))
+            self._names.append(name)
+            self._tags.append(self.tags.intern(tag))
+            self._sources.append(self.sources.intern(source))
+            if self._mtimes is not None:
+                self._mtimes.append(mtime or 0.0)
+            index = self._count
+            self._count += 1
+        return index
+
+    def __len__(self):
+        return self._count
+
+    def directory(self, index):
+        return self.directories.values[self._dirs[index]]
+
+    def name(self, index):
+        return self._names[index]
+
+    def path(self, index):
+        return os.path.join(self.directories.values[self._dirs[index]], self._names[index])
+
+    def tag(self, index):
+        return self.tags.values[self._tags[index]]
+
+    def source(self, index):
+        return self.sources.values[self._sources[index]]
+
+    def mtime(self, index):
+        return None if self._mtimes is None else self._mtimes[index]
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError(index)
+        return self.path(index), self.tag(index)
+
+    def __iter__(self):
+        for i in range(self._count):
+            yield self.path(i), self.tag(i)
@@ -0,0 +1,41 @@
+"""运行控制：暂停、继续与取消
+
+界面线程（或命令行的信号处理）调用 pause/resume/cancel，工作线程在取下一个条目前调用 wait。
+取消后不再开始新的条目，正在处理的条目照常完成，队列中剩余的条目直接丢弃。
+"""
+import threading
+
+
+class RunControl:
+    """一次运行的暂停与取消状态，可在多个线程间共享"""
+
+    def __init__(self):
+        self._cancelled = threading.Event()
+        self._running = threading.Event()
+        self._running.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    @property
+    def paused(self):
+        return not self._running.is_set() and not self._cancelled.is_set()
+
+    def pause(self):
+        """暂停：正在处理的条目完成后，工作线程停在下一个条目前"""
+        self._running.clear()
+
+    def resume(self):
+        """继续暂停的运行"""
+        self._running.set()
+
+    def cancel(self):
+        """取消运行，同时唤醒暂停中的工作线程"""
+        self._cancelled.set()
+        self._running.set()
+
+    def wait(self):
+        """暂停时阻塞到继续或取消，返回是否应继续处理"""
+        self._running.wait()
+        return not self._cancelled.is_set()
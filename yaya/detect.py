@@ -0,0 +1,107 @@
+"""压缩包类型识别与成员扩展名匹配
+
+压缩包类型按文件头判断（每个文件只读开头几个字节），扩展名写错的压缩包同样能识别；
+成员文件按多段扩展名匹配映射，如 .tar.gz、.skp.bak，最长的后缀优先。
+"""
+import os
+from functools import lru_cache
+
+
+# 支持的压缩包类型，以规范扩展名表示
+ARCHIVE_TYPES = ('.zip', '.rar', '.7z')
+
+# (文件头, 类型)；zip 包括空压缩包与分卷标记，rar 同时匹配 RAR4 与 RAR5
+MAGIC = (
+    (b'PK\x03\x04', '.zip'),
+    (b'PK\x05\x06', '.zip'),
+    (b'PK\x07\x08', '.zip'),
+    (b'Rar!\x1a\x07', '.rar'),
+    (b"7z\xbc\xaf'\x1c", '.7z'),
+)
+
+HEADER_SIZE = 8
+
+# 成员扩展名最多取最后几段，且每段不超过 MAX_PART_LENGTH 个字符、不含空白
+MAX_SUFFIX_PARTS = 3
+MAX_PART_LENGTH = 16
+
+
+def sniff_type(path):
+    """按文件头判断压缩包类型，不是已知压缩包时返回 None"""
+    with open(path, 'rb') as f:
+        header = f.read(HEADER_SIZE)
+    for magic, kind in MAGIC:
+        if header.startswith(magic):
+            return kind
+    return None
+
+
+def type_from_name(name):
+    """按扩展名判断压缩包类型"""
+    lower = name.lower()
+    for kind in ARCHIVE_TYPES:
+        if lower.endswith(kind):
+            return kind
+    return None
+
+
+def detect_type(path, name=None):
+    """先看文件头，再看扩展名（如带自解压前缀的 zip）；都不是压缩包时返回 None"""
+    return sniff_type(path) or type_from_name(name or os.path.basename(path))
+
+
+def member_suffix(name):
+    """成员文件的多段扩展名（小写），如 model.skp.bak -> .skp.bak；没有扩展名时返回空串"""
+    base = name.replace('\\', '/').rsplit('/', 1)[-1].lstrip('.')
+    parts = base.lower().split('.')
+    suffix = []
+    for part in reversed(parts[1:]):
+        if not part or len(part) > MAX_PART_LENGTH or part != ''.join(part.split()):
+            break
+        suffix.append(part)
+        if len(suffix) == MAX_SUFFIX_PARTS:
+            break
+    if not suffix:
+        return ''
+    return '.' + '.'.join(reversed(suffix))
+
+
+class SuffixIndex:
+    """按扩展名后缀查找标签的反向前缀树
+
+    映射中的扩展名倒序插入树中，匹配时从成员扩展名末尾逐字符向前查找，
+    记下最后经过的标签，因此 .skp.bak 优先于 .bak。
+    """
+
+    def __init__(self, ext_tag_map):
+        self._root = {}
+        for ext, tag in ext_tag_map.items():
+            ext = ext.lower()
+            if not ext.startswith('.'):
+                ext = '.' + ext
+            node = self._root
+            for char in reversed(ext):
+                node = node.setdefault(char, {})
+            node[None] = tag
+
+    def match(self, suffix):
+        """返回最长命中的扩展名对应的标签"""
+        node = self._root
+        tag = None
+        for char in reversed(suffix):
+            node = node.get(char)
+            if node is None:
+                break
+            if None in node:
+                tag = node[None]
+        return tag
+
+
+def suffix_index(ext_tag_map):
+    """返回映射对应的 SuffixIndex，相同映射复用同一个"""
+    return _suffix_index(tuple(sorted(ext_tag_map.items())))
+
+
+@lru_cache(maxsize=16)
+def _suffix_index(items):
+    return SuffixIndex(dict(items))
@@ -0,0 +1,1087 @@
+"""重命名核心引擎（不依赖 PyQt5，GUI 与命令行共用）"""
+import collections
+import os
+import queue
+import threading
+import time
+
+from yaya.adaptive import (CPU_TYPES, DEFAULT_INITIAL, DEFAULT_MAX_IO, AdaptiveLimit,
+                           default_cpu_threads)
+from yaya.checkpoint import Checkpoint, run_key
+from yaya.compact import EntryTable
+from yaya.control import RunControl
+from yaya.detect import ARCHIVE_TYPES, detect_type, member_suffix, suffix_index
+from yaya.journal import RenameJournal, read_journal
+from yaya.metrics import ARCHIVES, NULL_METRICS, Metrics
+from yaya.nested import LEVEL_MARK, inspect_nested
+from yaya.plan import RenamePlan, apply_moves, is_temp_name
+from yaya.rarscan import RarFormatError, iter_rar_entries
+from yaya.scanner import accepts_file, iter_archives
+from yaya.tags import TagMatcher, TagRule
+from yaya.template import RenameTemplate
+from yaya.volumes import VolumeSet, group_volumes, is_volume_name, open_volumes
+from yaya.zipscan import iter_zip_entries, iter_zip_names
+
+
+ARCHIVE_EXTS = ARCHIVE_TYPES
+
+DEFAULT_EXT_TAG_MAP = {
+    '.skp': 'SU',
+    '.max': '3D',
+    '.dwg': 'CAD'
+}
+
+DEFAULT_TAGS = ['3D', 'SU', 'CAD']
+
+# 标签来源：文件名中已有，或由压缩包内容识别
+SOURCE_FILENAME = 'filename'
+SOURCE_CONTENT = 'content'
+
+
+def build_tag_matcher(ext_tag_map=None, rules=None):
+    """编译文件名标签匹配器：标签规则（默认 DEFAULT_TAGS）加上映射中出现的全部标签"""
+    rules = list(DEFAULT_TAGS if rules is None else rules)
+    known = {TagRule.parse(rule).tag for rule in rules}
+    for tag in (ext_tag_map or {}).values():
+        if tag not in known:
+            known.add(tag)
+            rules.append(tag)
+    return TagMatcher(rules)
+
+
+DEFAULT_MATCHER = build_tag_matcher(DEFAULT_EXT_TAG_MAP)
+
+
+# 生产者等待队列空位时检查工作线程是否存活的间隔（秒）
+PUT_TIMEOUT = 0.5
+
+
+def run_pipeline(items, func, workers=4, queue_size=None, control=None, limit=None):
+    """用固定数量的工作线程处理 items，返回各线程汇总的 RunStats
+
+    items 可以是生成器：生产者按需读取，队列长度有上限，内存占用与条目总数无关。
+    func 返回 True 计为已重命名，None 计为出错，其余值只计数。
+    control 为 RunControl 时，暂停期间生产者与工作线程都停在下一个条目前；
+    取消后停止读取 items，队列中剩余的条目不再处理也不计数。
+    limit 为 AdaptiveLimit 时 workers 是线程数上限：工作线程取得许可后才取下一个条目，
+    处理耗时计入 limit 的吞吐统计；线程随限制值提高按需启动。
+    有工作线程意外退出时抛出 RuntimeError；全部退出时生产者不再等待队列空位。
+    """
+    stats = RunStats()
+    if workers <= 1:
+        for item in items:
+            if control is not None and not control.wait():
+                break
+            stats.add(func(item))
+        return stats
+
+    work_queue = queue.Queue(maxsize=queue_size or workers * 4)
+    done = object()
+    worker_stats = []
+    # 收到结束标记正常退出的工作线程
+    finished = []
+
+    def worker():
+        local = RunStats()
+        worker_stats.append(local)
+        while True:
+            if limit is not None:
+                limit.acquire()
+            item = work_queue.get()
+            elapsed = None
+            try:
+                if item is done:
+                    finished.append(local)
+                    break
+                if control is not None and not control.wait():
+                    continue
+                start = time.perf_counter()
+                try:
+                    local.add(func(item))
+                except Exception:
+                    local.add(None)
+                elapsed = time.perf_counter() - start
+            finally:
+                if limit is not None:
+                    limit.release(elapsed)
+
+    threads = []
+
+    def start_workers():
+        wanted = workers if limit is None else min(workers, limit.limit)
+        while len(threads) < wanted:
+            thread = threading.Thread(target=worker, daemon=True)
+            threads.append(thread)
+            thread.start()
+
+    def put(item):
+        # 队列满时定时检查工作线程是否还在，全部退出时返回 False
+        while True:
+            try:
+                work_queue.put(item, timeout=PUT_TIMEOUT)
+                return True
+            except queue.Full:
+                if not any(thread.is_alive() for thread in threads):
+                    return False
+
+    start_workers()
+    try:
+        for item in items:
+            if control is not None and not control.wait():
+                break
+            if not put(item):
+                break
+            if limit is not None:
+                start_workers()
+    finally:
+        for _ in threads:
+            if not put(done):
+                break
+        for thread in threads:
+            thread.join()
+    if len(finished) < len(threads):
+        raise RuntimeError("工作线程意外退出，未处理完所有文件")
+
+    for local in worker_stats:
+        stats.merge(local)
+    return stats
+
+
+def get_tag_from_filename(filename, matcher=None):
+    """从文件名中提取标签"""
+    return (matcher or DEFAULT_MATCHER).match(filename)
+
+
+def iter_rar_members(source):
+    """逐个产出 RAR 成员的 (文件名, 未压缩大小)，不含目录
+
+    先按块头直接读取（见 yaya.rarscan）；文件头加密、自解压等无法直接读取时改用 rarfile，
+    中途才出错时跳过已经产出的成员（按文件名与大小，不依赖两者的成员顺序）。
+    source 为路径或二进制文件对象。
+    """
+    done = collections.Counter()
+    try:
+        for entry in iter_rar_entries(source):
+            yield entry
+            done[entry] += 1
+        return
+    except RarFormatError:
+        pass
+    if not isinstance(source, str):
+        source.seek(0)
+    import rarfile
+    with rarfile.RarFile(source, 'r') as rar_ref:
+        infos = [info for info in rar_ref.infolist() if not info.is_dir()]
+    for info in infos:
+        entry = (info.filename, info.file_size)
+        if done[entry]:
+            done[entry] -= 1
+            continue
+        yield entry
+
+
+def list_members(archive_path, kind=None, parts=None):
+    """列出压缩包内的文件名，不是压缩包时返回 None
+
+    kind 为文件头识别出的类型，未指定时现场识别；parts 为按字节切分的分卷，按顺序拼接后读取。
+    zip 与 rar 返回逐条读取目录或块头的生成器，调用方可以提前停止；其他类型返回列表。
+    """
+    kind = kind or detect_type(archive_path)
+    if kind is None:
+        return None
+
+    # 压缩库按需导入，命令行启动时不加载 rarfile/py7zr
+    if parts:
+        with open_volumes(parts) as f:
+            if kind == '.zip':
+                import zipfile
+                with zipfile.ZipFile(f) as zip_ref:
+                    return zip_ref.namelist()
+            elif kind == '.rar':
+                return [name for name, _ in iter_rar_members(f)]
+            else:
+                import py7zr
+                with py7zr.SevenZipFile(f, 'r') as sz_ref:
+                    return sz_ref.getnames()
+
+    if kind == '.zip':
+        return iter_zip_names(archive_path)
+    elif kind == '.rar':
+        return (name for name, _ in iter_rar_members(archive_path))
+    else:
+        import py7zr
+        with py7zr.SevenZipFile(archive_path, 'r') as sz_ref:
+            return sz_ref.getnames()
+
+
+def list_member_entries(archive_path, kind=None, parts=None):
+    """列出压缩包内的 [(文件名, 未压缩大小)]（不含目录），不是压缩包时返回 None
+
+    与 list_members 相同，但总是读出完整的成员列表，供成员索引使用。
+    """
+    kind = kind or detect_type(archive_path)
+    if kind is None:
+        return None
+    if kind == '.zip' and not parts:
+        return [(name, size) for name, size in iter_zip_entries(archive_path)
+                if not name.endswith('/')]
+
+    source = open_volumes(parts) if parts else archive_path
+    try:
+        if kind == '.zip':
+            import zipfile
+            with zipfile.ZipFile(source) as zip_ref:
+                return [(info.filename, info.file_size) for info in zip_ref.infolist()
+                        if not info.is_dir()]
+        elif kind == '.rar':
+            return list(iter_rar_members(source))
+        else:
+            import py7zr
+            with py7zr.SevenZipFile(source, 'r') as sz_ref:
+                return [(info.filename, info.uncompressed or 0) for info in sz_ref.list()
+                        if not info.is_directory]
+    finally:
+        if parts:
+            source.close()
+
+
+# 压缩包中没有内层压缩包时，摘要对任意嵌套层数都是完整的
+ALL_DEPTHS = 1 << 16
+
+
+def match_exts(exts, ext_tag_map, depth=0):
+    """返回第一个命中映射的成员扩展名对应的标签（多段扩展名取最长的匹配）
+
+    带层级标记的内层扩展名只在 depth 不小于其层级时参与匹配。
+    """
+    index = suffix_index(ext_tag_map)
+    for ext in exts:
+        level = len(ext) - len(ext.lstrip(LEVEL_MARK))
+        if level > depth:
+            continue
+        tag = index.match(ext[level:])
+        if tag:
+            return tag
+    return None
+
+
+def inspect_members(archive_path, ext_tag_map, kind=None, parts=None, nested=None, metrics=None,
+                    members=False):
+    """读取压缩包成员，返回 (标签, 扩展名摘要, 摘要是否完整, 摘要覆盖的嵌套层数)
+
+    逐个检查成员，命中映射后立即停止；此时扩展名摘要只是前缀，标记为不完整。
+    内层压缩包因预算未解析完时同样标记为不完整。
+    摘要记录各成员的多段扩展名（见 detect.member_suffix），映射改为 .tar.gz 一类也能重新匹配。
+    指定 nested（NestedOptions）且外层没有命中时，继续解析内层压缩包，见 yaya.nested。
+    不是压缩包时返回 None。该函数不依赖任何共享状态，可以在子进程中执行。
+    metrics 为 Metrics 时记录打开压缩包（open）、读取成员（list）与内层压缩包（nested）的耗时。
+    members 为 True 时（建立成员索引）不提前停止，读取完整的成员列表，
+    返回值末尾追加 [(文件名, 未压缩大小)]。
+    """
+    metrics = metrics or NULL_METRICS
+    entries = None
+    with metrics.timer('open'):
+        if members:
+            entries = list_member_entries(archive_path, kind, parts)
+            file_list = None if entries is None else [name for name, _ in entries]
+        else:
+            file_list = list_members(archive_path, kind, parts)
+    if file_list is None:
+        return None
+    result = _inspect_listing(archive_path, ext_tag_map, kind, parts, nested, metrics, file_list,
+                              members)
+    return result + (entries,) if members else result
+
+
+def _inspect_listing(archive_path, ext_tag_map, kind, parts, nested, metrics, file_list, full):
+    """按成员列表判断标签，见 inspect_members；full 为 True 时命中后继续读完整个列表"""
+    index = suffix_index(ext_tag_map)
+    seen = {}
+    inner = []
+    tag = None
+    with metrics.timer('list'):
+        try:
+            for filename in file_list:
+                suffix = member_suffix(filename)
+                if not suffix:
+                    continue
+                if suffix.endswith(ARCHIVE_TYPES):
+                    inner.append(filename)
+                if suffix in seen:
+                    continue
+                seen[suffix] = None
+                if tag:
+                    continue
+                tag = index.match(suffix)
+                if tag and not full:
+                    break
+        finally:
+            close = getattr(file_list, 'close', None)
+            if close:
+                close()
+
+    exts = list(seen)
+    if tag:
+        if full:
+            return tag, exts, True, 0 if inner else ALL_DEPTHS
+        return tag, exts, False, 0
+    if not inner:
+        return None, exts, True, ALL_DEPTHS
+    if nested is None or nested.depth <= 0:
+        return None, exts, True, 0
+
+    kind = kind or detect_type(archive_path)
+    source = open_volumes(parts) if parts else archive_path
+    with metrics.timer('nested'):
+        tag, inner_exts, truncated = inspect_nested(source, kind, inner, ext_tag_map, nested)
+    # 命中时摘要只是前缀；因预算未解析完时同样不完整，下次运行时重新解析
+    return tag, exts + inner_exts, tag is None and not truncated, nested.depth
+
+
+def archive_type(path, cache=None, metrics=None):
+    """按文件头判断文件是否为压缩包，返回类型或 None；指定 cache 时结果随文件指纹缓存"""
+    metrics = metrics or NULL_METRICS
+    fp = None
+    if cache is not None:
+        with metrics.timer('cache'):
+            fp = cache.fingerprint(path)
+            entry = cache.get(fp)
+        if entry is not None and entry.kind is not None:
+            return entry.kind or None
+    with metrics.timer('detect'):
+        kind = detect_type(path)
+    if kind is None and cache is not None:
+        cache.put(fp, None, [], True, kind='')
+    return kind
+
+
+def get_tag_from_content(archive_path, ext_tag_map, log=None, cache=None, inspector=None,
+                         volumes=None, nested=None, metrics=None, cpu_limit=None, index=None):
+    """从压缩包内容判断标签
+
+    指定 cache 时先按文件指纹查缓存，命中则不再打开压缩包。
+    缓存保存的是成员扩展名摘要而不是标签，修改映射后缓存依然有效：
+    摘要不完整时它是完整摘要的前缀，只有在前缀中未命中时才需要重新读取。
+    压缩包类型由文件头识别，与摘要一起缓存。
+    指定 inspector 时由它决定是否把解析交给进程池。
+    volumes 为 archive_path 所在的 VolumeSet 时整组只解析一次，指纹覆盖所有分卷。
+    nested 为 NestedOptions 时解析内层压缩包；缓存的摘要覆盖的层数不足时才重新读取。
+    metrics 为 Metrics 时记录各阶段耗时、按类型统计的压缩包数、缓存命中与出错数。
+    cpu_limit 为 AdaptiveLimit 时，在线程中解析 7z/rar 需先取得它的许可。
+    index 为 MemberIndex 时，尚未收录或已变化的压缩包不使用缓存，读取完整的成员列表写入索引。
+    """
+    metrics = metrics or NULL_METRICS
+    depth = nested.depth if nested else 0
+    try:
+        fp = None
+        kind = None
+        current = None
+        if index is not None:
+            with metrics.timer('index'):
+                current = index.stamp(archive_path, volumes.paths() if volumes else None)
+                if index.is_current(os.path.abspath(archive_path), current):
+                    current = None
+        if cache is not None:
+            with metrics.timer('cache'):
+                fp = cache.fingerprint(archive_path, volumes.paths() if volumes else None)
+                entry = None if current is not None else cache.get(fp)
+                if entry is not None:
+                    if entry.kind == '':
+                        metrics.count('cache_hits')
+                        return None
+                    tag = match_exts(entry.exts, ext_tag_map, depth)
+                    if tag or (entry.complete and entry.depth >= depth):
+                        metrics.count('cache_hits')
+                        return tag
+                    kind = entry.kind
+            metrics.count('cache_misses')
+
+        name = volumes.name if volumes else os.path.basename(archive_path)
+        if kind is None:
+            with metrics.timer('detect'):
+                kind = detect_type(archive_path, name)
+        if kind is None:
+            if cache is not None:
+                cache.put(fp, None, [], True, kind='')
+            if current is not None:
+                index.put(os.path.abspath(archive_path), current, None, [])
+            return None
+
+        metrics.count(ARCHIVES + kind.lstrip('.'))
+        parts = volumes.paths() if volumes and volumes.split else None
+        members = current is not None
+        if inspector is not None and inspector.handles(kind):
+            with metrics.timer('inspect'):
+                result = inspector.inspect(archive_path, ext_tag_map, kind, parts, nested,
+                                           members)
+        elif cpu_limit is not None and kind in CPU_TYPES:
+            result = cpu_limit.run(inspect_members, archive_path, ext_tag_map, kind, parts,
+                                   nested, metrics, members)
+        else:
+            result = inspect_members(archive_path, ext_tag_map, kind, parts, nested, metrics,
+                                     members)
+        if result is None:
+            return None
+
+        if members:
+            *result, entries = result
+            with metrics.timer('index'):
+                index.put(os.path.abspath(archive_path), current, kind, entries)
+        tag, exts, complete, explored = result
+        if not tag and not complete:
+            metrics.count('nested_incomplete')
+            if log:
+                log(f"内层压缩包超出解析预算，未全部检查: {archive_path}")
+        if cache is not None:
+            cache.put(fp, tag, exts, complete, kind, explored)
+        return tag
+
+    except Exception as e:
+        metrics.count('errors')
+        if log:
+            log(f"处理文件 {archive_path} 时出错: {str(e)}")
+        return None
+
+
+def tag_name(filename, tag, matcher=None):
+    """生成带标签的新文件名（先移除已存在的标签）"""
+    clean_name = (matcher or DEFAULT_MATCHER).strip_prefix(filename)
+    return f"{tag} {clean_name}"
+
+
+def prefix_name(filename, prefix):
+    """生成添加前缀后的文件名"""
+    return f"{prefix} {filename}"
+
+
+def suffix_name(filename, suffix):
+    """生成添加后缀后的文件名"""
+    name, ext = os.path.splitext(filename)
+    return f"{name} {suffix}{ext}"
+
+
+def classify_archive(file_path, ext_tag_map, log=None, cache=None, inspector=None, matcher=None,
+                     volumes=None, nested=None, metrics=None, cpu_limit=None, index=None):
+    """判断单个压缩包（或 volumes 指定的整组分卷）的标签：先看文件名，再看内容
+
+    index 为 MemberIndex 时文件名中已有标签的压缩包也会读取内容，以便写入索引。
+    """
+    return classify_archive_source(file_path, ext_tag_map, log, cache, inspector, matcher,
+                                   volumes, nested, metrics, cpu_limit, index)[0]
+
+
+def classify_archive_source(file_path, ext_tag_map, log=None, cache=None, inspector=None,
+                            matcher=None, volumes=None, nested=None, metrics=None, cpu_limit=None,
+                            index=None):
+    """与 classify_archive 相同，返回 (标签, 来源)；没有标签时来源为 None"""
+    metrics = metrics or NULL_METRICS
+    filename = volumes.name if volumes else os.path.basename(file_path)
+
+    # 1. 检查文件名中是否有标签
+    with metrics.timer('match'):
+        tag = get_tag_from_filename(filename, matcher)
+
+    # 2. 如果文件名中没有标签，检查压缩包内容
+    if not tag:
+        tag = get_tag_from_content(file_path, ext_tag_map, log, cache, inspector, volumes, nested,
+                                   metrics, cpu_limit, index)
+        return tag, (SOURCE_CONTENT if tag else None)
+    if index is not None:
+        get_tag_from_content(file_path, ext_tag_map, log, cache, inspector, volumes, nested,
+                             metrics, cpu_limit, index)
+    return tag, SOURCE_FILENAME
+
+
+def is_candidate(name):
+    """按文件名判断是否可能是压缩包或分卷"""
+    return name.lower().endswith(ARCHIVE_EXTS) or is_volume_name(name)
+
+
+def unpack_item(item):
+    """扫描条目为路径或 VolumeSet，返回 (路径, 用于命名的文件名, VolumeSet 或 None)"""
+    if isinstance(item, VolumeSet):
+        return item.path, item.name, item
+    return item, os.path.basename(item), None
+
+
+def undo_moves(records):
+    """由单个目录的撤销记录 [(原名, 新名)] 生成逆序执行的 [(原名, 新名, 显示名)]
+
+    恢复到临时名称的是循环重命名的中间步骤；从临时名称移回时显示撤销前的文件名。
+    """
+    origin = {}
+    for old, new in reversed(records):
+        if is_temp_name(old):
+            origin[old] = new
+            yield new, old, None
+        else:
+            yield new, old, origin.get(new, new)
+
+
+class _RenameCollector:
+    """与 RenameJournal.record 接口相同：转发给 journal（可为 None），并收集重命名得到的路径
+
+    移到临时名称的中间步骤不算；list.append 可在多个工作线程中直接调用。
+    """
+
+    def __init__(self, journal, paths):
+        self._journal = journal
+        self._paths = paths
+
+    def record(self, directory, old, new):
+        if self._journal is not None:
+            self._journal.record(directory, old, new)
+        if not is_temp_name(new):
+            self._paths.append(os.path.join(directory, new))
+
+
+class RunStats:
+    """一次运行的统计结果"""
+
+    def __init__(self):
+        self.total = 0
+        self.renamed = 0
+        self.errors = 0
+        self.skipped = 0
+        self.cancelled = False
+
+    def add(self, result):
+        """记录单个条目的处理结果"""
+        self.total += 1
+        if result is True:
+            self.renamed += 1
+        elif result is None:
+            self.errors += 1
+
+    def merge(self, other):
+        """合并另一个线程的统计"""
+        self.total += other.total
+        self.renamed += other.renamed
+        self.errors += other.errors
+        self.skipped += other.skipped
+        self.cancelled = self.cancelled or other.cancelled
+
+
+class RenameEngine:
+    """批量重命名引擎
+
+    log 与 progress 回调可能在工作线程中调用；threads 为 1 时在当前线程内顺序执行。
+    recursive/max_depth/include/exclude 控制目录扫描范围，见 scanner.iter_archives。
+    cache 为可选的 ArchiveCache，用于跳过未变化的压缩包。
+    inspector 为可选的 ProcessInspector：7z/rar 交给进程池解析，zip 仍在线程中处理；
+    此时工作线程数自动增加进程数，保证等待进程结果时线程池不会空闲。
+    journal_dir 不为空时每次执行都把实际发生的重命名写入该目录下的新记录文件，
+    文件路径保存在 last_journal 中，可用 undo 撤销。
+    tag_rules 为文件名标签规则（见 yaya.tags），默认 DEFAULT_TAGS；映射中的标签自动加入。
+    压缩包类型一律按文件头识别；detect 为 True 时还会检查扩展名不是压缩包的文件，
+    找出扩展名写错的压缩包（每个文件读一次文件头，结果随指纹缓存）。
+    分卷（x.part1.rar、x.7z.001 等）整组识别一次，所有分卷一起改名。
+    nested 为 NestedOptions 时外层没有命中的压缩包会继续解析内层压缩包。
+    control 为 RunControl，可从其他线程暂停或取消；取消时已规划的重命名不会执行。
+    checkpoint_dir 不为空时规划结果写入断点记录，中断后以相同参数再次运行时从断点继续，
+    见 yaya.checkpoint。
+    metrics 为本次运行的 Metrics（见 yaya.metrics），未指定时自动创建，可用 summary 查看。
+    threads 为 0 时自动调整并发（见 yaya.adaptive）：同时工作的线程数在 1 到 max_io_threads
+    之间按实测吞吐调整，在线程中解析 7z/rar 另受 1 到 cpu_threads（默认 CPU 核数）的限制。
+    dry_run 为 True 时只规划并检查冲突，不执行重命名，也不读写断点记录；
+    计划可交给 apply_preview 执行全部或其中一部分。
+    on_plan 为回调，每个计划创建时以 RenamePlan 调用（可能在工作线程中），
+    可在规划进行中读取已加入的条目，如预览界面边扫描边显示。
+    pool 为 JobPool.lane() 返回的入口时（见 yaya.jobs），并发处理都交给多个引擎共享的线程池，
+    threads 与自动并发设置不再起作用，7z/rar 解析改用线程池的 CPU 限制。
+    """
+
+    def __init__(self, ext_tag_map=None, threads=4, log=None, progress=None,
+                 recursive=False, max_depth=None, include=None, exclude=None,
+                 queue_size=None, cache=None, inspector=None, journal_dir=None,
+                 tag_rules=None, detect=False, nested=None, control=None,
+                 checkpoint_dir=None, metrics=None, max_io_threads=None, cpu_threads=None,
+                 index=None, dry_run=False, on_plan=None, pool=None):
+        self.ext_tag_map = dict(DEFAULT_EXT_TAG_MAP if ext_tag_map is None else ext_tag_map)
+        self.tag_rules = list(DEFAULT_TAGS if tag_rules is None else tag_rules)
+        self.matcher = build_tag_matcher(self.ext_tag_map, self.tag_rules)
+        self.auto_threads = threads <= 0
+        self.threads = max(1, threads)
+        self.io_limit = None
+        self.cpu_limit = None
+        if self.auto_threads:
+            io_max = max_io_threads or DEFAULT_MAX_IO
+            self.threads = io_max
+            self.io_limit = AdaptiveLimit('io', 1, io_max, DEFAULT_INITIAL)
+            cpu_max = cpu_threads or default_cpu_threads()
+            self.cpu_limit = AdaptiveLimit('cpu', 1, cpu_max, cpu_max)
+        self.pool = pool
+        if pool is not None:
+            self.io_limit = None
+            self.cpu_limit = pool.cpu_limit
+        self.log = log or (lambda message: None)
+        self.progress = progress or (lambda done: None)
+        self.recursive = recursive
+        self.max_depth = max_depth
+        self.include = include
+        self.exclude = exclude
+        self.queue_size = queue_size
+        self.cache = cache
+        self.index = index
+        self.inspector = inspector
+        self.journal_dir = journal_dir
+        self.detect = detect
+        self.nested = nested
+        self.control = control or RunControl()
+        self.checkpoint_dir = checkpoint_dir
+        self.metrics = metrics or Metrics()
+        self.dry_run = dry_run
+        self.on_plan = on_plan
+        self.last_journal = None
+
+    def flush_cache(self):
+        """提交缓存与成员索引中待写入的内容"""
+        if self.cache is not None:
+            self.cache.flush()
+        if self.index is not None:
+            self.index.flush()
+
+    def iter_files(self, directory):
+        """按扫描选项流式产出目录下的压缩文件路径（detect 为 True 时产出所有文件）
+
+        重命名都在扫描结束后统一执行，遍历过程中目录内容不会变化。
+        路径统一为绝对路径，撤销记录在任意工作目录下都可使用。
+        """
+        return iter_archives(os.path.abspath(directory), None if self.detect else is_candidate,
+                             self.recursive, self.max_depth, self.include, self.exclude)
+
+    def iter_items(self, directory):
+        """与 iter_files 相同，但同一组分卷合并为一个 VolumeSet"""
+        return group_volumes(self.metrics.timed_iter(self.iter_files(directory), 'scan'))
+
+    def is_archive(self, path, name):
+        """detect 模式下排除不是压缩包的文件；其他模式下扫描结果都是压缩包"""
+        if not self.detect or name.lower().endswith(ARCHIVE_EXTS):
+            return True
+        return archive_type(path, self.cache, self.metrics) is not None
+
+    def _run_each(self, items, func):
+        """用工作线程池对每个条目执行 func，返回统计结果"""
+        def handle(item):
+            try:
+                return func(item)
+            finally:
+                self.progress(1)
+
+        workers = self.threads
+        if self.inspector is not None:
+            workers += self.inspector.processes
+        return self._run_limited(items, handle, workers, self.queue_size)
+
+    def _run_limited(self, items, func, workers, queue_size=None):
+        """run_pipeline；自动并发时 workers 为线程数上限，同时工作的线程数由 io_limit 决定"""
+        if self.pool is not None:
+            return self.pool.run(items, func)
+        if self.io_limit is None:
+            return run_pipeline(items, func, workers, queue_size, self.control)
+        limit = self.io_limit
+        limit.restart()
+        self.cpu_limit.restart()
+        try:
+            return run_pipeline(items, func, workers, queue_size, self.control, limit)
+        finally:
+            self.metrics.set('io_threads', limit.limit)
+            self.metrics.set('io_threads_peak', limit.peak)
+            self.metrics.set('cpu_threads', self.cpu_limit.limit)
+            self.metrics.set('cpu_threads_peak', self.cpu_limit.peak)
+
+    def classify(self, file_path, volumes=None):
+        """按引擎设置判断单个压缩包（或整组分卷）的标签"""
+        return self.classify_source(file_path, volumes)[0]
+
+    def classify_source(self, file_path, volumes=None):
+        """与 classify 相同，返回 (标签, 来源)"""
+        return classify_archive_source(file_path, self.ext_tag_map, self.log, self.cache,
+                                       self.inspector, self.matcher, volumes, self.nested,
+                                       self.metrics, self.cpu_limit, self.index)
+
+    def scan(self, directory, callback=None):
+        """只判断标签不重命名
+
+        指定 callback 时对每个文件调用 callback(路径, 标签)（可能在工作线程中），
+        否则返回 EntryTable，逐个产出 (路径, 标签)；分卷只报告用于识别的那一卷。
+        """
+        results = EntryTable(self.matcher.tags)
+        if callback is None:
+            def callback(path, tag):
+                results.add(path, tag)
+
+        def handle(item):
+            path, name, volumes = unpack_item(item)
+            if volumes is None and not self.is_archive(path, name):
+                return False
+            callback(path, self.classify(path, volumes))
+            return False
+
+        self._run_each(self.iter_items(directory), handle)
+        self.flush_cache()
+        return results
+
+    def plan(self, directory, make_name, checkpoint=None):
+        """规划阶段：并发计算目录下所有压缩文件的新名称，返回 (RenamePlan, RunStats)
+
+        make_name(路径, 文件名, VolumeSet 或 None) 返回新文件名，返回 None 表示不重命名，
+        也可以返回 (新文件名, 标签来源)；
+        分卷的文件名为整组名称（如 x.rar），新名称按同样的方式套用到每一卷。
+        checkpoint 为 Checkpoint 时沿用其中未变化文件的结果，并记录新算出的结果。
+        """
+        return self.plan_items(self.iter_items(directory), make_name, checkpoint)
+
+    def plan_items(self, items, make_name, checkpoint=None):
+        """与 plan 相同，但处理给定的扫描条目（路径或 VolumeSet）"""
+        plan = self.new_plan()
+
+        def handle(item):
+            path, name, volumes = unpack_item(item)
+            try:
+                if checkpoint is not None:
+                    if checkpoint.is_target(path):
+                        return False
+                    found, new_name = checkpoint.lookup(path)
+                    if found:
+                        if new_name:
+                            self.add_to_plan(plan, path, new_name, volumes)
+                        return False
+                source = None
+                if volumes is None and not self.is_archive(path, name):
+                    new_name = None
+                else:
+                    new_name = make_name(path, name, volumes)
+                    if isinstance(new_name, tuple):
+                        new_name, source = new_name
+                if new_name:
+                    self.add_to_plan(plan, path, new_name, volumes, source)
+                if checkpoint is not None:
+                    try:
+                        checkpoint.record(path, new_name)
+                    except OSError as e:
+                        # 规划结果已加入计划，断点记录只影响中断后能否跳过这个文件
+                        self.log(f"写入断点记录时出错: {str(e)}")
+                return False
+            except Exception as e:
+                self.log(f"处理文件 {name} 时出错: {str(e)}")
+                return None
+
+        stats = self._run_each(items, handle)
+        stats.cancelled = self.control.cancelled
+        return plan, stats
+
+    def new_plan(self):
+        """创建本次运行的 RenamePlan，并通知 on_plan"""
+        plan = RenamePlan()
+        if self.on_plan is not None:
+            self.on_plan(plan)
+        return plan
+
+    @staticmethod
+    def add_to_plan(plan, path, new_name, volumes=None, source=None):
+        """把一个文件或整组分卷的重命名加入计划"""
+        if volumes is None:
+            plan.add(path, new_name, source=source)
+            return
+        for volume_path, volume_name in volumes.renames(new_name):
+            plan.add(volume_path, volume_name, source=source, group=path)
+
+    def open_journal(self, operation):
+        """为一次执行创建撤销记录，未设置 journal_dir 时返回 None"""
+        if not self.journal_dir:
+            return None
+        try:
+            return RenameJournal.create(self.journal_dir, operation)
+        except OSError as e:
+            self.log(f"无法创建撤销记录，本次操作将无法撤销: {str(e)}")
+            return None
+
+    def open_checkpoint(self, directory, operation, *args):
+        """打开本次运行的断点记录，未设置 checkpoint_dir 时返回 None
+
+        键包含目录、操作及其参数和所有影响结果的设置，参数不同的运行互不沿用。
+        """
+        if not self.checkpoint_dir or self.dry_run:
+            return None
+        nested = self.nested and (self.nested.depth, self.nested.max_bytes)
+        key = run_key(os.path.abspath(directory), operation, args, self.ext_tag_map,
+                      [(rule.tag, rule.aliases, rule.priority, rule.case_sensitive, rule.word)
+                       for rule in self.matcher.rules],
+                      self.recursive, self.max_depth, self.include, self.exclude,
+                      self.detect, nested)
+        try:
+            checkpoint = Checkpoint.open(self.checkpoint_dir, operation, key)
+        except OSError as e:
+            self.log(f"无法创建断点记录，本次运行中断后将从头开始: {str(e)}")
+            return None
+        if len(checkpoint):
+            self.log(f"从上次中断处继续：{len(checkpoint)} 个文件已处理")
+        return checkpoint
+
+    def recorder(self, journal):
+        """记录实际发生的重命名：写入撤销记录，设置了成员索引时同步更新其中的路径"""
+        if self.index is None:
+            return journal
+        return self.index.journal(journal)
+
+    def close_journal(self, journal):
+        """关闭撤销记录，有重命名时记下文件路径"""
+        if journal is None:
+            return
+        try:
+            journal.close()
+        except OSError as e:
+            self.log(f"写入撤销记录时出错，部分重命名将无法撤销: {str(e)}")
+        if journal.count:
+            self.last_journal = journal.path
+            self.log(f"撤销记录: {journal.path}")
+
+    def _apply_directories(self, directories, apply_directory, stats, journal=None):
+        """按目录并发执行，汇总各目录的 ApplyResult
+
+        每个目录执行完后把 journal 中待写入的记录写入磁盘，意外退出时已完成目录的记录不会丢失。
+        """
+        results = []
+
+        def handle(directory):
+            start = time.perf_counter()
+            result = apply_directory(directory)
+            if journal is not None:
+                try:
+                    journal.flush()
+                except OSError as e:
+                    self.log(f"写入撤销记录时出错，部分重命名将无法撤销: {str(e)}")
+            self.metrics.add('rename', time.perf_counter() - start, result.renamed + result.errors)
+            results.append(result)
+            return False
+
+        self._run_limited(directories, handle, self.threads)
+        for result in results:
+            stats.renamed += result.renamed
+            stats.errors += result.errors
+            stats.skipped += result.skipped
+        return stats
+
+    def apply(self, plan, stats=None, message='已重命名: {old} -> {new}', operation='rename',
+              checkpoint=None, renamed=None):
+        """执行阶段：跳过冲突条目，按目录分组执行不覆盖目标的重命名
+
+        规划阶段已取消时不执行任何重命名；执行中取消时不再开始新的目录。
+        全部完成后删除断点记录，取消时保留，再次运行时从断点继续。
+        dry_run 时只检查冲突，在计划中记下 operation 与 message 后返回。
+        renamed 为列表时追加每个重命名成功得到的文件路径。
+        """
+        stats = stats or RunStats()
+        plan.operation = operation
+        plan.message = message
+        if self.dry_run:
+            conflicts = plan.resolve()
+            stats.skipped += len(conflicts)
+            stats.cancelled = stats.cancelled or self.control.cancelled
+            self.log(f"预览: {len(plan) - len(conflicts)} 个文件将被重命名，"
+                     f"{len(conflicts)} 个有冲突，未执行重命名")
+            return stats
+        if self.control.cancelled:
+            if checkpoint is not None:
+                checkpoint.close()
+            stats.cancelled = True
+            self.log("已取消，未执行重命名")
+            return stats
+
+        for entry in plan.resolve():
+            stats.skipped += 1
+            self.log(f"跳过 {entry.old}: {entry.conflict}")
+
+        journal = self.open_journal(operation)
+        recorder = self.recorder(journal)
+        if checkpoint is not None:
+            recorder = checkpoint.journal(recorder)
+        if renamed is not None:
+            recorder = _RenameCollector(recorder, renamed)
+        try:
+            self._apply_directories(
+                plan.directories(),
+                lambda directory: plan.apply_directory(directory, self.log, message, recorder),
+                stats, journal)
+        finally:
+            self.close_journal(journal)
+            self.flush_cache()
+            if checkpoint is not None:
+                if self.control.cancelled:
+                    checkpoint.close()
+                else:
+                    checkpoint.remove()
+        if self.control.cancelled:
+            stats.cancelled = True
+            self.log("已取消，部分文件未重命名")
+        return stats
+
+    def apply_preview(self, plan, entries=None):
+        """执行预览（dry_run）得到的计划；entries 为选中的条目时只执行这些，同组分卷一并执行"""
+        if entries is not None:
+            plan = plan.subset(entries)
+        stats = RunStats()
+        stats.total = len(plan)
+        stats = self.apply(plan, stats, plan.message, plan.operation)
+        return self._finish(stats, "预览中的重命名已执行")
+
+    def undo(self, journal_path):
+        """按撤销记录逆序恢复原文件名，各目录并发执行"""
+        header, by_directory = read_journal(journal_path)
+        stats = RunStats()
+        # 循环重命名经过临时名称的文件有两条记录，只计一次
+        stats.total = sum(1 for records in by_directory.values()
+                          for old, _ in records if not is_temp_name(old))
+
+        def undo_directory(directory):
+            return apply_moves(directory, undo_moves(by_directory[directory]), self.log,
+                               '已撤销: {old} -> {new}', recorder)
+
+        journal = self.open_journal('undo')
+        recorder = self.recorder(journal)
+        try:
+            self._apply_directories(list(by_directory), undo_directory, stats, journal)
+        finally:
+            self.close_journal(journal)
+            self.flush_cache()
+        if self.control.cancelled:
+            stats.cancelled = True
+            self.log("已取消撤销，部分文件未恢复")
+        else:
+            self.log(f"撤销完成: {header.get('operation', '')} {header.get('started', '')}".rstrip())
+        return stats
+
+    def _finish(self, stats, message):
+        """输出完成信息；取消或 dry_run 时 apply 已输出结果，不再输出"""
+        if not stats.cancelled and not self.dry_run:
+            self.log(message)
+        return stats
+
+    def tag_name_for(self, file_path, name, volumes=None):
+        """按识别出的标签计算新文件名，返回 (新文件名, 标签来源)，没有标签时返回 None"""
+        tag, source = self.classify_source(file_path, volumes)
+        return (tag_name(name, tag, self.matcher), source) if tag else None
+
+    def tag(self, directory):
+        """按文件名或压缩包内容添加标签"""
+        checkpoint = self.open_checkpoint(directory, 'tag')
+        plan, stats = self.plan(directory, self.tag_name_for, checkpoint)
+        self.flush_cache()
+        stats = self.apply(plan, stats, operation='tag', checkpoint=checkpoint)
+        return self._finish(stats, "所有文件处理完成！")
+
+    def tag_paths(self, paths):
+        """只给 paths 中的文件添加标签（如监视模式中新到达的压缩包），返回 (RunStats, 重命名得到的路径)
+
+        不符合扫描选项（扩展名、include/exclude）的路径被忽略，同一组分卷合并处理。
+        """
+        accept = None if self.detect else is_candidate
+        paths = sorted(p for p in paths
+                       if accepts_file(os.path.basename(p), accept, self.include, self.exclude))
+        if not paths:
+            return RunStats(), []
+        plan, stats = self.plan_items(group_volumes(paths), self.tag_name_for)
+        self.flush_cache()
+        renamed = []
+        return self.apply(plan, stats, operation='tag', renamed=renamed), renamed
+
+    def _rename_all(self, directory, make_name, action, operation, argument):
+        """按 make_name(文件名) 重命名目录下所有压缩文件"""
+        checkpoint = self.open_checkpoint(directory, operation, argument)
+        plan, stats = self.plan(directory, lambda path, name, volumes: make_name(name), checkpoint)
+        return self.apply(plan, stats, f"已添加{action}: {{old}} -> {{new}}", operation,
+                          checkpoint)
+
+    def compile_template(self, text, prefix='', suffix='', counter_start=1):
+        """编译重命名模板，模板错误时抛出 TemplateError"""
+        return RenameTemplate(text, prefix, suffix, counter_start,
+                              tag_pattern=self.matcher.prefix_pattern)
+
+    def rename(self, directory, template):
+        """按模板一次完成标签、前缀、后缀等重命名，每个文件只扫描、重命名一次
+
+        template 为 RenameTemplate；只有模板用到 {tag} 时才识别压缩包内容。
+        使用 {counter} 时先并发收集信息，再按路径排序编号，保证序号稳定。
+        """
+        def context(file_path, volumes):
+            tag = source = None
+            if template.uses_tag:
+                tag, source = self.classify_source(file_path, volumes)
+            mtime = os.stat(file_path).st_mtime if template.uses_mtime else None
+            return tag, source, mtime
+
+        if not template.uses_counter:
+            def make_name(file_path, name, volumes):
+                tag, source, mtime = context(file_path, volumes)
+                return template.render(name, tag, mtime), source
+
+            checkpoint = self.open_checkpoint(directory, 'template', template.text,
+                                              template.prefix, template.suffix)
+            plan, stats = self.plan(directory, make_name, checkpoint)
+        else:
+            # 编号依赖全部文件的排序，不使用断点记录
+            checkpoint = None
+            contexts = EntryTable(self.matcher.tags, mtimes=template.uses_mtime)
+            volume_sets = {}
+
+            def collect(item):
+                file_path, name, volumes = unpack_item(item)
+                try:
+                    if volumes is None and not self.is_archive(file_path, name):
+                        return False
+                    index = contexts.add(file_path, *context(file_path, volumes))
+                    if volumes is not None:
+                        volume_sets[index] = volumes
+                    return False
+                except Exception as e:
+                    self.log(f"处理文件 {name} 时出错: {str(e)}")
+                    return None
+
+            stats = self._run_each(self.iter_items(directory), collect)
+            stats.cancelled = self.control.cancelled
+            # 按完整路径排序，只在排序期间为每个文件生成路径
+            order = sorted(range(len(contexts)), key=contexts.path)
+            plan = self.new_plan()
+
+            def add(item):
+                number, index = item
+                file_path = contexts.path(index)
+                volumes = volume_sets.get(index)
+                name = volumes.name if volumes is not None else os.path.basename(file_path)
+                try:
+                    new_name = template.render(name, contexts.tag(index), contexts.mtime(index),
+                                               template.counter_start + number)
+                    self.add_to_plan(plan, file_path, new_name, volumes, contexts.source(index))
+                    return False
+                except Exception as e:
+                    self.log(f"处理文件 {name} 时出错: {str(e)}")
+                    return None
+
+            stats.errors += self._run_limited(enumerate(order), add, self.threads).errors
+
+        self.flush_cache()
+        stats = self.apply(plan, stats, operation='template', checkpoint=checkpoint)
+        return self._finish(stats, "模板重命名完成！")
+
+    def tag_directly(self, directory, tag):
+        """直接添加标签到文件名前"""
+        # 要添加的标签不在配置中时同样先清理，重复执行不会叠加
+        matcher = self.matcher
+        if tag not in matcher.tags:
+            matcher = build_tag_matcher(self.ext_tag_map, self.tag_rules + [tag])
+        stats = self._rename_all(directory, lambda f: tag_name(f, tag, matcher), '标签',
+                                 'tag-direct', tag)
+        return self._finish(stats, "标签添加完成！")
+
+    def prefix(self, directory, prefix):
+        """添加前缀"""
+        stats = self._rename_all(directory, lambda f: prefix_name(f, prefix), '前缀', 'prefix',
+                                 prefix)
+        return self._finish(stats, "前缀添加完成！")
+
+    def suffix(self, directory, suffix):
+        """添加后缀"""
+        stats = self._rename_all(directory, lambda f: suffix_name(f, suffix), '后缀', 'suffix',
+                                 suffix)
+        return self._finish(stats, "后缀添加完成！")
@@ -0,0 +1,139 @@
+"""不覆盖目标的重命名
+
+Linux 上通过目录 fd 调用 renameat2(RENAME_NOREPLACE)，由内核原子地拒绝覆盖已有文件，
+同一目录内的批量重命名也不必每次重新解析完整路径；
+Windows 的 os.rename 本身不会覆盖已有文件；其他平台先检查再重命名。
+"""
+import errno
+import os
+import sys
+
+
+RENAME_NOREPLACE = 1
+
+# libc 未导出 renameat2（glibc < 2.28）时直接走系统调用
+_SYSCALL_NUMBERS = {
+    'x86_64': 316,
+    'amd64': 316,
+    'aarch64': 276,
+    'arm64': 276,
+    'riscv64': 276,
+    'i386': 353,
+    'i686': 353,
+    'armv7l': 382,
+    'ppc64le': 357,
+    's390x': 347,
+}
+
+# 文件系统不支持 RENAME_NOREPLACE 时返回的错误码，此时退回先检查再重命名
+_UNSUPPORTED_ERRNOS = {errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP}
+
+
+def _load_renameat2():
+    """加载 renameat2，不可用时返回 None"""
+    if not sys.platform.startswith('linux'):
+        return None
+    # ctypes 与 platform 按需导入，只扫描不重命名时（以及图形界面启动时）不加载
+    import ctypes
+    import platform
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+    except OSError:
+        return None
+
+    func = getattr(libc, 'renameat2', None)
+    if func is not None:
+        func.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_int,
+                         ctypes.c_char_p, ctypes.c_uint]
+        func.restype = ctypes.c_int
+        return func
+
+    number = _SYSCALL_NUMBERS.get(platform.machine().lower())
+    if number is None:
+        return None
+    syscall = libc.syscall
+    syscall.restype = ctypes.c_long
+
+    def renameat2(olddirfd, oldpath, newdirfd, newpath, flags):
+        return syscall(ctypes.c_long(number), ctypes.c_int(olddirfd), ctypes.c_char_p(oldpath),
+                       ctypes.c_int(newdirfd), ctypes.c_char_p(newpath), ctypes.c_uint(flags))
+    return renameat2
+
+
+_UNLOADED = object()
+_renameat2 = _UNLOADED
+
+
+def _get_renameat2():
+    """第一次重命名时加载 renameat2，之后复用"""
+    global _renameat2
+    if _renameat2 is _UNLOADED:
+        _renameat2 = _load_renameat2()
+    return _renameat2
+
+
+_DIR_FD_SUPPORTED = (os.rename in os.supports_dir_fd and os.stat in os.supports_dir_fd
+                     and hasattr(os, 'O_DIRECTORY'))
+
+
+class DirectoryHandle:
+    """打开一次目录，在其中执行多次不覆盖目标的重命名"""
+
+    def __init__(self, path):
+        self.path = path
+        self.fd = None
+        if _DIR_FD_SUPPORTED:
+            self.fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+
+    def exists(self, name):
+        """目录中是否已有该名称（不跟随符号链接）"""
+        try:
+            if self.fd is not None:
+                os.stat(name, dir_fd=self.fd, follow_symlinks=False)
+            else:
+                os.lstat(os.path.join(self.path, name))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def rename(self, old, new):
+        """重命名 old 为 new，new 已存在时抛出 FileExistsError"""
+        if self.fd is not None:
+            renameat2 = _get_renameat2()
+            if renameat2 is not None:
+                if renameat2(self.fd, os.fsencode(old), self.fd, os.fsencode(new),
+                             RENAME_NOREPLACE) == 0:
+                    return
+                import ctypes
+                err = ctypes.get_errno()
+                if err not in _UNSUPPORTED_ERRNOS:
+                    raise OSError(err, os.strerror(err), old, None, new)
+            if self.exists(new):
+                raise FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST), old, None, new)
+            os.rename(old, new, src_dir_fd=self.fd, dst_dir_fd=self.fd)
+            return
+
+        old_path = os.path.join(self.path, old)
+        new_path = os.path.join(self.path, new)
+        # Windows 上 os.rename 遇到已存在的目标会直接报错；
+        # 仅大小写不同的重命名指向同一文件，需要放行
+        if os.name != 'nt' and os.path.lexists(new_path):
+            raise FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST), old_path, None, new_path)
+        os.rename(old_path, new_path)
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def rename_noreplace(src, dst):
+    """重命名单个文件，不覆盖已存在的目标（src 与 dst 须在同一目录）"""
+    with DirectoryHandle(os.path.dirname(src) or '.') as handle:
+        handle.rename(os.path.basename(src), os.path.basename(dst))
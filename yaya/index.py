@@ -0,0 +1,312 @@
+"""压缩包成员索引
+
+识别标签时顺带把每个压缩包的完整成员列表（成员名、未压缩大小、压缩包路径）写入本地 SQLite，
+之后可以直接查询“哪些压缩包里有名为 X 的 .dwg”，不必再打开任何压缩包。
+
+成员名用 FTS5 trigram 分词建立全文索引，三个字符以上的片段按索引查找；
+更短的片段（如两个汉字）或 SQLite 不支持 FTS5 时逐行比较，结果相同，只是慢一些。
+
+建立索引需要完整的成员列表，与“命中映射后立即停止读取”的提前退出互相冲突：
+启用索引时尚未收录（或已变化）的压缩包总是读完整个列表，文件名中已带标签的压缩包也会打开一次；
+已收录且大小与修改时间未变的压缩包照常使用识别缓存。只收录最外层的成员，不含内层压缩包。
+压缩包路径按 os.fsencode 的字节保存，Linux 上不是合法 UTF-8 的文件名（如 GBK 文件名）同样可以收录。
+引擎执行的重命名与撤销会同步更新索引中的路径；在本程序之外移动或删除的压缩包，
+可用 prune 清理。
+"""
+import fnmatch
+import os
+import re
+import sqlite3
+import threading
+import time
+
+
+# 表结构变化时递增，旧版本的索引直接重建
+INDEX_VERSION = 2
+
+DEFAULT_LIMIT = 1000
+
+# trigram 分词只能按三个字符以上的片段查找
+TRIGRAM = 3
+
+_WILDCARDS = re.compile(r'[*?\[]')
+_CLASS = re.compile(r'\[[^\]]*\]')
+
+
+def default_index_path():
+    """默认索引文件位置（与识别缓存在同一目录）"""
+    base = (os.environ.get('LOCALAPPDATA') or os.environ.get('XDG_CACHE_HOME')
+            or os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(base, 'YaYaRename', 'member_index.sqlite3')
+
+
+def stamp(path, volumes=None):
+    """压缩包的 (大小, 修改时间)；volumes 为同组分卷的路径时大小取各卷之和，修改时间取最新的一卷"""
+    st = os.stat(path)
+    size, mtime = st.st_size, st.st_mtime_ns
+    for volume in volumes or ():
+        if volume != path:
+            vst = os.stat(volume)
+            size += vst.st_size
+            mtime = max(mtime, vst.st_mtime_ns)
+    return size, mtime
+
+
+def _next_prefix(prefix):
+    """按字节比较时排在所有以 prefix 开头的值之后的最小值"""
+    return prefix[:-1] + bytes([prefix[-1] + 1])
+
+
+def member_ext(name):
+    """成员的扩展名（小写，含点），用于按类型筛选"""
+    return os.path.splitext(name)[1].lower()
+
+
+def normalize_ext(ext):
+    if not ext:
+        return None
+    ext = ext.strip().lower()
+    return ext if ext.startswith('.') else '.' + ext
+
+
+def like_pattern(pattern):
+    """把查询转换为 LIKE 模式
+
+    不含通配符时按子串查找；含 * ? [...] 时按通配符匹配整个成员路径（* 可跨越目录）。
+    LIKE 只用于缩小范围，最终由 fnmatch 判断，成员名中的 % 与 _ 不需要转义。
+    """
+    if not _WILDCARDS.search(pattern):
+        return f'%{pattern}%'
+    text = _CLASS.sub('_', pattern)
+    return text.replace('*', '%').replace('?', '_')
+
+
+def _longest_literal(like):
+    return max((len(part) for part in re.split('[%_]', like)), default=0)
+
+
+class IndexHit:
+    """一条查询结果"""
+
+    __slots__ = ('archive', 'name', 'size')
+
+    def __init__(self, archive, name, size):
+        self.archive = archive
+        self.name = name
+        self.size = size
+
+
+class MemberIndex:
+    """基于 SQLite 的成员索引，可在多个工作线程间共享
+
+    写入先缓存在内存中，每 flush_every 个压缩包批量提交一次；重命名在已缓存的写入之后按顺序执行。
+    """
+
+    stamp = staticmethod(stamp)
+
+    def __init__(self, path=None, flush_every=200):
+        self.path = path or default_index_path()
+        self.flush_every = flush_every
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._renames = []
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('PRAGMA foreign_keys=ON')
+        if self._conn.execute('PRAGMA user_version').fetchone()[0] != INDEX_VERSION:
+            self._conn.executescript(
+                'DROP TABLE IF EXISTS member_names; DROP TABLE IF EXISTS members;'
+                ' DROP TABLE IF EXISTS archives;')
+            self._conn.execute(f'PRAGMA user_version = {INDEX_VERSION}')
+        self._conn.executescript(
+            'CREATE TABLE IF NOT EXISTS archives ('
+            ' id INTEGER PRIMARY KEY, path BLOB NOT NULL UNIQUE,'
+            ' size INTEGER NOT NULL, mtime INTEGER NOT NULL, kind TEXT,'
+            ' indexed INTEGER NOT NULL);'
+            'CREATE TABLE IF NOT EXISTS members ('
+            ' id INTEGER PRIMARY KEY,'
+            ' archive INTEGER NOT NULL REFERENCES archives (id) ON DELETE CASCADE,'
+            ' name TEXT NOT NULL, ext TEXT NOT NULL, size INTEGER NOT NULL);'
+            'CREATE INDEX IF NOT EXISTS members_archive ON members (archive);'
+            'CREATE INDEX IF NOT EXISTS members_ext ON members (ext);')
+        self.fts = self._create_fts()
+        self._conn.commit()
+
+    def _create_fts(self):
+        """建立成员名的 FTS5 trigram 索引，SQLite 不支持时返回 False"""
+        try:
+            self._conn.executescript(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS member_names USING fts5("
+                " name, content='members', content_rowid='id', tokenize='trigram');"
+                'CREATE TRIGGER IF NOT EXISTS members_insert AFTER INSERT ON members BEGIN'
+                ' INSERT INTO member_names (rowid, name) VALUES (new.id, new.name); END;'
+                'CREATE TRIGGER IF NOT EXISTS members_delete AFTER DELETE ON members BEGIN'
+                " INSERT INTO member_names (member_names, rowid, name)"
+                " VALUES ('delete', old.id, old.name); END;")
+        except sqlite3.OperationalError:
+            return False
+        return True
+
+    def is_current(self, path, current):
+        """path 已收录且 (大小, 修改时间) 与 current 一致"""
+        with self._lock:
+            pending = self._pending.get(path)
+            if pending is not None:
+                return pending[0] == current
+            try:
+                row = self._conn.execute('SELECT size, mtime FROM archives WHERE path = ?',
+                                         (os.fsencode(path),)).fetchone()
+            except sqlite3.Error:
+                return False
+        return row is not None and tuple(row) == tuple(current)
+
+    def put(self, path, current, kind, entries):
+        """收录一个压缩包；entries 为 [(成员名, 未压缩大小)]，kind 为 None 表示不是压缩包"""
+        with self._lock:
+            self._pending[path] = (tuple(current), kind, list(entries or ()))
+            if len(self._pending) >= self.flush_every:
+                self._flush_locked()
+
+    def rename(self, old, new):
+        """压缩包被重命名后更新路径"""
+        with self._lock:
+            self._renames.append((old, new))
+
+    def flush(self):
+        """提交所有待写入的内容"""
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._pending and not self._renames:
+            return
+        now = int(time.time())
+        try:
+            with self._conn:
+                for path, ((size, mtime), kind, entries) in self._pending.items():
+                    self._put_archive(os.fsencode(path), size, mtime, kind, entries, now)
+                for old, new in self._renames:
+                    old, new = os.fsencode(old), os.fsencode(new)
+                    # 目标路径上的旧记录（之前被删除或移走的文件）作废
+                    self._conn.execute('DELETE FROM archives WHERE path = ?', (new,))
+                    self._conn.execute('UPDATE archives SET path = ? WHERE path = ?', (new, old))
+        except sqlite3.Error:
+            # 索引只是辅助查询，写入失败（如数据库被其他进程锁定）不影响处理
+            pass
+        finally:
+            self._pending.clear()
+            self._renames.clear()
+
+    def _put_archive(self, path, size, mtime, kind, entries, now):
+        """写入一个压缩包；成员名无法保存（含不成对的代理字符）时不收录该压缩包，下次重新读取"""
+        try:
+            for name, _ in entries:
+                name.encode('utf-8')
+        except UnicodeEncodeError:
+            return
+        self._conn.execute('DELETE FROM archives WHERE path = ?', (path,))
+        archive = self._conn.execute(
+            'INSERT INTO archives (path, size, mtime, kind, indexed)'
+            ' VALUES (?, ?, ?, ?, ?)', (path, size, mtime, kind, now)).lastrowid
+        self._conn.executemany(
+            'INSERT INTO members (archive, name, ext, size) VALUES (?, ?, ?, ?)',
+            [(archive, name, member_ext(name), member_size or 0)
+             for name, member_size in entries])
+
+    def search(self, pattern, ext=None, under=None, limit=DEFAULT_LIMIT):
+        """查找成员，返回 [IndexHit]，按压缩包路径与成员名排列
+
+        pattern 不含通配符时按子串查找，含 * ? [...] 时按通配符匹配成员路径，均不区分大小写；
+        pattern 为空时返回所有成员（通常与 ext 一起使用）。ext 只保留该扩展名的成员，
+        under 只查找该目录下的压缩包。
+        """
+        self.flush()
+        like = like_pattern(pattern) if pattern else '%'
+        use_fts = self.fts and _longest_literal(like) >= TRIGRAM
+        sql = ['SELECT a.path, m.name, m.size FROM']
+        params = []
+        if use_fts:
+            sql.append('member_names f JOIN members m ON m.id = f.rowid'
+                       ' JOIN archives a ON a.id = m.archive WHERE f.name LIKE ?')
+        else:
+            sql.append('members m JOIN archives a ON a.id = m.archive WHERE m.name LIKE ?')
+        params.append(like)
+        ext = normalize_ext(ext)
+        if ext:
+            sql.append('AND m.ext = ?')
+            params.append(ext)
+        if under:
+            # 目录前缀用范围比较，路径中的 % 与 _ 不会被当作通配符
+            prefix = os.fsencode(os.path.join(os.path.abspath(under), ''))
+            sql.append('AND a.path >= ? AND a.path < ?')
+            params += [prefix, _next_prefix(prefix)]
+        sql.append('ORDER BY a.path, m.name')
+
+        wildcard = bool(pattern) and _WILDCARDS.search(pattern) is not None
+        needle = pattern.lower() if pattern else ''
+        hits = []
+        with self._lock:
+            cursor = self._conn.execute(' '.join(sql), params)
+            for path, name, size in cursor:
+                lowered = name.lower()
+                if wildcard:
+                    if not fnmatch.fnmatchcase(lowered, needle):
+                        continue
+                elif needle not in lowered:
+                    continue
+                hits.append(IndexHit(os.fsdecode(path), name, size))
+                if limit and len(hits) >= limit:
+                    break
+        return hits
+
+    def prune(self):
+        """删除已不存在的压缩包，返回删除的数量"""
+        self.flush()
+        with self._lock:
+            paths = [row[0] for row in self._conn.execute('SELECT path FROM archives')]
+            missing = [(path,) for path in paths if not os.path.exists(os.fsdecode(path))]
+            with self._conn:
+                self._conn.executemany('DELETE FROM archives WHERE path = ?', missing)
+        return len(missing)
+
+    def counts(self):
+        """(压缩包数, 成员数)"""
+        self.flush()
+        with self._lock:
+            archives = self._conn.execute(
+                'SELECT COUNT(*) FROM archives WHERE kind IS NOT NULL').fetchone()[0]
+            members = self._conn.execute('SELECT COUNT(*) FROM members').fetchone()[0]
+        return archives, members
+
+    def journal(self, journal=None):
+        """返回记录重命名的对象：转发给撤销记录 journal（可为 None），同时更新索引中的路径"""
+        return _IndexedJournal(self, journal)
+
+    def close(self):
+        """提交剩余内容并关闭数据库"""
+        with self._lock:
+            self._flush_locked()
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _IndexedJournal:
+    """与 RenameJournal.record 接口相同"""
+
+    def __init__(self, index, journal):
+        self._index = index
+        self._journal = journal
+
+    def record(self, directory, old, new):
+        if self._journal is not None:
+            self._journal.record(directory, old, new)
+        self._index.rename(os.path.join(directory, old), os.path.join(directory, new))
@@ -0,0 +1,465 @@
+"""作业清单：一次处理多个目录
+
+清单为 JSON 或 TOML（Python 3.11 起自带 tomllib）文件，列出要处理的目录及各自的设置：
+
+    [defaults]
+    recursive = true
+
+    [[jobs]]
+    name = "急件"
+    root = "/srv/drop/urgent"
+    priority = 10
+    map = { ".skp" = "SU", ".dwg" = "CAD" }
+
+    [[jobs]]
+    root = "/srv/archive"
+    template = "{tag} {stem}{ext}"
+    exclude = ["tmp"]
+
+JSON 的结构相同：{"defaults": {...}, "jobs": [{...}, ...]}。作业可设置 JOB_KEYS 中的各项，
+未设置的取清单的 defaults，再取命令行参数；相对路径相对于清单所在目录。
+有 template 时按模板重命名（与 rename 命令相同），否则按文件名或内容添加标签（与 tag 命令相同）。
+
+所有作业同时开始，各自的扫描、识别与重命名都交给同一个 JobPool 的工作线程：
+工作线程总是先取优先级最高（数值最大）的作业排队的条目，优先级相同的作业轮流取，
+小而紧急的目录不会排在大型共享目录之后。每个作业有自己的撤销记录与断点记录。
+"""
+import collections
+import json
+import os
+import threading
+import time
+
+from yaya.adaptive import DEFAULT_INITIAL, DEFAULT_MAX_IO, AdaptiveLimit, default_cpu_threads
+from yaya.control import RunControl
+from yaya.engine import PUT_TIMEOUT, RenameEngine, RunStats
+from yaya.tags import TagMatcher
+from yaya.template import TemplateError
+
+
+# 作业可设置的项；除 name、root 外都可写在 defaults 中
+JOB_KEYS = ('name', 'root', 'priority', 'map', 'tags', 'template', 'prefix', 'suffix',
+            'counter_start', 'recursive', 'max_depth', 'include', 'exclude')
+
+WAITING = '等待'
+RUNNING = '处理中'
+DONE = '完成'
+FAILED = '出错'
+CANCELLED = '已取消'
+
+DEFAULT_PROGRESS_INTERVAL = 10.0
+
+
+class Job:
+    """清单中的一个作业及其运行状态"""
+
+    def __init__(self, name, root, priority=0, ext_tag_map=None, tag_rules=None, template=None,
+                 prefix='', suffix='', counter_start=1, recursive=False, max_depth=None,
+                 include=None, exclude=None):
+        self.name = name
+        self.root = root
+        self.priority = priority
+        self.ext_tag_map = ext_tag_map
+        self.tag_rules = tag_rules
+        self.template = template
+        self.prefix = prefix
+        self.suffix = suffix
+        self.counter_start = counter_start
+        self.recursive = recursive
+        self.max_depth = max_depth
+        self.include = include
+        self.exclude = exclude
+        self.state = WAITING
+        self.done = 0
+        self.stats = None
+        self.error = None
+        self.elapsed = 0.0
+        self.journal = None
+        self._lock = threading.Lock()
+
+    def advance(self, count=1):
+        """进度回调：已处理 count 个条目（在工作线程中调用）"""
+        with self._lock:
+            self.done += count
+
+
+def _string_list(value, key, where):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return [value]
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        raise ValueError(f"{where}: {key} 应为字符串或字符串列表")
+    return value
+
+
+def _setting(settings, key, kind, where):
+    value = settings[key]
+    # bool 是 int 的子类，priority 等整数项不接受 true/false
+    if not isinstance(value, kind) or (kind is int and isinstance(value, bool)):
+        raise ValueError(f"{where}: {key} 的类型不正确")
+    return value
+
+
+def load_manifest(path, base=None):
+    """读取作业清单，返回按优先级从高到低排列的 [Job]；清单有误时抛出 ValueError
+
+    base 为命令行给出的默认设置（键同 JOB_KEYS，map 与 tags 为已解析的映射与标签规则）。
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if path.lower().endswith('.toml'):
+        try:
+            import tomllib
+        except ImportError:
+            raise ValueError(f"{path}: 读取 TOML 清单需要 Python 3.11 或更高版本，可改用 JSON")
+        manifest = tomllib.loads(data.decode('utf-8'))
+    else:
+        manifest = json.loads(data.decode('utf-8-sig'))
+
+    if not isinstance(manifest, dict) or not isinstance(manifest.get('jobs'), list):
+        raise ValueError(f"{path}: 清单中应有作业列表 jobs")
+    defaults = manifest.get('defaults', {})
+    if not isinstance(defaults, dict):
+        raise ValueError(f"{path}: defaults 应为表")
+    directory = os.path.dirname(os.path.abspath(path))
+
+    jobs = []
+    names = set()
+    for number, entry in enumerate(manifest['jobs'], 1):
+        where = f"{path}: 第 {number} 个作业"
+        if not isinstance(entry, dict):
+            raise ValueError(f"{where} 应为表")
+        for settings in (defaults, entry):
+            unknown = sorted(set(settings) - set(JOB_KEYS))
+            if unknown:
+                raise ValueError(f"{where}: 未知的设置 {', '.join(unknown)}")
+        settings = dict(base or {})
+        settings.update({k: v for k, v in defaults.items() if k not in ('name', 'root')})
+        settings.update(entry)
+        if not isinstance(settings.get('root'), str) or not settings['root']:
+            raise ValueError(f"{where}: 缺少 root")
+
+        root = os.path.join(directory, os.path.expanduser(settings['root']))
+        name = settings.get('name') or os.path.basename(os.path.normpath(root)) or root
+        if name in names:
+            raise ValueError(f"{where}: 作业名称重复: {name}")
+        names.add(name)
+
+        ext_tag_map = settings.get('map')
+        if ext_tag_map is not None:
+            if not isinstance(ext_tag_map, dict) or not all(
+                    isinstance(k, str) and isinstance(v, str) and k.strip() and v.strip()
+                    for k, v in ext_tag_map.items()):
+                raise ValueError(f"{where}: map 应为 {{扩展名: 标签}}")
+            # 与配置对话框一致：扩展名统一为小写并带点
+            ext_tag_map = {(ext if ext.startswith('.') else '.' + ext).strip().lower(): tag.strip()
+                           for ext, tag in ext_tag_map.items()}
+        tag_rules = settings.get('tags')
+        if tag_rules is not None:
+            if not isinstance(tag_rules, list):
+                raise ValueError(f"{where}: tags 应为列表")
+            try:
+                TagMatcher(tag_rules)
+            except (TypeError, ValueError) as e:
+                raise ValueError(f"{where}: {e}")
+
+        job = Job(name, root, ext_tag_map=ext_tag_map, tag_rules=tag_rules,
+                  include=_string_list(settings.get('include'), 'include', where),
+                  exclude=_string_list(settings.get('exclude'), 'exclude', where))
+        for key, kind in (('priority', int), ('template', str), ('prefix', str),
+                          ('suffix', str), ('counter_start', int), ('recursive', bool),
+                          ('max_depth', int)):
+            if settings.get(key) is not None:
+                setattr(job, key, _setting(settings, key, kind, where))
+        jobs.append(job)
+
+    if not jobs:
+        raise ValueError(f"{path}: 清单中没有作业")
+    jobs.sort(key=lambda job: -job.priority)
+    return jobs
+
+
+class _Batch:
+    """一次 JobPool.run 调用排队的条目"""
+
+    __slots__ = ('priority', 'func', 'queue', 'pending', 'stats')
+
+    def __init__(self, priority, func):
+        self.priority = priority
+        self.func = func
+        self.queue = collections.deque()
+        # 已排队或正在处理的条目数
+        self.pending = 0
+        self.stats = RunStats()
+
+
+class JobPool:
+    """多个作业共享的工作线程池
+
+    每个作业的引擎以 lane(优先级) 作为 pool 参数，引擎中的并发处理（规划、执行）都通过 run
+    把条目放入各自的有界队列；工作线程每次从优先级最高且有条目的队列中取一个，
+    优先级相同的队列轮流取。limit 为 AdaptiveLimit 时 workers 为线程数上限，
+    同时工作的线程数由 limit 决定；cpu_limit 为各引擎共用的 7z/rar 解析限制。
+    """
+
+    def __init__(self, workers=4, control=None, limit=None, cpu_limit=None, queue_size=None):
+        self.workers = max(1, workers)
+        self.control = control or RunControl()
+        self.limit = limit
+        self.cpu_limit = cpu_limit
+        self.queue_size = queue_size or self.workers * 4
+        self._cond = threading.Condition()
+        self._batches = []
+        self._threads = []
+        self._turn = 0
+        self._closed = False
+
+    def lane(self, priority=0):
+        """返回以 priority 排队的入口，作为 RenameEngine 的 pool 参数"""
+        return _Lane(self, priority)
+
+    def run(self, items, func, priority=0):
+        """用共享的工作线程对 items 逐个执行 func，全部完成后返回 RunStats
+
+        语义与 engine.run_pipeline 相同：func 返回 True 计为已重命名，None 或抛出异常计为出错；
+        取消后停止读取 items，已排队的条目不再处理也不计数；工作线程全部意外退出时抛出 RuntimeError。
+        """
+        batch = _Batch(priority, func)
+        control = self.control
+        with self._cond:
+            self._batches.append(batch)
+        try:
+            for item in items:
+                if not control.wait():
+                    break
+                with self._cond:
+                    while len(batch.queue) >= self.queue_size and self._alive_locked():
+                        self._cond.wait(PUT_TIMEOUT)
+                    if not self._alive_locked():
+                        break
+                    batch.queue.append(item)
+                    batch.pending += 1
+                    self._start_workers()
+                    self._cond.notify_all()
+        finally:
+            with self._cond:
+                while batch.pending and self._alive_locked():
+                    self._cond.wait(PUT_TIMEOUT)
+                self._batches.remove(batch)
+                lost = batch.pending or not self._alive_locked()
+        if lost:
+            raise RuntimeError("工作线程意外退出，未处理完所有文件")
+        return batch.stats
+
+    def _alive_locked(self):
+        """是否还有工作线程在运行（尚未启动任何线程时也为 True）；调用方持有锁"""
+        return not self._threads or any(thread.is_alive() for thread in self._threads)
+
+    def _start_workers(self):
+        """按需启动工作线程；调用方持有锁"""
+        wanted = self.workers if self.limit is None else min(self.workers, self.limit.limit)
+        while len(self._threads) < wanted:
+            thread = threading.Thread(target=self._worker, daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def _next_batch(self):
+        """优先级最高且有条目的批次，优先级相同时轮流；调用方持有锁"""
+        ready = [batch for batch in self._batches if batch.queue]
+        if not ready:
+            return None
+        top = max(batch.priority for batch in ready)
+        ready = [batch for batch in ready if batch.priority == top]
+        self._turn += 1
+        return ready[self._turn % len(ready)]
+
+    def _worker(self):
+        while True:
+            if self.limit is not None:
+                self.limit.acquire()
+            elapsed = None
+            try:
+                with self._cond:
+                    while True:
+                        if self._closed:
+                            return
+                        batch = self._next_batch()
+                        if batch is not None:
+                            break
+                        self._cond.wait()
+                    item = batch.queue.popleft()
+                    self._cond.notify_all()
+                result = False
+                counted = self.control.wait()
+                if counted:
+                    start = time.perf_counter()
+                    try:
+                        result = batch.func(item)
+                    except Exception:
+                        result = None
+                    elapsed = time.perf_counter() - start
+                with self._cond:
+                    if counted:
+                        batch.stats.add(result)
+                    batch.pending -= 1
+                    self._cond.notify_all()
+            finally:
+                if self.limit is not None:
+                    self.limit.release(elapsed)
+
+    def close(self):
+        """结束所有工作线程"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+
+
+class _Lane:
+    """以固定优先级使用 JobPool"""
+
+    __slots__ = ('pool', 'priority')
+
+    def __init__(self, pool, priority):
+        self.pool = pool
+        self.priority = priority
+
+    @property
+    def cpu_limit(self):
+        return self.pool.cpu_limit
+
+    def run(self, items, func):
+        return self.pool.run(items, func, self.priority)
+
+
+def build_pool(threads=4, control=None, max_io_threads=None, cpu_threads=None, extra=0,
+               queue_size=None):
+    """按命令行的并发设置创建 JobPool
+
+    threads 为 0 时自动调整并发，与 RenameEngine 的自动模式相同；extra 为额外的线程数
+    （如进程池的进程数，保证等待进程结果时线程池不会空闲）。
+    """
+    if threads > 0:
+        return JobPool(threads + extra, control, queue_size=queue_size)
+    io_max = max_io_threads or DEFAULT_MAX_IO
+    cpu_max = cpu_threads or default_cpu_threads()
+    return JobPool(io_max + extra, control, AdaptiveLimit('io', 1, io_max, DEFAULT_INITIAL),
+                   AdaptiveLimit('cpu', 1, cpu_max, cpu_max), queue_size)
+
+
+class JobRunner:
+    """同时运行清单中的所有作业，共享 pool 的工作线程
+
+    engine_options 为各作业共用的 RenameEngine 参数（缓存、进程池、撤销记录目录等），
+    映射、标签规则与扫描范围由各作业的设置覆盖。模板有误时在创建时抛出 TemplateError。
+    """
+
+    def __init__(self, jobs, pool, log=None, metrics=None, **engine_options):
+        self.jobs = list(jobs)
+        self.pool = pool
+        self.log = log or (lambda message: None)
+        self.metrics = metrics
+        self.engines = []
+        self.templates = []
+        for job in self.jobs:
+            options = dict(engine_options)
+            options.update(recursive=job.recursive, max_depth=job.max_depth,
+                           include=job.include, exclude=job.exclude, control=pool.control,
+                           metrics=metrics, pool=pool.lane(job.priority), progress=job.advance,
+                           log=self._job_log(job))
+            if job.tag_rules is not None:
+                options['tag_rules'] = job.tag_rules
+            runner = RenameEngine(job.ext_tag_map, **options)
+            template = None
+            if job.template is not None:
+                try:
+                    template = runner.compile_template(job.template, job.prefix, job.suffix,
+                                                       job.counter_start)
+                except TemplateError as e:
+                    raise TemplateError(f"作业 {job.name}: {e}") from None
+            self.engines.append(runner)
+            self.templates.append(template)
+
+    def _job_log(self, job):
+        log = self.log
+        return lambda message: log(f"[{job.name}] {message}")
+
+    def _run_job(self, job, runner, template):
+        job.state = RUNNING
+        start = time.perf_counter()
+        try:
+            if template is not None:
+                stats = runner.rename(job.root, template)
+            else:
+                stats = runner.tag(job.root)
+            job.state = CANCELLED if stats.cancelled else DONE
+        except Exception as e:
+            stats = RunStats()
+            stats.errors = 1
+            job.error = str(e)
+            job.state = FAILED
+            runner.log(f"无法处理 {job.root}: {e}")
+        job.stats = stats
+        job.journal = runner.last_journal
+        job.elapsed = time.perf_counter() - start
+
+    def run(self, report=None, interval=DEFAULT_PROGRESS_INTERVAL):
+        """运行所有作业，返回合计的 RunStats
+
+        report 不为 None 时每隔 interval 秒以 status() 的文本调用一次（在当前线程中）。
+        """
+        threads = [threading.Thread(target=self._run_job, args=item, daemon=True)
+                   for item in zip(self.jobs, self.engines, self.templates)]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(interval if report is not None else None)
+                    if report is not None and thread.is_alive():
+                        report(self.status())
+        finally:
+            self.pool.close()
+            if self.metrics is not None and self.pool.limit is not None:
+                self.metrics.set('io_threads', self.pool.limit.limit)
+                self.metrics.set('io_threads_peak', self.pool.limit.peak)
+                self.metrics.set('cpu_threads', self.pool.cpu_limit.limit)
+                self.metrics.set('cpu_threads_peak', self.pool.cpu_limit.peak)
+
+        total = RunStats()
+        for job in self.jobs:
+            if job.stats is not None:
+                total.merge(job.stats)
+        return total
+
+    def status(self):
+        """各作业的进度，一行文本"""
+        parts = []
+        for job in self.jobs:
+            if job.state == WAITING:
+                parts.append(f"{job.name} {job.state}")
+            else:
+                parts.append(f"{job.name} {job.state} {job.done} 个")
+        return "作业进度: " + '，'.join(parts)
+
+    def summary(self):
+        """运行结束后的汇总，返回多行文本"""
+        lines = [f"作业汇总（{len(self.jobs)} 个）："]
+        total = RunStats()
+        for job in self.jobs:
+            stats = job.stats or RunStats()
+            total.merge(stats)
+            line = (f"  {job.name}: {job.state}，{stats.total} 个文件，重命名 {stats.renamed}，"
+                    f"跳过 {stats.skipped}，出错 {stats.errors}，用时 {job.elapsed:.2f} 秒")
+            if job.error:
+                line += f"（{job.error}）"
+            lines.append(line)
+            if job.journal:
+                lines.append(f"    撤销记录: {job.journal}")
+        states = collections.Counter(job.state for job in self.jobs)
+        lines.append(f"  合计: {'，'.join(f'{state} {n}' for state, n in states.items())}；"
+                     f"{total.total} 个文件，重命名 {total.renamed}，跳过 {total.skipped}，"
+                     f"出错 {total.errors}")
+        return '\n'.join(lines)
@@ -0,0 +1,122 @@
+"""追加写入的重命名记录，用于撤销
+
+每行一条 JSON：首行为运行信息，其后每条记录一次实际发生的重命名。
+记录先缓存在内存中，每 batch_size 条写入并 fsync 一次，不拖慢重命名本身；
+RenameEngine 在每个目录执行完后还会调用 flush。进程意外退出时，正在执行的目录中尚未写入的
+记录（最多 batch_size - 1 条）会丢失，这些文件已经改名但无法撤销；读取时忽略被截断的末行。
+非 ASCII 字符按 JSON 转义写入，无法用 UTF-8 编码的文件名（Linux 上的 GBK 文件名等解码得到的
+代理字符）也能原样记录与读回。
+"""
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+
+JOURNAL_VERSION = 1
+
+
+def default_journal_dir():
+    """默认撤销记录目录"""
+    base = (os.environ.get('LOCALAPPDATA') or os.environ.get('XDG_CACHE_HOME')
+            or os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(base, 'YaYaRename', 'journals')
+
+
+class RenameJournal:
+    """重命名记录文件，可在多个工作线程间共享"""
+
+    def __init__(self, path, operation='', batch_size=1000, fsync=True):
+        self.path = path
+        self.batch_size = batch_size
+        self.fsync = fsync
+        self.count = 0
+        self._lock = threading.Lock()
+        self._pending = []
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'a', encoding='utf-8')
+        self._pending.append(json.dumps({
+            'journal': JOURNAL_VERSION,
+            'operation': operation,
+            'started': time.strftime('%Y-%m-%d %H:%M:%S'),
+        }))
+
+    @classmethod
+    def create(cls, directory, operation, **kwargs):
+        """在 directory 下创建以时间和操作命名的新记录文件"""
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        path = os.path.join(directory, f'{stamp}-{operation}.jsonl')
+        n = 1
+        while os.path.exists(path):
+            n += 1
+            path = os.path.join(directory, f'{stamp}-{operation}-{n}.jsonl')
+        return cls(path, operation, **kwargs)
+
+    def record(self, directory, old, new):
+        """记录一次已完成的重命名"""
+        line = json.dumps({'dir': directory, 'old': old, 'new': new})
+        with self._lock:
+            self._pending.append(line)
+            self.count += 1
+            if len(self._pending) >= self.batch_size:
+                self._flush_locked()
+
+    def flush(self):
+        """写入并同步所有待写入的记录"""
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        """写入待写入的记录；写入失败时这一批记录丢弃，不影响之后的批次"""
+        if not self._pending:
+            return
+        try:
+            self._file.write('\n'.join(self._pending) + '\n')
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+        finally:
+            self._pending.clear()
+
+    def close(self, keep_empty=False):
+        """写入剩余记录并关闭；没有任何重命名时删除文件"""
+        with self._lock:
+            if self.count == 0 and not keep_empty:
+                self._pending.clear()
+                self._file.close()
+                try:
+                    os.remove(self.path)
+                except OSError:
+                    pass
+                return
+            try:
+                self._flush_locked()
+            finally:
+                self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_journal(path):
+    """按目录分组读取记录，返回 (运行信息, {目录: [(原名, 新名)]})，组内保持写入顺序"""
+    header = {}
+    by_directory = defaultdict(list)
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # 写入时被中断的末行
+                continue
+            if 'journal' in record:
+                header = record
+            elif 'dir' in record:
+                by_directory[record['dir']].append((record['old'], record['new']))
+    return header, by_directory
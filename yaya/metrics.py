@@ -0,0 +1,339 @@
+"""分阶段耗时与计数
+
+一次运行中各阶段（目录扫描、文件头识别、缓存查询、打开压缩包、读取成员、文件名匹配、重命名）
+的累计耗时与次数，以及按类型统计的压缩包数、缓存命中、出错数和读取的字节数。
+每个工作线程写自己的计数表，记录时不加锁；运行结束后合并，可输出摘要、JSON 或
+Prometheus 文本格式（供 node_exporter 的 textfile 收集器读取）。
+
+各阶段耗时是所有工作线程的累计值，多线程运行时可能大于总耗时。
+zip 的中央目录在读取成员时才逐条解析，其打开耗时计入 list 阶段。
+使用进程池时 7z/rar 的解析在子进程中完成，主进程只记录等待结果的时间（inspect 阶段），
+子进程读取的字节数也不计入。
+"""
+import json
+import os
+import sys
+import threading
+import time
+
+
+# (阶段, 摘要中的名称)，按处理顺序排列
+STAGES = (
+    ('scan', '扫描目录'),
+    ('match', '文件名匹配'),
+    ('cache', '缓存查询'),
+    ('detect', '文件头识别'),
+    ('open', '打开压缩包'),
+    ('list', '读取成员'),
+    ('nested', '内层压缩包'),
+    ('inspect', '进程池解析'),
+    ('index', '成员索引'),
+    ('rename', '重命名'),
+)
+
+STAGE_LABELS = dict(STAGES)
+
+COUNTER_LABELS = {
+    'cache_hits': '缓存命中',
+    'cache_misses': '缓存未命中',
+    'errors': '出错',
+    'nested_incomplete': '内层未解析完',
+}
+
+# 运行结束时的状态值（如自动并发的线程数），后设置的覆盖先设置的
+GAUGE_LABELS = {
+    'io_threads': 'I/O 线程',
+    'io_threads_peak': 'I/O 线程峰值',
+    'cpu_threads': '解析线程',
+    'cpu_threads_peak': '解析线程峰值',
+}
+
+# 计数名以此开头的按压缩包类型统计，如 archives.zip
+ARCHIVES = 'archives.'
+
+
+def read_io():
+    """本进程读取的字节数 (read 调用读到的字节, 实际从存储读取的字节)，平台不支持时为 None
+
+    zip 目录通过内存映射读取，只体现在第二项中。
+    """
+    try:
+        with open('/proc/self/io', 'r') as f:
+            values = dict(line.split(':', 1) for line in f)
+        return int(values['rchar']), int(values['read_bytes'])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+class _Timer:
+    """with 语句计时，退出时把耗时记入阶段"""
+
+    __slots__ = ('_metrics', '_stage', '_start')
+
+    def __init__(self, metrics, stage):
+        self._metrics = metrics
+        self._stage = stage
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._metrics.add(self._stage, time.perf_counter() - self._start)
+
+
+class Metrics:
+    """一次运行的分阶段耗时与计数，可在多个工作线程中并发记录"""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._tables = []
+        self._lock = threading.Lock()
+        self._gauges = {}
+        self.started = time.perf_counter()
+        self._io = read_io()
+
+    def _table(self):
+        try:
+            return self._local.table
+        except AttributeError:
+            # ({阶段: [次数, 秒]}, {计数名: 值})
+            table = self._local.table = ({}, {})
+            with self._lock:
+                self._tables.append(table)
+            return table
+
+    def timer(self, stage):
+        """返回记录 stage 阶段耗时的上下文管理器"""
+        return _Timer(self, stage)
+
+    def add(self, stage, seconds, count=1):
+        """记入一个阶段的耗时与次数"""
+        stages = self._table()[0]
+        entry = stages.get(stage)
+        if entry is None:
+            stages[stage] = [count, seconds]
+        else:
+            entry[0] += count
+            entry[1] += seconds
+
+    def count(self, name, n=1):
+        """计数加 n"""
+        counters = self._table()[1]
+        counters[name] = counters.get(name, 0) + n
+
+    def set(self, name, value):
+        """设置状态值"""
+        with self._lock:
+            self._gauges[name] = value
+
+    def timed_iter(self, iterable, stage):
+        """逐个产出 iterable 的元素，取下一个元素的耗时记入 stage（如目录扫描）"""
+        iterator = iter(iterable)
+        clock = time.perf_counter
+        while True:
+            start = clock()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add(stage, clock() - start, 0)
+                return
+            self.add(stage, clock() - start)
+            yield item
+
+    def snapshot(self, stats=None):
+        """合并各线程的记录，返回可序列化为 JSON 的字典；应在工作线程结束后调用"""
+        stages = {}
+        counters = {}
+        with self._lock:
+            tables = list(self._tables)
+            gauges = dict(self._gauges)
+        for table_stages, table_counters in tables:
+            for stage, (count, seconds) in list(table_stages.items()):
+                entry = stages.setdefault(stage, {'count': 0, 'seconds': 0.0})
+                entry['count'] += count
+                entry['seconds'] += seconds
+            for name, value in list(table_counters.items()):
+                counters[name] = counters.get(name, 0) + value
+        for entry in stages.values():
+            entry['seconds'] = round(entry['seconds'], 6)
+
+        result = {
+            'elapsed': round(time.perf_counter() - self.started, 6),
+            'stages': stages,
+            'counters': counters,
+        }
+        if gauges:
+            result['gauges'] = gauges
+        io = read_io()
+        if io is not None and self._io is not None:
+            result['counters']['bytes_read'] = io[0] - self._io[0]
+            result['counters']['storage_bytes_read'] = io[1] - self._io[1]
+        if stats is not None:
+            result['files'] = {'total': stats.total, 'renamed': stats.renamed,
+                               'errors': stats.errors, 'skipped': stats.skipped,
+                               'cancelled': stats.cancelled}
+        return result
+
+    def summary(self, stats=None):
+        """运行结束时显示的摘要，返回多行文本"""
+        data = self.snapshot(stats)
+        lines = [f"用时 {data['elapsed']:.2f} 秒，各阶段累计耗时："]
+        order = [stage for stage, _ in STAGES] + sorted(set(data['stages']) - set(STAGE_LABELS))
+        for stage in order:
+            entry = data['stages'].get(stage)
+            if not entry or not entry['count']:
+                continue
+            average = entry['seconds'] / entry['count'] * 1000
+            lines.append(f"  {STAGE_LABELS.get(stage, stage)}: {entry['seconds']:.3f} 秒 / "
+                         f"{entry['count']} 次，平均 {average:.3f} 毫秒")
+
+        counters = data['counters']
+        parts = [f"{name[len(ARCHIVES):]} {value}" for name, value in sorted(counters.items())
+                 if name.startswith(ARCHIVES)]
+        if parts:
+            lines.append("  压缩包: " + '，'.join(parts))
+        parts = [f"{label} {counters[name]}" for name, label in COUNTER_LABELS.items()
+                 if counters.get(name)]
+        if 'bytes_read' in counters:
+            parts.append(f"读取 {_size(counters['bytes_read'])}"
+                         f"（存储 {_size(counters['storage_bytes_read'])}）")
+        if parts:
+            lines.append("  " + '，'.join(parts))
+        gauges = data.get('gauges', {})
+        parts = [f"{label} {gauges[name]}" for name, label in GAUGE_LABELS.items() if name in gauges]
+        if parts:
+            lines.append("  自动并发: " + '，'.join(parts))
+        return '\n'.join(lines)
+
+    def to_json(self, stats=None):
+        return json.dumps(self.snapshot(stats), ensure_ascii=False, indent=2)
+
+    def to_prometheus(self, stats=None, prefix='yaya'):
+        """Prometheus 文本格式"""
+        data = self.snapshot(stats)
+        lines = [
+            f'# HELP {prefix}_run_seconds Wall time of the last run.',
+            f'# TYPE {prefix}_run_seconds gauge',
+            f'{prefix}_run_seconds {data["elapsed"]}',
+            f'# HELP {prefix}_stage_seconds Time spent per stage, summed over worker threads.',
+            f'# TYPE {prefix}_stage_seconds gauge',
+        ]
+        for stage, entry in sorted(data['stages'].items()):
+            lines.append(f'{prefix}_stage_seconds{{stage="{stage}"}} {entry["seconds"]}')
+        lines += [f'# HELP {prefix}_stage_calls Number of calls per stage.',
+                  f'# TYPE {prefix}_stage_calls gauge']
+        for stage, entry in sorted(data['stages'].items()):
+            lines.append(f'{prefix}_stage_calls{{stage="{stage}"}} {entry["count"]}')
+
+        archives = {k[len(ARCHIVES):]: v for k, v in data['counters'].items()
+                    if k.startswith(ARCHIVES)}
+        if archives:
+            lines += [f'# HELP {prefix}_archives Archives inspected, by type.',
+                      f'# TYPE {prefix}_archives gauge']
+            for kind, value in sorted(archives.items()):
+                lines.append(f'{prefix}_archives{{type="{kind}"}} {value}')
+        for name, value in sorted(data['counters'].items()):
+            if not name.startswith(ARCHIVES):
+                lines += [f'# TYPE {prefix}_{name} gauge', f'{prefix}_{name} {value}']
+        for name, value in sorted(data.get('gauges', {}).items()):
+            lines += [f'# TYPE {prefix}_{name} gauge', f'{prefix}_{name} {value}']
+        for name, value in sorted(data.get('files', {}).items()):
+            lines += [f'# TYPE {prefix}_files_{name} gauge', f'{prefix}_files_{name} {int(value)}']
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path, fmt='json', stats=None):
+        """写入 JSON 或 Prometheus 文本格式文件；先写临时文件再替换，读取方不会读到半个文件"""
+        text = self.to_prometheus(stats) if fmt == 'prometheus' else self.to_json(stats)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp, path)
+
+
+class NullMetrics:
+    """不记录任何内容，未传入 Metrics 时使用"""
+
+    def timer(self, stage):
+        return _NULL_TIMER
+
+    def add(self, stage, seconds, count=1):
+        pass
+
+    def count(self, name, n=1):
+        pass
+
+    def set(self, name, value):
+        pass
+
+    def timed_iter(self, iterable, stage):
+        return iterable
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+NULL_METRICS = NullMetrics()
+
+
+def _size(n):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if n < 1024 or unit == 'GB':
+            return f'{n:.0f} {unit}' if unit == 'B' else f'{n:.1f} {unit}'
+        n /= 1024
+
+
+def run_profiled(func, path):
+    """在 cProfile 下运行 func()，主线程与期间启动的工作线程的统计合并写入 path
+
+    用 python -m pstats path 查看。返回 func 的返回值。
+    Python 3.12 起 cProfile 基于 sys.monitoring，同一时间只能有一个，且本身就统计所有线程，
+    只用主线程的一个；更早的版本每个线程各用一个，结束后合并。
+    """
+    import cProfile
+    import pstats
+
+    main = cProfile.Profile()
+    if sys.version_info >= (3, 12):
+        main.enable()
+        try:
+            return func()
+        finally:
+            main.disable()
+            main.dump_stats(path)
+
+    profiles = []
+    lock = threading.Lock()
+
+    def start_thread_profile(frame, event, arg):
+        # 新线程第一次调用时换成该线程自己的 cProfile
+        sys.setprofile(None)
+        profile = cProfile.Profile()
+        with lock:
+            profiles.append(profile)
+        profile.enable()
+
+    threading.setprofile(start_thread_profile)
+    main.enable()
+    try:
+        return func()
+    finally:
+        main.disable()
+        threading.setprofile(None)
+        stats = pstats.Stats(main)
+        with lock:
+            for profile in profiles:
+                try:
+                    stats.add(profile)
+                except TypeError:
+                    # 线程结束前没有记录到任何调用
+                    pass
+        stats.dump_stats(path)
@@ -0,0 +1,227 @@
+"""嵌套压缩包的成员解析
+
+外层压缩包中没有命中映射、但包含 .zip/.7z/.rar 成员时，逐层打开内层压缩包读取成员名。
+内层压缩包以流的方式从外层读取，不解压到磁盘；zip/rar 成员直接在解压流上读取目录，
+rar 的成员列表按块头读取（见 yaya.rarscan），只有还要打开其中的成员时才用 rarfile；
+7z 成员需要随机访问，整个读入内存。每个外层压缩包共享一份字节数与时间预算，
+超出预算时停止解析，已读到的结果照常返回，并标记为未解析完，缓存时不当作完整的结果。
+"""
+import io
+import time
+
+from yaya.detect import member_suffix, suffix_index, type_from_name
+from yaya.rarscan import RarFormatError, iter_rar_entries
+
+
+DEFAULT_NESTED_BYTES = 64 * 1024 * 1024
+DEFAULT_NESTED_TIMEOUT = 10.0
+
+# 扩展名摘要中内层成员的层级标记：每深一层加一个
+LEVEL_MARK = '>'
+
+
+class BudgetExceeded(Exception):
+    """超出嵌套解析的字节数或时间预算"""
+
+
+class NestedOptions:
+    """嵌套解析设置：depth 为最多打开的层数，max_bytes/timeout 为每个外层压缩包的预算"""
+
+    __slots__ = ('depth', 'max_bytes', 'timeout')
+
+    def __init__(self, depth=1, max_bytes=DEFAULT_NESTED_BYTES, timeout=DEFAULT_NESTED_TIMEOUT):
+        self.depth = depth
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+
+
+class Budget:
+    """剩余的字节数与截止时间；skipped 为因剩余预算不足而跳过的成员数"""
+
+    def __init__(self, max_bytes, timeout):
+        self.remaining = max_bytes
+        self.deadline = time.monotonic() + timeout
+        self.skipped = 0
+
+    def charge(self, n):
+        """记入读取（或解压跳过）的字节数，超出预算时抛出 BudgetExceeded"""
+        self.remaining -= n
+        if self.remaining < 0:
+            raise BudgetExceeded("超出字节预算")
+        if time.monotonic() > self.deadline:
+            raise BudgetExceeded("超出时间预算")
+
+
+class _BudgetReader(io.RawIOBase):
+    """按预算计量的只读流
+
+    外层的解压流中向前跳过同样需要解压，向后跳过要从头重新解压，都按解压的字节数计入预算。
+    """
+
+    def __init__(self, raw, budget):
+        super().__init__()
+        self._raw = raw
+        self._budget = budget
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return self._raw.seekable()
+
+    def tell(self):
+        return self._raw.tell()
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        before = self._raw.tell()
+        pos = self._raw.seek(offset, whence)
+        self._budget.charge(pos - before if pos >= before else pos)
+        return pos
+
+    def readinto(self, buffer):
+        data = self._raw.read(len(buffer))
+        n = len(data)
+        buffer[:n] = data
+        self._budget.charge(n)
+        return n
+
+    def close(self):
+        self._raw.close()
+        super().close()
+
+
+class _Archive:
+    """统一 zip/rar/7z 的成员列表、大小与打开方式"""
+
+    def __init__(self, source, kind):
+        self.kind = kind
+        self._source = source
+        # 压缩库按需导入
+        if kind == '.zip':
+            import zipfile
+            self._ref = zipfile.ZipFile(source)
+        elif kind == '.rar':
+            self._ref = None
+            try:
+                self._sizes = dict(iter_rar_entries(source))
+            except RarFormatError:
+                # 文件头加密等无法按块头读取的压缩包
+                self._open_rar()
+                self._sizes = {info.filename: info.file_size
+                               for info in self._ref.infolist() if not info.is_dir()}
+        else:
+            import py7zr
+            self._ref = py7zr.SevenZipFile(source, 'r')
+            self._sizes = {info.filename: info.uncompressed for info in self._ref.list()}
+
+    def _open_rar(self):
+        import rarfile
+        if not isinstance(self._source, str):
+            self._source.seek(0)
+        self._ref = rarfile.RarFile(self._source)
+
+    def names(self):
+        if self.kind == '.zip':
+            return self._ref.namelist()
+        return list(self._sizes)
+
+    def size(self, name):
+        if self.kind == '.zip':
+            return self._ref.getinfo(name).file_size
+        return self._sizes.get(name) or 0
+
+    def open(self, name, budget):
+        """打开成员，返回按预算计量的可随机读取流"""
+        if self.kind == '.rar' and self._ref is None:
+            self._open_rar()
+        if self.kind != '.7z':
+            return _BudgetReader(self._ref.open(name), budget)
+        # 7z 没有逐成员的流式接口，成员读入内存，大小已由调用方按预算检查
+        budget.charge(self.size(name))
+        self._ref.reset()
+        if hasattr(self._ref, 'read'):
+            data = self._ref.read([name])[name].read()
+        else:
+            from py7zr.io import BytesIOFactory
+            factory = BytesIOFactory(self.size(name) + 1)
+            self._ref.extract(targets=[name], factory=factory)
+            product = factory.get(name)
+            product.seek(0)
+            data = product.read()
+        return io.BytesIO(data)
+
+    def close(self):
+        if self._ref is not None:
+            self._ref.close()
+        # 内层压缩包的流由这里打开，压缩库不会替调用方关闭
+        if not isinstance(self._source, str):
+            self._source.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def is_nested_candidate(name):
+    """成员是否可能是内层压缩包"""
+    return type_from_name(name) is not None
+
+
+def inspect_nested(source, kind, candidates, ext_tag_map, options):
+    """外层没有命中时依次解析 candidates 中的内层压缩包
+
+    source 为外层压缩包的路径或文件对象。返回 (标签, 内层扩展名摘要, 是否因预算未解析完)，
+    超出预算或有成员因剩余预算不足被跳过时为 True；摘要中的扩展名带有 LEVEL_MARK 层级标记，
+    如 ">.max"。
+    """
+    budget = Budget(options.max_bytes, options.timeout)
+    index = suffix_index(ext_tag_map)
+    seen = {}
+    try:
+        with _Archive(source, kind) as archive:
+            tag = _walk(archive, candidates, index, seen, 1, options.depth, budget)
+    except BudgetExceeded:
+        return None, list(seen), True
+    return tag, list(seen), not tag and budget.skipped > 0
+
+
+def _walk(archive, candidates, index, seen, level, depth, budget):
+    for name in candidates:
+        # 单个成员已超出剩余预算时直接跳过，不做无用的解压
+        if archive.size(name) > budget.remaining:
+            budget.skipped += 1
+            continue
+        stream = None
+        try:
+            stream = archive.open(name, budget)
+            inner = _Archive(stream, type_from_name(name))
+        except Exception as e:
+            if stream is not None:
+                stream.close()
+            if isinstance(e, BudgetExceeded):
+                raise
+            # 损坏、加密或缺少解压工具的内层压缩包
+            continue
+
+        with inner:
+            deeper = []
+            for member in inner.names():
+                if level < depth and is_nested_candidate(member):
+                    deeper.append(member)
+                suffix = member_suffix(member)
+                if not suffix:
+                    continue
+                key = LEVEL_MARK * level + suffix
+                if key in seen:
+                    continue
+                seen[key] = None
+                tag = index.match(suffix)
+                if tag:
+                    return tag
+            if deeper:
+                tag = _walk(inner, deeper, index, seen, level + 1, depth, budget)
+                if tag:
+                    return tag
+    return None
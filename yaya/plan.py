@@ -0,0 +1,447 @@
+"""先规划后执行的批量重命名
+
+规划阶段收集所有 (目录, 原名, 新名)，检查重名冲突、目标已存在、链式与循环重命名；
+执行阶段按目录分组，每个目录只打开一次，依次调用不覆盖目标的重命名。
+计划按列存储（见 yaya.compact），几百万条的计划每条也只占一百字节左右。
+"""
+import itertools
+import os
+import threading
+from array import array
+from collections import defaultdict
+
+from yaya.compact import NameColumn, StringTable
+from yaya.fsops import DirectoryHandle
+
+
+TEMP_MARK = '.yaya-'
+
+
+def temp_name(name):
+    """循环重命名使用的临时名称"""
+    return f".{name}{TEMP_MARK}{os.getpid()}.tmp"
+
+
+def is_temp_name(name):
+    """是否为 temp_name 生成的临时名称"""
+    return name.startswith('.') and name.endswith('.tmp') and TEMP_MARK in name
+
+
+def apply_moves(directory, moves, log=None, message='已重命名: {old} -> {new}', journal=None):
+    """在单个目录内按顺序执行 [(原名, 新名, 显示名)]，返回 ApplyResult
+
+    moves 可以是生成器（如 RenamePlan.moves），逐步读取。
+    显示名为 None 的是中间步骤，不计数也不输出日志；每次成功的重命名都写入 journal。
+    重命名已经发生，写入 journal 出错时只记日志，不影响计数与后续重命名。
+    """
+    result = ApplyResult()
+    moves = iter(moves)
+    first = next(moves, None)
+    if first is None:
+        return result
+    moves = itertools.chain([first], moves)
+    try:
+        handle = DirectoryHandle(directory)
+    except OSError as e:
+        result.errors += sum(1 for _, _, display in moves if display is not None)
+        if log:
+            log(f"无法打开目录 {directory}: {str(e)}")
+        return result
+
+    with handle:
+        for old, new, display in moves:
+            try:
+                handle.rename(old, new)
+            except FileExistsError:
+                result.skipped += 1
+                if log:
+                    log(f"跳过 {display or old}: 目标文件 {new} 已存在")
+                continue
+            except OSError as e:
+                result.errors += 1
+                if log:
+                    log(f"处理文件 {display or old} 时出错: {str(e)}")
+                continue
+            if journal is not None:
+                try:
+                    journal.record(directory, old, new)
+                except Exception as e:
+                    if log:
+                        log(f"写入撤销记录时出错，部分重命名将无法撤销: {str(e)}")
+            if display is None:
+                continue
+            result.renamed += 1
+            if log:
+                log(message.format(old=display, new=new))
+    return result
+
+
+class PlannedRename:
+    """一条计划中的重命名
+
+    source 为标签来源（engine.SOURCE_FILENAME/SOURCE_CONTENT，与标签无关的重命名为 None）；
+    group 为分卷所在组用于识别的那一卷的路径，整组只能一起执行，不是分卷时为 None。
+    RenamePlan 按列存储条目，读取时才生成 PlannedRename；index 为条目在计划中的下标。
+    """
+
+    __slots__ = ('directory', 'old', 'new', 'exists', 'conflict', 'source', 'group', 'index')
+
+    def __init__(self, directory, old, new, exists=False, source=None, group=None,
+                 conflict=None, index=None):
+        self.directory = directory
+        self.old = old
+        self.new = new
+        self.exists = exists
+        self.conflict = conflict
+        self.source = source
+        self.group = group
+        self.index = index
+
+    @property
+    def path(self):
+        return os.path.join(self.directory, self.old)
+
+
+class ApplyResult:
+    """执行阶段的统计"""
+
+    def __init__(self):
+        self.renamed = 0
+        self.errors = 0
+        self.skipped = 0
+
+
+# 条目标志
+EXISTS = 0x01
+
+# resolve 中的冲突类型
+DUPLICATE = 1
+BLOCKED = 2
+
+# 执行步骤：原名->新名，原名->临时名，临时名->新名（循环重命名）
+STEP_MOVE = 0
+STEP_TO_TEMP = 1
+STEP_FROM_TEMP = 2
+
+
+class PlanEntries:
+    """RenamePlan 的条目，可按下标读取与迭代，每次读取生成新的 PlannedRename"""
+
+    __slots__ = ('_plan',)
+
+    def __init__(self, plan):
+        self._plan = plan
+
+    def __len__(self):
+        return self._plan._count
+
+    def __getitem__(self, index):
+        count = self._plan._count
+        if index < 0:
+            index += count
+        if not 0 <= index < count:
+            raise IndexError(index)
+        return self._plan.entry(index)
+
+    def __iter__(self):
+        plan = self._plan
+        for i in range(plan._count):
+            yield plan.entry(i)
+
+
+class RenamePlan:
+    """重命名计划，可在多个工作线程中并发添加条目
+
+    条目只在末尾追加，其他线程（如预览界面）可以在规划进行中通过 entries 按下标读取已加入的条目。
+    operation 与 message 为执行时使用的操作名与日志格式，预览后再执行时沿用。
+    条目按列存储：目录、标签来源与分卷组只存编号，原名与新名存入同一个 NameColumn，
+    冲突说明只为有冲突的条目保存；每条的内存预算见 yaya.compact。
+    """
+
+    def __init__(self, operation='rename', message='已重命名: {old} -> {new}'):
+        self.operation = operation
+        self.message = message
+        self.entries = PlanEntries(self)
+        self._directories = StringTable()
+        self._sources = StringTable([None])
+        self._groups = StringTable([None])
+        self._dirs = array('I')
+        # 每条两个名称：原名、新名
+        self._names = NameColumn()
+        self._flags = bytearray()
+        self._source_ids = bytearray()
+        self._group_ids = array('I')
+        self._conflicts = {}
+        self._count = 0
+        self._lock = threading.Lock()
+        # resolve 之后为 {目录编号: 该目录在 _order 中的 (起, 止)}，只含有可执行条目的目录
+        self._resolved = None
+        self._order = array('I')
+        self._steps = bytearray()
+
+    def __len__(self):
+        return self._count
+
+    def add(self, path, new_name, check_exists=True, source=None, group=None):
+        """加入一条重命名；新旧名称相同时忽略，返回是否加入"""
+        directory, old = os.path.split(path)
+        if old == new_name:
+            return False
+        exists = check_exists and os.path.lexists(os.path.join(directory, new_name))
+        with self._lock:
+            self._dirs.append(self._directories.intern(directory))
+            self._names.append(old)
+            self._names.append(new_name)
+            self._flags.append(EXISTS if exists else 0)
+            self._source_ids.append(self._sources.intern(source))
+            self._group_ids.append(self._groups.intern(group))
+            # 各列都写完后才计数，其他线程只读取已计数的条目
+            self._count += 1
+            self._resolved = None
+        return True
+
+    def entry(self, index):
+        """第 index 条"""
+        return PlannedRename(self._directories.values[self._dirs[index]],
+                             self._names[2 * index], self._names[2 * index + 1],
+                             bool(self._flags[index] & EXISTS),
+                             self._sources.values[self._source_ids[index]],
+                             self._groups.values[self._group_ids[index]],
+                             self._conflicts.get(index), index)
+
+    # 按列读取单个字段，不生成 PlannedRename（如预览表格排序与过滤时逐行读取）
+
+    def old(self, index):
+        return self._names[2 * index]
+
+    def new(self, index):
+        return self._names[2 * index + 1]
+
+    def directory(self, index):
+        return self._directories.values[self._dirs[index]]
+
+    def exists(self, index):
+        return bool(self._flags[index] & EXISTS)
+
+    def source(self, index):
+        return self._sources.values[self._source_ids[index]]
+
+    def conflict(self, index):
+        """resolve 得到的冲突说明，没有冲突或尚未 resolve 时为 None"""
+        return self._conflicts.get(index)
+
+    def names(self, start=0, stop=None, new=False):
+        """第 start 到 stop（不含）条的原名（new 为 True 时为新名）列表，用于整表排序与过滤"""
+        stop = self._count if stop is None else min(stop, self._count)
+        if start >= stop:
+            return []
+        offset = 1 if new else 0
+        return self._names.decode(2 * start + offset, 2 * stop, 2)
+
+    def subset(self, entries):
+        """由 entries 组成的新计划；分卷只选中了一部分时同组的其他分卷一并加入
+
+        目标是否已存在重新检查，预览之后目录中的变化也会被发现。
+        """
+        chosen = {entry.index for entry in entries}
+        groups = {self._groups.id(entry.group) for entry in entries if entry.group is not None}
+        groups.discard(None)
+        plan = RenamePlan(self.operation, self.message)
+        group_ids = self._group_ids
+        for i in range(self._count):
+            if i in chosen or group_ids[i] in groups:
+                entry = self.entry(i)
+                plan.add(entry.path, entry.new, source=entry.source, group=entry.group)
+        return plan
+
+    def resolve(self):
+        """检查冲突并计算执行顺序，返回有冲突的条目
+
+        - 多个文件的新名称相同：全部跳过
+        - 新名称已被计划外的文件占用：跳过
+        - 链式重命名（A->B, B->C）：先移走 B 再移入
+        - 循环重命名（A->B, B->A）：先把其中一个移到临时名称
+
+        直接在列上计算，不为条目生成对象；执行顺序存为 _order（条目下标）与 _steps（步骤类型）
+        两列，各目录占其中连续的一段，执行时按列逐步生成 (原名, 新名, 显示名)。
+        """
+        by_directory = defaultdict(lambda: array('I'))
+        dirs = self._dirs
+        for i in range(self._count):
+            by_directory[dirs[i]].append(i)
+
+        self._conflicts = {}
+        self._order = array('I')
+        self._steps = bytearray()
+        conflicts = []
+        resolved = {}
+        for directory, indices in by_directory.items():
+            start = len(self._order)
+            conflicts.extend(self._resolve_directory(indices))
+            if len(self._order) > start:
+                resolved[directory] = (start, len(self._order))
+        self._resolved = resolved
+        return [self.entry(i) for i in conflicts]
+
+    def _name_keys(self, indices, offset, bits):
+        """indices 中各条原名（offset 为 1 时为新名）的排序键：名称哈希的低位左移 bits 位，
+        低 bits 位为条目在 indices 中的位置；按键排序后哈希相同的条目相邻"""
+        raw = self._names.raw
+        mask = (1 << (64 - bits)) - 1
+        return array('Q', sorted((hash(raw(2 * i + offset)) & mask) << bits | p
+                                 for p, i in enumerate(indices)))
+
+    @staticmethod
+    def _runs(keys, bits):
+        """逐个产出排序键中哈希相同的一段 (起, 止)"""
+        start = 0
+        m = len(keys)
+        for k in range(1, m + 1):
+            if k == m or keys[k] >> bits != keys[start] >> bits:
+                yield start, k
+                start = k
+
+    def _resolve_directory(self, indices):
+        """计算单个目录内的执行顺序，追加到 _order/_steps，返回有冲突的条目下标
+
+        名称按 UTF-8 字节的哈希排序后比较，哈希相同时再比较字节；
+        除排序时的临时列表外，每条只占几个数组元素。
+        """
+        m = len(indices)
+        raw = self._names.raw
+        flags = self._flags
+        bits = max(1, m.bit_length())
+        low = (1 << bits) - 1
+        # 0 为可执行，其余为冲突
+        state = bytearray(m)
+
+        # 1. 新名称重复
+        new_keys = self._name_keys(indices, 1, bits)
+        for start, stop in self._runs(new_keys, bits):
+            if stop - start > 1:
+                self._mark_duplicates(indices, [key & low for key in new_keys[start:stop]],
+                                      state)
+
+        # 每条的新名称是本目录中哪一条的原名（-1 表示不是）：按哈希合并两组排序键，
+        # 哈希相同的再比较名称；原名在目录中唯一
+        old_keys = self._name_keys(indices, 0, bits)
+        succ = array('i', [-1]) * m
+        old_runs = self._runs(old_keys, bits)
+        old_start, old_stop = next(old_runs, (m, m))
+        for start, stop in self._runs(new_keys, bits):
+            h = new_keys[start] >> bits
+            while old_start < m and old_keys[old_start] >> bits < h:
+                old_start, old_stop = next(old_runs, (m, m))
+            if old_start == m or old_keys[old_start] >> bits != h:
+                continue
+            for new_key in new_keys[start:stop]:
+                p = new_key & low
+                name = raw(2 * indices[p] + 1)
+                for old_key in old_keys[old_start:old_stop]:
+                    if raw(2 * indices[old_key & low]) == name:
+                        succ[p] = old_key & low
+                        break
+        del new_keys, old_keys
+
+        # 反向：哪一条可执行的重命名以本条的原名为新名称
+        pred = array('i', [-1]) * m
+        for p in range(m):
+            if not state[p] and succ[p] >= 0:
+                pred[succ[p]] = p
+
+        # 2. 目标已存在，且不会在本次计划中被移走；
+        #    跳过的文件保留原名，链上指向它的重命名也随之冲突
+        stack = [p for p in range(m) if not state[p] and flags[indices[p]] & EXISTS
+                 and (succ[p] < 0 or state[succ[p]])]
+        while stack:
+            p = stack.pop()
+            if state[p]:
+                continue
+            state[p] = BLOCKED
+            self._conflicts[indices[p]] = f"目标文件 {self.new(indices[p])} 已存在"
+            q = pred[p]
+            if q >= 0 and not state[q]:
+                stack.append(q)
+
+        # 3. 排序：每条链从链尾开始执行；剩下的都在环中
+        order = self._order
+        steps = self._steps
+        visited = bytearray(m)
+        for p in range(m):
+            if state[p] or (pred[p] >= 0 and not state[pred[p]]):
+                continue
+            start = len(order)
+            q = p
+            while q >= 0 and not state[q]:
+                visited[q] = 1
+                order.append(indices[q])
+                q = succ[q]
+            chain = order[start:]
+            chain.reverse()
+            order[start:] = chain
+            steps.extend(bytes(len(chain)))
+
+        for p in range(m):
+            if state[p] or visited[p]:
+                continue
+            # c0->临时名，倒序执行 c[k-1]->c0 ... c1->c2，最后 临时名->c1
+            order.append(indices[p])
+            steps.append(STEP_TO_TEMP)
+            start = len(order)
+            visited[p] = 1
+            q = succ[p]
+            while not visited[q]:
+                visited[q] = 1
+                order.append(indices[q])
+                q = succ[q]
+            cycle = order[start:]
+            cycle.reverse()
+            order[start:] = cycle
+            steps.extend(bytes(len(cycle)))
+            order.append(indices[p])
+            steps.append(STEP_FROM_TEMP)
+        return [indices[p] for p in range(m) if state[p]]
+
+    def _mark_duplicates(self, indices, positions, state):
+        """哈希相同的一组条目中，新名称确实相同的标记为冲突"""
+        raw = self._names.raw
+        groups = defaultdict(list)
+        for p in positions:
+            groups[raw(2 * indices[p] + 1)].append(p)
+        for name, group in groups.items():
+            if len(group) < 2:
+                continue
+            target = name.decode('utf-8', 'surrogatepass')
+            for p in group:
+                state[p] = DUPLICATE
+                self._conflicts[indices[p]] = f"与其他 {len(group) - 1} 个文件的新文件名 {target} 重复"
+
+    def moves(self, start, stop):
+        """逐步生成 _order 第 start 到 stop（不含）步的 (原名, 新名, 显示名)，显示名为 None 表示中间步骤"""
+        order = self._order
+        steps = self._steps
+        for k in range(start, stop):
+            i = order[k]
+            old = self.old(i)
+            step = steps[k]
+            if step == STEP_MOVE:
+                yield old, self.new(i), old
+            elif step == STEP_TO_TEMP:
+                yield old, temp_name(old), None
+            else:
+                yield temp_name(old), self.new(i), old
+
+    def directories(self):
+        """已解析计划中涉及的目录"""
+        if self._resolved is None:
+            self.resolve()
+        return [self._directories.values[directory] for directory in self._resolved]
+
+    def apply_directory(self, directory, log=None, message='已重命名: {old} -> {new}',
+                        journal=None):
+        """执行单个目录内的计划，返回 ApplyResult"""
+        if self._resolved is None:
+            self.resolve()
+        steps = self._resolved.get(self._directories.id(directory))
+        moves = self.moves(*steps) if steps is not None else ()
+        return apply_moves(directory, moves, log, message, journal)
@@ -0,0 +1,128 @@
+"""7z/rar 成员解析的进程池后端
+
+py7zr 解压 LZMA 头部时持有 GIL，多线程几乎没有加速效果；
+这类压缩包交给子进程解析，zip 的目录读取很轻量，仍留在线程中。
+
+压缩包按批交给子进程，结果也按批传回：子进程有空闲时立即提交已排队的请求，
+全部忙碌时请求继续排队，等某一批完成后把排队的请求合成下一批，每批最多 BATCH_SIZE 个。
+同一批中相同的映射表只序列化一次，大量小压缩包时进程间通信的次数也随之减少。
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from yaya.engine import inspect_members
+
+
+# 交给进程池解析的压缩包类型
+PROCESS_TYPES = ('.rar', '.7z')
+# 每批最多的压缩包数
+BATCH_SIZE = 32
+
+
+def _mp_context():
+    """子进程启动方式
+
+    子进程在工作线程运行时才按需创建，fork 会复制其他线程持有的锁（如导入锁）导致子进程死锁，
+    因此优先使用 forkserver，其次 spawn。
+    """
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+def _inspect_batch(requests):
+    """子进程中逐个解析一批压缩包，返回 [(是否成功, 结果或异常)]"""
+    results = []
+    for args in requests:
+        try:
+            results.append((True, inspect_members(*args)))
+        except Exception as e:
+            results.append((False, e))
+    return results
+
+
+def default_processes():
+    """默认进程数：CPU 核数"""
+    return os.cpu_count() or 1
+
+
+class ProcessInspector:
+    """把指定类型压缩包的成员解析放到子进程中执行
+
+    子进程只返回 (标签, 扩展名摘要, 摘要是否完整, 嵌套层数)，建立成员索引时另有成员列表；
+    出错时异常随结果一并传回，日志、缓存与索引写入都在主进程中完成。
+    inspect 可在多个工作线程中并发调用，请求按批提交（见模块说明）。
+    """
+
+    def __init__(self, processes=None, types=PROCESS_TYPES, batch_size=BATCH_SIZE):
+        self.processes = max(1, processes or default_processes())
+        self.types = tuple(types)
+        self.batch_size = max(1, batch_size)
+        self.batches = 0
+        self._executor = ProcessPoolExecutor(max_workers=self.processes,
+                                             mp_context=_mp_context())
+        self._pending = []
+        self._running = 0
+        self._lock = threading.Lock()
+
+    def handles(self, kind):
+        """该类型（文件头识别出的 '.zip'/'.rar'/'.7z'）是否交给进程池解析"""
+        return kind in self.types
+
+    def inspect(self, path, ext_tag_map, kind=None, parts=None, nested=None, members=False):
+        """在子进程中执行 engine.inspect_members，阻塞等待结果"""
+        future = Future()
+        with self._lock:
+            self._pending.append(((path, ext_tag_map, kind, parts, nested, None, members),
+                                  future))
+            batch = self._take_locked() if self._running < self.processes else None
+        if batch:
+            self._submit(batch)
+        return future.result()
+
+    def _take_locked(self):
+        """取出下一批排队的请求并计入运行中的批数，调用方持有锁"""
+        batch = self._pending[:self.batch_size]
+        del self._pending[:self.batch_size]
+        if batch:
+            self._running += 1
+            self.batches += 1
+        return batch
+
+    def _submit(self, batch):
+        try:
+            done = self._executor.submit(_inspect_batch, [args for args, _ in batch])
+        except Exception as e:
+            self._finish(batch, None, e)
+            return
+        done.add_done_callback(lambda done: self._finish(batch, done))
+
+    def _finish(self, batch, done, error=None):
+        """把一批的结果交给各自的请求，再提交排队的下一批"""
+        if error is None:
+            error = done.exception()
+        if error is not None:
+            for _, future in batch:
+                future.set_exception(error)
+        else:
+            for (ok, value), (_, future) in zip(done.result(), batch):
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+        with self._lock:
+            self._running -= 1
+            batch = self._take_locked()
+        if batch:
+            self._submit(batch)
+
+    def close(self):
+        """关闭进程池"""
+        self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,312 @@
+"""轻量 RAR 块头读取
+
+按 RAR4（RAR 1.5-4.x）与 RAR5 的块头格式逐个读取文件头，跳过压缩数据，不依赖 rarfile 与 UnRAR；
+调用方可以在命中目标扩展名后立即停止，大压缩包通常只读取开头的几个块头。
+固实压缩只影响数据，块头照常可读。分卷压缩包从第一卷开始，按卷标志依次打开后续分卷
+（x.part2.rar 或 x.r00），跨卷的文件只报告一次。
+
+以下情况抛出 RarFormatError，由调用方改用 rarfile：
+- 加密了文件头（-hp）的压缩包，没有密码无法读出文件名；
+- 自解压程序（签名不在文件开头）与 RAR 1.4 等更早的格式；
+- 块头校验失败、数据不完整或缺少后续分卷。
+"""
+import io
+import os
+import re
+import struct
+import zlib
+
+
+class RarFormatError(Exception):
+    """无法按块头读取，应改用 rarfile"""
+
+
+RAR4_SIG = b'Rar!\x1a\x07\x00'
+RAR5_SIG = b'Rar!\x1a\x07\x01\x00'
+
+# RAR4 块头：CRC16、类型、标志、块头长度
+RAR4_BLOCK = struct.Struct('<HBHH')
+RAR4_MAIN = 0x73
+RAR4_FILE = 0x74
+RAR4_ENDARC = 0x7b
+RAR4_LONG_BLOCK = 0x8000
+RAR4_MAIN_VOLUME = 0x0001
+RAR4_MAIN_NEWNUMBERING = 0x0010
+RAR4_MAIN_PASSWORD = 0x0080
+RAR4_FILE_SPLIT_BEFORE = 0x0001
+RAR4_FILE_DIRECTORY = 0x00e0
+RAR4_FILE_LARGE = 0x0100
+RAR4_FILE_UNICODE = 0x0200
+RAR4_FILE_VERSION = 0x0800
+RAR4_ENDARC_NEXT_VOLUME = 0x0001
+# 文件头固定部分：压缩后大小、原大小、系统、CRC、时间、版本、方法、文件名长度、属性
+RAR4_FILE_STRUCT = struct.Struct('<LLBLLBBHL')
+
+# RAR5 块类型与标志
+RAR5_MAIN = 1
+RAR5_FILE = 2
+RAR5_ENCRYPTION = 4
+RAR5_END = 5
+RAR5_HAS_EXTRA = 0x0001
+RAR5_HAS_DATA = 0x0002
+RAR5_SPLIT_BEFORE = 0x0008
+RAR5_MAIN_VOLUME = 0x0001
+RAR5_FILE_DIRECTORY = 0x0001
+RAR5_FILE_MTIME = 0x0002
+RAR5_FILE_CRC = 0x0004
+RAR5_FILE_UNKNOWN_SIZE = 0x0008
+RAR5_END_NEXT_VOLUME = 0x0001
+# 文件头附加区中的版本记录，带此记录的是同名文件的旧版本
+RAR5_EXTRA_VERSION = 4
+# CRC32 加上最长 3 字节的块头长度
+RAR5_PREFIX = 7
+
+_DIGITS = re.compile(r'(\d+)(\D*)$')
+
+
+def iter_rar_entries(source):
+    """逐个产出 RAR 成员的 (成员名, 未压缩大小)，不含目录
+
+    source 为路径或可随机读取的二进制文件对象（如按字节切分的分卷拼接流）；
+    为路径且是分卷的第一卷时依次读取后续分卷。生成器提前关闭时立即关闭打开的文件。
+    """
+    if not isinstance(source, (str, os.PathLike)):
+        yield from _iter_volume(source)
+        return
+    path = os.fspath(source)
+    while True:
+        with open(path, 'rb') as f:
+            more, new_numbering = yield from _iter_volume(f)
+        if not more:
+            return
+        path = next_volume(path, new_numbering)
+        if not os.path.exists(path):
+            raise RarFormatError(f'缺少分卷 {os.path.basename(path)}')
+
+
+def iter_rar_names(source):
+    """逐个产出 RAR 成员名，见 iter_rar_entries"""
+    for name, _ in iter_rar_entries(source):
+        yield name
+
+
+def next_volume(path, new_numbering=True):
+    """下一卷的路径：新式命名 x.part1.rar -> x.part2.rar，旧式命名 x.rar -> x.r00 -> x.r01"""
+    directory, name = os.path.split(path)
+    if new_numbering:
+        m = _DIGITS.search(name)
+        if m is None:
+            raise RarFormatError(f'无法推算 {name} 的下一卷')
+        digits = m.group(1)
+        name = f'{name[:m.start()]}{int(digits) + 1:0{len(digits)}d}{m.group(2)}'
+    else:
+        stem, ext = os.path.splitext(name)
+        if len(ext) == 4 and ext[2:].isdigit():
+            number = int(ext[2:]) + 1
+            # .r99 之后为 .s00
+            ext = ext[:2] + f'{number:02d}' if number < 100 else '.' + chr(ord(ext[1]) + 1) + '00'
+        else:
+            ext = ext[:2] + '00'
+        name = stem + ext
+    return os.path.join(directory, name)
+
+
+def _iter_volume(f):
+    """读取一卷，逐个产出本卷开始的文件；返回 (是否还有下一卷, 是否为新式分卷命名)"""
+    signature = f.read(len(RAR5_SIG))
+    if signature == RAR5_SIG:
+        return (yield from _iter_rar5(f))
+    if signature.startswith(RAR4_SIG):
+        f.seek(len(RAR4_SIG) - len(signature), io.SEEK_CUR)
+        return (yield from _iter_rar4(f))
+    raise RarFormatError('不是 RAR 文件，或签名不在文件开头')
+
+
+def _iter_rar4(f):
+    volume = new_numbering = False
+    more = None
+    while True:
+        head = f.read(RAR4_BLOCK.size)
+        if len(head) < RAR4_BLOCK.size:
+            break
+        crc, kind, flags, size = RAR4_BLOCK.unpack(head)
+        if size < RAR4_BLOCK.size:
+            raise RarFormatError('块头损坏')
+        body = f.read(size - RAR4_BLOCK.size)
+        if len(body) < size - RAR4_BLOCK.size:
+            raise RarFormatError('块头不完整')
+        data_size = struct.unpack_from('<L', body)[0] if flags & RAR4_LONG_BLOCK else 0
+
+        if kind == RAR4_MAIN:
+            if flags & RAR4_MAIN_PASSWORD:
+                raise RarFormatError('文件头已加密')
+            volume = bool(flags & RAR4_MAIN_VOLUME)
+            new_numbering = bool(flags & RAR4_MAIN_NEWNUMBERING)
+        elif kind == RAR4_FILE:
+            if zlib.crc32(head[2:] + body) & 0xFFFF != crc:
+                raise RarFormatError('文件头校验失败')
+            if len(body) < RAR4_FILE_STRUCT.size:
+                raise RarFormatError('文件头不完整')
+            packed, size, _, _, _, _, _, name_size, _ = RAR4_FILE_STRUCT.unpack_from(body)
+            pos = RAR4_FILE_STRUCT.size
+            if flags & RAR4_FILE_LARGE:
+                high_packed, high_size = struct.unpack_from('<LL', body, pos)
+                packed |= high_packed << 32
+                size |= high_size << 32
+                pos += 8
+            data_size = packed
+            is_dir = flags & RAR4_FILE_DIRECTORY == RAR4_FILE_DIRECTORY
+            # 跨卷文件只报告第一段，同名文件的旧版本（-ver）不报告
+            if not is_dir and not flags & (RAR4_FILE_SPLIT_BEFORE | RAR4_FILE_VERSION):
+                yield _rar4_name(body[pos:pos + name_size], flags), size
+        elif kind == RAR4_ENDARC:
+            more = bool(flags & RAR4_ENDARC_NEXT_VOLUME)
+            break
+        f.seek(data_size, io.SEEK_CUR)
+    # 很早的版本没有结束块，按主块头的分卷标志判断
+    return (volume if more is None else more), new_numbering
+
+
+def _rar4_name(raw, flags):
+    if flags & RAR4_FILE_UNICODE:
+        nul = raw.find(b'\0')
+        if nul < 0:
+            name = raw.decode('utf-8', 'replace')
+        else:
+            name = _decode_rar3_unicode(raw[:nul], raw[nul + 1:])
+    else:
+        name = _decode_legacy(raw)
+    return name.replace('\\', '/').rstrip('/')
+
+
+def _decode_legacy(raw):
+    """没有 Unicode 标志的文件名按系统代码页保存，中文系统上一般为 GBK"""
+    for encoding in ('utf-8', 'gbk'):
+        try:
+            return raw.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return raw.decode('latin-1')
+
+
+def _decode_rar3_unicode(std, enc):
+    """RAR 3.x 压缩保存的 UTF-16 文件名：按标志位从 std（代码页文件名）与 enc 中取出各字符"""
+    out = bytearray()
+    try:
+        high = enc[0]
+        pos = 1
+        flags = bits = 0
+        while pos < len(enc):
+            if bits == 0:
+                flags = enc[pos]
+                pos += 1
+                bits = 8
+            bits -= 2
+            mode = (flags >> bits) & 3
+            if mode == 0:
+                out += bytes((enc[pos], 0))
+                pos += 1
+            elif mode == 1:
+                out += bytes((enc[pos], high))
+                pos += 1
+            elif mode == 2:
+                out += bytes((enc[pos], enc[pos + 1]))
+                pos += 2
+            else:
+                length = enc[pos]
+                pos += 1
+                if length & 0x80:
+                    correction = enc[pos]
+                    pos += 1
+                    for _ in range((length & 0x7f) + 2):
+                        out += bytes(((std[len(out) // 2] + correction) & 0xFF, high))
+                else:
+                    for _ in range(length + 2):
+                        out += bytes((std[len(out) // 2], 0))
+    except IndexError:
+        # 编码数据不完整，退回代码页文件名
+        return _decode_legacy(std)
+    return out.decode('utf-16le', 'replace')
+
+
+def _vint(buf, pos):
+    """RAR5 变长整数，返回 (值, 下一个位置)"""
+    value = shift = 0
+    while True:
+        if pos >= len(buf) or shift > 63:
+            raise RarFormatError('块头损坏')
+        byte = buf[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+
+
+def _has_version(extra):
+    """RAR5 文件头附加区中是否有版本记录"""
+    pos = 0
+    while pos < len(extra):
+        size, start = _vint(extra, pos)
+        kind, _ = _vint(extra, start)
+        if kind == RAR5_EXTRA_VERSION:
+            return True
+        pos = start + size
+    return False
+
+
+def _iter_rar5(f):
+    volume = False
+    more = None
+    while True:
+        prefix = f.read(RAR5_PREFIX)
+        if len(prefix) < 5:
+            break
+        size, start = _vint(prefix, 4)
+        end = start + size
+        if end <= len(prefix):
+            # 块头比预读的部分还短，退回多读的字节
+            f.seek(end - len(prefix), io.SEEK_CUR)
+            block = prefix[:end]
+        else:
+            block = prefix + f.read(end - len(prefix))
+            if len(block) < end:
+                raise RarFormatError('块头不完整')
+        if zlib.crc32(block[4:]) != struct.unpack_from('<L', block)[0]:
+            raise RarFormatError('块头校验失败')
+
+        kind, pos = _vint(block, start)
+        flags, pos = _vint(block, pos)
+        extra_size = 0
+        if flags & RAR5_HAS_EXTRA:
+            extra_size, pos = _vint(block, pos)
+        data_size = 0
+        if flags & RAR5_HAS_DATA:
+            data_size, pos = _vint(block, pos)
+
+        if kind == RAR5_MAIN:
+            archive_flags, pos = _vint(block, pos)
+            volume = bool(archive_flags & RAR5_MAIN_VOLUME)
+        elif kind == RAR5_ENCRYPTION:
+            raise RarFormatError('文件头已加密')
+        elif kind == RAR5_FILE:
+            file_flags, pos = _vint(block, pos)
+            size, pos = _vint(block, pos)
+            _, pos = _vint(block, pos)
+            if file_flags & RAR5_FILE_MTIME:
+                pos += 4
+            if file_flags & RAR5_FILE_CRC:
+                pos += 4
+            _, pos = _vint(block, pos)
+            _, pos = _vint(block, pos)
+            name_size, pos = _vint(block, pos)
+            if (not file_flags & RAR5_FILE_DIRECTORY and not flags & RAR5_SPLIT_BEFORE
+                    and not _has_version(block[len(block) - extra_size:])):
+                name = block[pos:pos + name_size].decode('utf-8', 'replace').rstrip('/')
+                yield name, 0 if file_flags & RAR5_FILE_UNKNOWN_SIZE else size
+        elif kind == RAR5_END:
+            end_flags, pos = _vint(block, pos)
+            more = bool(end_flags & RAR5_END_NEXT_VOLUME)
+            break
+        f.seek(data_size, io.SEEK_CUR)
+    return (volume if more is None else more), True
@@ -0,0 +1,84 @@
+"""基于 os.scandir 的流式目录扫描"""
+import os
+from fnmatch import fnmatch
+
+
+def _matches(name, patterns):
+    """文件名是否匹配任意一个通配符"""
+    return any(fnmatch(name, pattern) for pattern in patterns)
+
+
+def accepts_file(name, accept=None, include=None, exclude=None):
+    """单个文件名是否通过筛选，规则与 iter_archives 相同（不检查所在目录）"""
+    if exclude and _matches(name, exclude):
+        return False
+    if accept is not None and not accept(name):
+        return False
+    return not include or _matches(name, include)
+
+
+def _scan_dir(directory, accept, include, exclude, subdirs):
+    """扫描单个目录：产出匹配的文件路径，并把子目录追加到 subdirs"""
+    with os.scandir(directory) as it:
+        for entry in it:
+            name = entry.name
+            if exclude and _matches(name, exclude):
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                    continue
+                if not entry.is_file():
+                    continue
+            except OSError:
+                continue
+            if accept is not None and not accept(name):
+                continue
+            if include and not _matches(name, include):
+                continue
+            yield entry.path
+
+
+def iter_archives(root, exts, recursive=False, max_depth=None,
+                  include=None, exclude=None, snapshot=False):
+    """逐个产出 root 下扩展名属于 exts 的文件路径
+
+    exts 也可以是判断文件名的函数，为 None 时产出所有文件。
+    recursive 为 False 时只扫描 root 本身；max_depth 限制递归深度（0 表示只扫描 root）。
+    include/exclude 为通配符列表，exclude 同时作用于子目录。
+    snapshot 为 True 时每个目录的匹配结果先读完再产出，
+    避免边遍历边重命名导致同一文件被重复处理。
+    """
+    if exts is None or callable(exts):
+        accept = exts
+    else:
+        exts = tuple(exts)
+
+        def accept(name):
+            return name.lower().endswith(exts)
+
+    include = list(include or [])
+    exclude = list(exclude or [])
+    if not recursive:
+        max_depth = 0
+
+    # 用显式栈代替递归，深层目录也不会触及递归上限
+    stack = [(root, 0)]
+    while stack:
+        directory, depth = stack.pop()
+        subdirs = []
+        try:
+            paths = _scan_dir(directory, accept, include, exclude, subdirs)
+            if snapshot:
+                paths = list(paths)
+            yield from paths
+        except OSError:
+            # 根目录不可读时向上抛出，子目录不可读时跳过
+            if directory == root:
+                raise
+            continue
+        if max_depth is not None and depth >= max_depth:
+            continue
+        # 逆序入栈，使子目录按遍历顺序处理
+        for path in reversed(subdirs):
+            stack.append((path, depth + 1))
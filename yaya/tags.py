@@ -0,0 +1,166 @@
+"""文件名标签匹配
+
+配置的全部标签在运行开始时编译为前缀树形式的正则，同一位置只沿树向下比较，
+每个文件名只扫描一遍，匹配开销基本不随标签数量增长。
+
+标签规则可以是字符串，也可以是字典：
+    {"tag": "SU", "aliases": ["SketchUp"], "priority": 10, "case_sensitive": false, "word": true}
+
+- aliases        文件名中出现这些词时同样识别为该标签
+- priority       文件名包含多个标签时取优先级最高的，优先级相同时取最靠前的
+- case_sensitive 是否区分大小写，默认区分
+- word           是否整词匹配，默认是：前后不能紧挨英文字母或数字，
+                 例如 "SU" 不会匹配 "SUMMER"；中文与标签相连不受影响，如 "模型3D"
+"""
+import re
+
+
+class TagRule:
+    """一条标签规则"""
+
+    __slots__ = ('tag', 'aliases', 'priority', 'case_sensitive', 'word')
+
+    def __init__(self, tag, aliases=(), priority=0, case_sensitive=True, word=True):
+        if not tag:
+            raise ValueError("标签不能为空")
+        self.tag = tag
+        self.aliases = tuple(a for a in aliases if a)
+        self.priority = priority
+        self.case_sensitive = case_sensitive
+        self.word = word
+
+    @classmethod
+    def parse(cls, value):
+        """从字符串或字典创建规则"""
+        if isinstance(value, TagRule):
+            return value
+        if isinstance(value, str):
+            return cls(value.strip())
+        if isinstance(value, dict):
+            unknown = set(value) - {'tag', 'aliases', 'priority', 'case_sensitive', 'word'}
+            if unknown:
+                raise ValueError(f"标签规则包含未知字段: {', '.join(sorted(unknown))}")
+            return cls(str(value.get('tag', '')).strip(), value.get('aliases', ()),
+                       int(value.get('priority', 0)), bool(value.get('case_sensitive', True)),
+                       bool(value.get('word', True)))
+        raise ValueError(f"无效的标签规则: {value!r}")
+
+
+NOT_WORD_BEFORE = r'(?<![A-Za-z0-9])'
+NOT_WORD_AFTER = r'(?![A-Za-z0-9])'
+
+
+def _is_word_char(char):
+    return char.isascii() and char.isalnum()
+
+
+def _trie_pattern(terms, word):
+    """把一组词编译为前缀树形式的正则，同一位置优先匹配最长的词"""
+    trie = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[''] = True
+    return _node_pattern(trie, word, '')
+
+
+def _node_pattern(node, word, last):
+    branches = [re.escape(char) + _node_pattern(child, word, char)
+                for char, child in sorted(node.items()) if char]
+    if '' in node:
+        # 词在此结束；放在最后，能继续匹配更长的词时优先
+        branches.append(NOT_WORD_AFTER if word and _is_word_char(last) else '')
+    if len(branches) == 1:
+        return branches[0]
+    return '(?:' + '|'.join(branches) + ')'
+
+
+def _compile_terms(terms):
+    """编译 [(词, 规则)]，返回 (正则片段列表, 每个片段对应的 {词: 规则})
+
+    按大小写规则、整词规则和词首是否为字母数字分组，每组一棵前缀树；
+    忽略大小写的组以小写形式查找规则。
+    """
+    groups = {}
+    for term, rule in terms:
+        before = rule.word and _is_word_char(term[0])
+        key = (rule.case_sensitive, rule.word, before)
+        groups.setdefault(key, {})[term if rule.case_sensitive else term.lower()] = rule
+
+    patterns = []
+    lookups = []
+    for (case_sensitive, word, before), lookup in groups.items():
+        text = _trie_pattern(lookup, word)
+        if before:
+            text = NOT_WORD_BEFORE + text
+        if not case_sensitive:
+            text = f'(?i:{text})'
+        patterns.append(text)
+        lookups.append((case_sensitive, lookup))
+    return patterns, lookups
+
+
+class TagMatcher:
+    """编译后的标签匹配器，线程安全，可在多个工作线程中共享"""
+
+    def __init__(self, rules=()):
+        # 同名标签以后出现的规则为准，保持首次出现的顺序
+        by_tag = {}
+        for value in rules:
+            rule = TagRule.parse(value)
+            by_tag.pop(rule.tag, None)
+            by_tag[rule.tag] = rule
+        self.rules = list(by_tag.values())
+
+        # 每组前缀树为一个捕获分组，m.lastindex 定位到组，再按匹配文本查到规则
+        terms = [(term, rule) for rule in self.rules for term in (rule.tag,) + rule.aliases]
+        patterns, self._lookups = _compile_terms(terms)
+        self.pattern = None
+        if patterns:
+            self.pattern = re.compile('|'.join(f'({p})' for p in patterns))
+
+        # 清理已有标签只认标签本身，不认别名
+        self.prefix_pattern = None
+        if self.rules:
+            patterns, _ = _compile_terms([(rule.tag, rule) for rule in self.rules])
+            self.prefix_pattern = re.compile('^(?:' + '|'.join(patterns) + r')\s*')
+
+        self._top_priority = max((rule.priority for rule in self.rules), default=0)
+        self._single_priority = len({rule.priority for rule in self.rules}) <= 1
+
+    def __len__(self):
+        return len(self.rules)
+
+    @property
+    def tags(self):
+        """按配置顺序排列的标签名"""
+        return [rule.tag for rule in self.rules]
+
+    def _rule(self, m):
+        case_sensitive, lookup = self._lookups[m.lastindex - 1]
+        text = m.group()
+        return lookup[text if case_sensitive else text.lower()]
+
+    def match(self, filename):
+        """返回文件名中的标签，没有时返回 None"""
+        if self.pattern is None:
+            return None
+        if self._single_priority:
+            m = self.pattern.search(filename)
+            return self._rule(m).tag if m else None
+
+        best = None
+        for m in self.pattern.finditer(filename):
+            rule = self._rule(m)
+            if best is None or rule.priority > best.priority:
+                best = rule
+                if rule.priority == self._top_priority:
+                    break
+        return best.tag if best else None
+
+    def strip_prefix(self, name):
+        """去掉文件名开头已有的标签及其后的空白"""
+        if self.prefix_pattern is None:
+            return name
+        return self.prefix_pattern.sub('', name, count=1)
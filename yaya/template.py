@@ -0,0 +1,146 @@
+"""重命名模板
+
+模板在运行开始时编译一次，例如 "{tag} {prefix} {stem} {suffix}{ext}"，
+每个文件只计算一次新名称、只重命名一次。可用字段：
+
+- {tag}      识别出的标签
+- {prefix}   前缀文本
+- {suffix}   后缀文本
+- {stem}     不含扩展名的原文件名；模板包含 {tag} 时去掉开头已有的标签
+- {name}     完整的原文件名
+- {ext}      扩展名（含点，如 .zip）
+- {date}     运行日期，默认格式 %Y%m%d，可写作 {date:%Y-%m-%d}
+- {time}     运行时间，默认格式 %H%M%S
+- {datetime} 运行日期时间，默认格式 %Y%m%d_%H%M%S
+- {mtime}    文件修改日期，默认格式 %Y%m%d
+- {counter}  序号，按路径排序后从 counter_start 开始编号，可写作 {counter:03}
+
+值为空的字段会连同一侧的空格一起去掉，例如没有标签时 "{tag} {stem}{ext}" 得到 "a.zip"。
+
+文件多位于 Windows/SMB 共享上：模板文字、前缀、后缀、日期格式与标签中不能有 Windows 文件名
+不允许的字符（\\ / : * ? " < > | 与控制字符），编译或生成时报错；原文件名本身不检查。
+"""
+import os
+import string
+from datetime import datetime
+
+
+DEFAULT_TEMPLATE = '{tag} {prefix} {stem} {suffix}{ext}'
+
+DATE_FORMATS = {
+    'date': '%Y%m%d',
+    'time': '%H%M%S',
+    'datetime': '%Y%m%d_%H%M%S',
+    'mtime': '%Y%m%d',
+}
+
+FIELDS = {'tag', 'prefix', 'suffix', 'stem', 'name', 'ext', 'counter'} | set(DATE_FORMATS)
+
+# Windows 文件名中不允许的字符
+INVALID_CHARS = frozenset('\\/:*?"<>|') | frozenset(chr(i) for i in range(32))
+
+
+class TemplateError(ValueError):
+    """模板语法错误或包含未知字段"""
+
+
+def check_chars(text, what):
+    """text 含有文件名不允许的字符时抛出 TemplateError"""
+    bad = sorted(set(text) & INVALID_CHARS)
+    if bad:
+        chars = ' '.join(c if c.isprintable() else repr(c) for c in bad)
+        raise TemplateError(f"{what}包含文件名不允许的字符: {chars}")
+
+
+class RenameTemplate:
+    """编译后的重命名模板"""
+
+    def __init__(self, text, prefix='', suffix='', counter_start=1, now=None, tag_pattern=None):
+        self.text = text
+        self.prefix = prefix
+        self.suffix = suffix
+        self.counter_start = counter_start
+        self.tag_pattern = tag_pattern
+        now = now or datetime.now()
+
+        # 编译为 [(字面文本, 字段名, 格式)]；运行时间相关的字段此时就计算好
+        self.segments = []
+        try:
+            parsed = list(string.Formatter().parse(text))
+        except ValueError as e:
+            raise TemplateError(f"模板格式错误: {e}") from None
+        for literal, field, spec, conversion in parsed:
+            if field is not None and field not in FIELDS:
+                raise TemplateError(f"模板包含未知字段: {{{field}}}")
+            if conversion:
+                raise TemplateError(f"模板不支持转换标记: !{conversion}")
+            check_chars(literal, "模板")
+            if field in ('date', 'time', 'datetime'):
+                value = now.strftime(spec or DATE_FORMATS[field])
+                check_chars(value, f"{{{field}}} 的格式")
+                literal += value
+                field = None
+            elif field == 'mtime':
+                check_chars(now.strftime(spec or DATE_FORMATS[field]), "{mtime} 的格式")
+            elif field == 'counter':
+                try:
+                    value = format(counter_start, spec or '')
+                except ValueError as e:
+                    raise TemplateError(f"序号格式错误: {e}") from None
+                check_chars(value, "{counter} 的格式")
+            self.segments.append((literal, field, spec or ''))
+        check_chars(prefix, "前缀")
+        check_chars(suffix, "后缀")
+
+        fields = {field for _, field, _ in self.segments}
+        self.uses_tag = 'tag' in fields
+        self.uses_mtime = 'mtime' in fields
+        self.uses_counter = 'counter' in fields
+
+    def render(self, filename, tag=None, mtime=None, counter=None):
+        """计算新文件名"""
+        stem, ext = os.path.splitext(filename)
+        if tag:
+            check_chars(tag, f"标签 {tag} ")
+        if self.uses_tag and self.tag_pattern is not None:
+            stem = self.tag_pattern.sub('', stem)
+        values = {
+            'tag': tag or '',
+            'prefix': self.prefix,
+            'suffix': self.suffix,
+            'stem': stem,
+            'name': filename,
+            'ext': ext,
+        }
+
+        out = ''
+        drop_space = False
+        for i, (literal, field, spec) in enumerate(self.segments):
+            if drop_space:
+                literal = literal.lstrip(' ')
+            out += literal
+            drop_space = False
+            if field is None:
+                continue
+            if field == 'counter':
+                value = format(counter if counter is not None else self.counter_start, spec)
+            elif field == 'mtime':
+                value = datetime.fromtimestamp(mtime).strftime(spec or DATE_FORMATS['mtime']) if mtime else ''
+            else:
+                value = format(values[field], spec)
+            if value:
+                out += value
+                continue
+            # 空字段：两侧都是空格时去掉后面的空格，否则去掉前面的空格
+            next_literal = self.segments[i + 1][0] if i + 1 < len(self.segments) else ''
+            if next_literal.startswith(' ') and (not out or out.endswith(' ')):
+                drop_space = True
+            else:
+                out = out.rstrip(' ')
+
+        new_name = out.strip()
+        if not new_name or new_name in ('.', '..'):
+            raise TemplateError(f"模板对 {filename} 生成了空文件名")
+        if '/' in new_name or os.sep in new_name:
+            raise TemplateError(f"新文件名不能包含路径分隔符: {new_name}")
+        return new_name
@@ -0,0 +1,206 @@
+"""分卷压缩包的识别与分组
+
+支持的命名方式：
+- x.part1.rar, x.part2.rar ...   RAR 分卷，从第一卷即可读出全部成员
+- x.rar, x.r00, x.r01 ...        旧式 RAR 分卷
+- x.zip, x.z01, x.z02 ...        ZIP 分卷，中央目录在 x.zip 中
+- x.7z.001, x.7z.002 ...         按字节切分的分卷（x.zip.001、x.rar.001 同理），按顺序拼接后读取
+
+同一组分卷只解析一次，重命名时所有分卷按同一个新主名一起改名，分卷关系保持不变。
+"""
+import bisect
+import io
+import os
+import re
+
+
+_PART_RE = re.compile(r'^(?P<base>.+)\.part(?P<num>\d+)\.rar$', re.IGNORECASE)
+_SPLIT_RE = re.compile(r'^(?P<base>.+)\.(?P<ext>7z|zip|rar)\.(?P<num>\d{3})$', re.IGNORECASE)
+_OLD_RE = re.compile(r'^(?P<base>.+)\.(?P<ext>[rz])(?P<num>\d{2})$', re.IGNORECASE)
+
+# 旧式 ZIP 分卷的 x.zip 是最后一卷
+_LAST = 1 << 30
+
+
+def parse_volume(name):
+    """按文件名解析分卷，返回 (分卷方式, 主名, 序号, 规范扩展名)，不是分卷时返回 None"""
+    m = _PART_RE.match(name)
+    if m:
+        return 'part', m.group('base'), int(m.group('num')), '.rar'
+    m = _SPLIT_RE.match(name)
+    if m:
+        return 'split', m.group('base'), int(m.group('num')), '.' + m.group('ext').lower()
+    m = _OLD_RE.match(name)
+    if m:
+        if m.group('ext').lower() == 'r':
+            return 'rar-old', m.group('base'), int(m.group('num')), '.rar'
+        return 'zip-old', m.group('base'), int(m.group('num')), '.zip'
+    return None
+
+
+def is_volume_name(name):
+    """文件名是否为分卷的一部分（不含旧式分卷的 x.rar/x.zip）"""
+    return parse_volume(name) is not None
+
+
+def _old_head(name):
+    """x.rar/x.zip 作为旧式分卷首卷时的 (分卷方式, 主名, 序号, 规范扩展名)，其他文件返回 None
+
+    是否真的是分卷要看同一目录中有没有 x.r00/x.z01，由 group_volumes 在目录结束时判断。
+    """
+    base, ext = name[:-4], name[-4:].lower()
+    if ext == '.rar':
+        return 'rar-old', base, -1, ext
+    if ext == '.zip':
+        return 'zip-old', base, _LAST, ext
+    return None
+
+
+class VolumeSet:
+    """同一目录下的一组分卷"""
+
+    __slots__ = ('directory', 'family', 'ext', 'volumes')
+
+    def __init__(self, directory, family, ext, volumes):
+        self.directory = directory
+        self.family = family
+        self.ext = ext
+        # [(序号, 文件名, 主名)]，按序号排列
+        self.volumes = sorted(volumes)
+
+    def __len__(self):
+        return len(self.volumes)
+
+    @property
+    def head(self):
+        """解析成员时读取的分卷：旧式 ZIP 分卷为 x.zip，其余为第一卷"""
+        return self.volumes[-1] if self.family == 'zip-old' else self.volumes[0]
+
+    @property
+    def path(self):
+        return os.path.join(self.directory, self.head[1])
+
+    @property
+    def name(self):
+        """整组的名称（主名加规范扩展名），用于识别标签与生成新名称"""
+        return self.head[2] + self.ext
+
+    @property
+    def split(self):
+        """是否需要把各卷拼接后读取"""
+        return self.family == 'split'
+
+    def paths(self):
+        """按顺序排列的各卷路径"""
+        return [os.path.join(self.directory, name) for _, name, _ in self.volumes]
+
+    def renames(self, new_name):
+        """按整组的新名称计算每个分卷的 [(原路径, 新文件名)]"""
+        if new_name.lower().endswith(self.ext):
+            new_base = new_name[:-len(self.ext)]
+        else:
+            new_base = os.path.splitext(new_name)[0]
+        return [(os.path.join(self.directory, name), new_base + name[len(base):])
+                for _, name, base in self.volumes]
+
+
+def group_volumes(paths):
+    """把路径流中的分卷归组为 VolumeSet，其余路径原样产出
+
+    同一目录的路径是连续产出的：普通文件立即产出，分卷暂存到该目录结束时成组产出。
+    x.rar/x.zip 是否为旧式分卷的首卷要看同一目录中是否出现 x.r00/x.z01，
+    只与路径流中已有的文件名比较，不再逐个查询文件系统（网络共享上每次都是一次往返），
+    因此也暂存到目录结束；被筛选条件排除的分卷不会归入同一组。
+    """
+    pending = {}
+    heads = []
+    current = None
+    for path in paths:
+        directory, name = os.path.split(path)
+        if directory != current:
+            yield from _flush(current, pending, heads)
+            current = directory
+        info = parse_volume(name)
+        if info is None:
+            head = _old_head(name)
+            if head is None:
+                yield path
+            else:
+                heads.append((name, head))
+            continue
+        family, base, index, ext = info
+        pending.setdefault((family, base.lower(), ext), []).append((index, name, base))
+    yield from _flush(current, pending, heads)
+
+
+def _flush(directory, pending, heads):
+    for name, (family, base, index, ext) in heads:
+        volumes = pending.get((family, base.lower(), ext))
+        if volumes is None:
+            yield os.path.join(directory, name)
+        else:
+            volumes.append((index, name, base))
+    heads.clear()
+    for (family, _, ext), volumes in pending.items():
+        yield VolumeSet(directory, family, ext, volumes)
+    pending.clear()
+
+
+class _ConcatReader(io.RawIOBase):
+    """把多个文件当作一个连续的只读文件"""
+
+    def __init__(self, paths):
+        super().__init__()
+        self._paths = list(paths)
+        self._starts = []
+        total = 0
+        for path in self._paths:
+            self._starts.append(total)
+            total += os.path.getsize(path)
+        self._size = total
+        self._pos = 0
+        self._files = {}
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self._size
+        if offset < 0:
+            raise ValueError("negative seek position")
+        self._pos = offset
+        return offset
+
+    def readinto(self, buffer):
+        if self._pos >= self._size:
+            return 0
+        i = bisect.bisect_right(self._starts, self._pos) - 1
+        f = self._files.get(i)
+        if f is None:
+            f = self._files[i] = open(self._paths[i], 'rb')
+        end = self._starts[i + 1] if i + 1 < len(self._starts) else self._size
+        f.seek(self._pos - self._starts[i])
+        view = memoryview(buffer)[:min(len(buffer), end - self._pos)]
+        n = f.readinto(view)
+        self._pos += n
+        return n
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+        self._files.clear()
+        super().close()
+
+
+def open_volumes(paths):
+    """按顺序拼接各卷，返回可随机读取的文件对象"""
+    return io.BufferedReader(_ConcatReader(paths))
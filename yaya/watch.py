@@ -0,0 +1,357 @@
+"""监视模式：持续给新到达的压缩包添加标签
+
+本地目录用 inotify（通过 ctypes 调用，不需要额外依赖）接收文件写入与移入事件；
+网络挂载（NFS/SMB 等，inotify 收不到其他主机的修改）或不支持 inotify 的平台改为定时扫描，
+比较文件大小与修改时间找出新增或变化的文件。
+
+复制中的文件会持续变大：文件在 settle 秒内大小与修改时间都不再变化后才处理。
+同一组分卷中只要还有一卷在变化，整组都继续等待。
+处理使用引擎的 tag_paths，与 tag 命令的识别和重命名逻辑、映射配置完全相同。
+"""
+import errno
+import os
+import re
+import select
+import struct
+import time
+
+from yaya.scanner import accepts_file, iter_archives
+from yaya.volumes import parse_volume
+
+
+DEFAULT_SETTLE = 2.0
+DEFAULT_INTERVAL = 5.0
+
+# inotify 事件掩码（linux/inotify.h）
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE_SELF
+EVENT_STRUCT = struct.Struct('iIII')
+
+# 这些文件系统上 inotify 收不到其他主机的修改
+NETWORK_FS = ('nfs', 'nfs4', 'cifs', 'smb3', 'smbfs', 'ncpfs', 'afs', '9p',
+              'fuse.sshfs', 'fuse.rclone', 'davfs', 'glusterfs', 'ceph')
+
+
+def filesystem_type(path):
+    """path 所在挂载点的文件系统类型，无法判断时返回 None"""
+    try:
+        with open('/proc/self/mounts', 'r') as f:
+            mounts = [line.split() for line in f]
+    except OSError:
+        return None
+    path = os.path.realpath(path)
+    best, fstype = '', None
+    for fields in mounts:
+        if len(fields) < 3:
+            continue
+        # 挂载点中的空格等字符以八进制转义
+        point = re.sub(r'\\([0-7]{3})', lambda m: chr(int(m.group(1), 8)), fields[1])
+        inside = path == point or path.startswith(point.rstrip('/') + '/')
+        if inside and len(point) >= len(best):
+            best, fstype = point, fields[2]
+    return fstype
+
+
+def is_network_fs(path):
+    return filesystem_type(path) in NETWORK_FS
+
+
+class InotifyWatcher:
+    """用 inotify 监视目录（recursive 时包括新建的子目录）"""
+
+    def __init__(self, root, recursive=False, max_depth=None, exclude=None):
+        import ctypes
+        import ctypes.util
+        self._ctypes = ctypes
+        path = ctypes.util.find_library('c') or 'libc.so.6'
+        self._libc = ctypes.CDLL(path, use_errno=True)
+        self._libc.inotify_add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, f"inotify_init1 失败: {os.strerror(err)}")
+        self.root = root
+        self.max_depth = (max_depth if recursive else 0)
+        self.exclude = exclude
+        self._dirs = {}
+        self._add_tree(root, 0)
+
+    def _add(self, directory, depth):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            err = self._ctypes.get_errno()
+            if directory == self.root:
+                raise OSError(err, f"无法监视 {directory}: {os.strerror(err)}")
+            return
+        self._dirs[wd] = (directory, depth)
+
+    def _add_tree(self, directory, depth):
+        """监视 directory 及其下允许深度内的子目录"""
+        stack = [(directory, depth)]
+        while stack:
+            current, level = stack.pop()
+            self._add(current, level)
+            if self.max_depth is not None and level >= self.max_depth:
+                continue
+            try:
+                with os.scandir(current) as it:
+                    for entry in it:
+                        if not accepts_file(entry.name, exclude=self.exclude):
+                            continue
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append((entry.path, level + 1))
+            except OSError:
+                continue
+
+    def _scan_new_dir(self, directory, depth):
+        """新建或移入的子目录：加入监视，并报告其中已有的文件"""
+        if not accepts_file(os.path.basename(directory), exclude=self.exclude):
+            return []
+        if self.max_depth is not None and depth > self.max_depth:
+            return []
+        self._add_tree(directory, depth)
+        remaining = None if self.max_depth is None else self.max_depth - depth
+        try:
+            return list(iter_archives(directory, None, True, remaining, exclude=self.exclude))
+        except OSError:
+            return []
+
+    def changes(self, timeout):
+        """等待最多 timeout 秒，返回有变化的文件路径；队列溢出时返回 None，调用方应全量扫描"""
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except OSError as e:
+            if e.errno == errno.EAGAIN:
+                return []
+            raise
+        paths = []
+        overflow = False
+        pos = 0
+        while pos + EVENT_STRUCT.size <= len(data):
+            wd, mask, _, length = EVENT_STRUCT.unpack_from(data, pos)
+            pos += EVENT_STRUCT.size
+            name = os.fsdecode(data[pos:pos + length].rstrip(b'\0'))
+            pos += length
+            if mask & IN_Q_OVERFLOW:
+                overflow = True
+                continue
+            if mask & IN_IGNORED:
+                self._dirs.pop(wd, None)
+                continue
+            watched = self._dirs.get(wd)
+            if watched is None or not name:
+                continue
+            directory, depth = watched
+            path = os.path.join(directory, name)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    paths.extend(self._scan_new_dir(path, depth + 1))
+                continue
+            paths.append(path)
+        return None if overflow else paths
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+class PollingWatcher:
+    """定时扫描目录，按文件大小与修改时间找出新增或变化的文件"""
+
+    def __init__(self, root, recursive=False, max_depth=None, exclude=None, interval=None):
+        self.root = root
+        self.recursive = recursive
+        self.max_depth = max_depth
+        self.exclude = exclude
+        self.interval = DEFAULT_INTERVAL if interval is None else interval
+        self._next = 0.0
+        self._stamps = self._snapshot()
+
+    def _snapshot(self):
+        stamps = {}
+        for path in iter_archives(self.root, None, self.recursive, self.max_depth,
+                                  exclude=self.exclude):
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            stamps[path] = (st.st_size, st.st_mtime_ns)
+        self._next = time.monotonic() + self.interval
+        return stamps
+
+    def changes(self, timeout):
+        """到扫描时间时返回新增或变化的文件路径，否则等待最多 timeout 秒后返回空列表"""
+        wait = self._next - time.monotonic()
+        if wait > 0:
+            time.sleep(min(wait, timeout))
+            return []
+        stamps = self._snapshot()
+        changed = [path for path, stamp in stamps.items() if self._stamps.get(path) != stamp]
+        self._stamps = stamps
+        return changed
+
+    def close(self):
+        pass
+
+
+def _stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+def volume_key(path):
+    """分卷所属的组（目录, 分卷方式, 主名, 扩展名），不是分卷时返回 None"""
+    directory, name = os.path.split(path)
+    info = parse_volume(name)
+    if info is None:
+        lower = name.lower()
+        if not lower.endswith(('.rar', '.zip')):
+            return None
+        # x.rar/x.zip 与 x.r00/x.z01 同组；没有后续分卷时按普通文件处理
+        family = 'rar-old' if lower.endswith('.rar') else 'zip-old'
+        return directory, family, name[:-4].lower(), lower[-4:]
+    family, base, _, ext = info
+    return directory, family, base.lower(), ext
+
+
+class Debouncer:
+    """记录待处理的文件，大小与修改时间在 settle 秒内不再变化后才交出"""
+
+    def __init__(self, settle=DEFAULT_SETTLE):
+        self.settle = settle
+        # {路径: (大小与修改时间, 最近一次变化的时间)}
+        self.pending = {}
+
+    def __len__(self):
+        return len(self.pending)
+
+    def touch(self, path, now=None):
+        now = time.monotonic() if now is None else now
+        self.pending[path] = (_stamp(path), now)
+
+    def ready(self, now=None):
+        """返回已稳定的文件；同组分卷中仍有变化中的文件时整组继续等待"""
+        now = time.monotonic() if now is None else now
+        settled = []
+        busy_groups = set()
+        for path, (stamp, since) in list(self.pending.items()):
+            current = _stamp(path)
+            if current is None:
+                # 已被删除或移走
+                del self.pending[path]
+                continue
+            if current != stamp:
+                self.pending[path] = (current, now)
+                since = now
+            if now - since >= self.settle:
+                settled.append(path)
+            else:
+                key = volume_key(path)
+                if key is not None:
+                    busy_groups.add(key)
+
+        ready = [path for path in settled if volume_key(path) not in busy_groups]
+        for path in ready:
+            del self.pending[path]
+        return ready
+
+
+def with_volume_siblings(paths):
+    """把分卷补全为目录中同组的所有分卷，保证整组一起识别、一起改名"""
+    keys = {}
+    for path in paths:
+        key = volume_key(path)
+        if key is not None:
+            keys.setdefault(key[0], set()).add(key)
+    result = set(paths)
+    for directory, group in keys.items():
+        try:
+            names = os.listdir(directory)
+        except OSError:
+            continue
+        for name in names:
+            path = os.path.join(directory, name)
+            if volume_key(path) in group:
+                result.add(path)
+    return sorted(result)
+
+
+def watch(runner, directory, settle=DEFAULT_SETTLE, interval=DEFAULT_INTERVAL, poll=None,
+          scan_existing=False):
+    """监视 directory，给新到达或有变化的压缩包添加标签，直到 runner.control 被取消
+
+    runner 为 RenameEngine，其扫描选项（递归、深度、include/exclude、detect）同样作用于监视。
+    poll 为 None 时自动选择：网络挂载或 inotify 不可用时定时扫描，否则用 inotify。
+    scan_existing 为 True 时先按 tag 处理目录中已有的文件。返回累计的 RunStats。
+    """
+    directory = os.path.abspath(directory)
+    control = runner.control
+    log = runner.log
+
+    if scan_existing:
+        runner.tag(directory)
+
+    watcher = None
+    if poll is None:
+        poll = is_network_fs(directory)
+        if poll:
+            log(f"{directory} 位于网络文件系统（{filesystem_type(directory)}），"
+                f"改为每 {interval:g} 秒扫描一次")
+    if not poll:
+        try:
+            watcher = InotifyWatcher(directory, runner.recursive, runner.max_depth, runner.exclude)
+        except (OSError, AttributeError) as e:
+            log(f"inotify 不可用，改为每 {interval:g} 秒扫描一次: {e}")
+    if watcher is None:
+        watcher = PollingWatcher(directory, runner.recursive, runner.max_depth, runner.exclude,
+                                 interval)
+
+    from yaya.engine import RunStats
+    total = RunStats()
+    debouncer = Debouncer(settle)
+    # 自己重命名产生的移入事件不再处理；有冲突或重命名失败的文件没有事件，不计入
+    own = set()
+    tick = max(0.1, min(1.0, settle / 2))
+    log(f"正在监视 {directory}（按 Ctrl+C 停止）")
+    try:
+        while control.wait():
+            changes = watcher.changes(tick)
+            if changes is None:
+                log("事件队列溢出，重新扫描目录")
+                changes = list(iter_archives(directory, None, runner.recursive,
+                                             runner.max_depth, exclude=runner.exclude))
+            now = time.monotonic()
+            for path in changes:
+                if path in own:
+                    own.discard(path)
+                    continue
+                debouncer.touch(path, now)
+
+            ready = debouncer.ready()
+            if not ready:
+                continue
+            stats, renamed = runner.tag_paths(with_volume_siblings(ready))
+            total.merge(stats)
+            own.update(renamed)
+    finally:
+        watcher.close()
+    log("已停止监视")
+    return total
@@ -0,0 +1,127 @@
+"""轻量 ZIP 中央目录读取
+
+只映射文件并逐条解析中央目录记录，不创建 ZipInfo 对象；
+调用方可以在命中目标扩展名后立即停止，大压缩包只会读取目录尾部的少量数据。
+"""
+import mmap
+import struct
+
+
+class ZipFormatError(Exception):
+    """不是有效的 ZIP 文件或目录已损坏"""
+
+
+# 中央目录结束记录（EOCD）
+EOCD_SIG = b'PK\x05\x06'
+EOCD_STRUCT = struct.Struct('<4s4H2LH')
+# ZIP64 结束记录定位器与 ZIP64 结束记录
+ZIP64_LOCATOR_SIG = b'PK\x06\x07'
+ZIP64_LOCATOR_STRUCT = struct.Struct('<4sLQL')
+ZIP64_EOCD_SIG = b'PK\x06\x06'
+ZIP64_EOCD_STRUCT = struct.Struct('<4sQ2H2L4Q')
+# 中央目录文件头
+CENTRAL_SIG = b'PK\x01\x02'
+CENTRAL_STRUCT = struct.Struct('<4s6H3L5HLL')
+
+# EOCD 之后最多跟 65535 字节的注释
+MAX_EOCD_SEARCH = EOCD_STRUCT.size + 0xFFFF
+FLAG_UTF8 = 0x800
+ZIP64_EXTRA_ID = 0x0001
+
+
+def _find_eocd(mm):
+    """中央目录结束记录的偏移
+
+    注释中也可能出现结束记录的标志，从后向前找注释长度恰好到文件末尾的一个；
+    都不符合时（如末尾有多余数据）取最后一个完整的记录。
+    """
+    size = len(mm)
+    lower = max(0, size - MAX_EOCD_SEARCH)
+    end = size
+    found = -1
+    while True:
+        eocd = mm.rfind(EOCD_SIG, lower, end)
+        if eocd < 0:
+            break
+        end = eocd + len(EOCD_SIG) - 1
+        if eocd + EOCD_STRUCT.size > size:
+            continue
+        comment_len = EOCD_STRUCT.unpack_from(mm, eocd)[-1]
+        if eocd + EOCD_STRUCT.size + comment_len == size:
+            return eocd
+        if found < 0:
+            found = eocd
+    if found < 0:
+        raise ZipFormatError('找不到 ZIP 中央目录结束记录')
+    return found
+
+
+def _find_central_directory(mm):
+    """定位中央目录，返回 (起始偏移, 条目数)"""
+    eocd = _find_eocd(mm)
+    (_, _, _, _, entries, cd_size, cd_offset,
+     _) = EOCD_STRUCT.unpack_from(mm, eocd)
+
+    locator = eocd - ZIP64_LOCATOR_STRUCT.size
+    if (locator >= 0 and mm[locator:locator + 4] == ZIP64_LOCATOR_SIG
+            and (entries == 0xFFFF or cd_size == 0xFFFFFFFF or cd_offset == 0xFFFFFFFF)):
+        _, _, zip64_eocd, _ = ZIP64_LOCATOR_STRUCT.unpack_from(mm, locator)
+        # ZIP64 结束记录紧挨在定位器之前，以此计算前置数据（如自解压程序）的偏移
+        zip64_pos = locator - ZIP64_EOCD_STRUCT.size
+        if zip64_pos < 0 or mm[zip64_pos:zip64_pos + 4] != ZIP64_EOCD_SIG:
+            raise ZipFormatError('ZIP64 结束记录损坏')
+        (_, _, _, _, _, _, _, entries, cd_size,
+         cd_offset) = ZIP64_EOCD_STRUCT.unpack_from(mm, zip64_pos)
+        concat = zip64_pos - zip64_eocd
+        start = zip64_pos - cd_size
+    else:
+        start = eocd - cd_size
+        concat = start - cd_offset
+
+    if start < 0 or concat < 0:
+        raise ZipFormatError('ZIP 中央目录偏移无效')
+    return start, entries
+
+
+def iter_zip_names(path):
+    """逐个产出 ZIP 成员名；生成器提前关闭时立即释放文件映射"""
+    for name, _ in iter_zip_entries(path):
+        yield name
+
+
+def _zip64_size(extra, size):
+    """未压缩大小为 0xFFFFFFFF 时从 ZIP64 扩展字段中读出实际大小"""
+    pos = 0
+    while pos + 4 <= len(extra):
+        header_id, length = struct.unpack_from('<2H', extra, pos)
+        if header_id == ZIP64_EXTRA_ID and length >= 8 and pos + 12 <= len(extra):
+            return struct.unpack_from('<Q', extra, pos + 4)[0]
+        pos += 4 + length
+    return size
+
+
+def iter_zip_entries(path):
+    """逐个产出 ZIP 成员的 (成员名, 未压缩大小)；生成器提前关闭时立即释放文件映射"""
+    with open(path, 'rb') as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            raise ZipFormatError('空文件不是有效的 ZIP 文件') from None
+        with mm:
+            pos, entries = _find_central_directory(mm)
+            end = len(mm)
+            for _ in range(entries):
+                if pos + CENTRAL_STRUCT.size > end or mm[pos:pos + 4] != CENTRAL_SIG:
+                    raise ZipFormatError('ZIP 中央目录记录损坏')
+                header = CENTRAL_STRUCT.unpack_from(mm, pos)
+                flags, size = header[3], header[9]
+                name_len, extra_len, comment_len = header[10], header[11], header[12]
+                name_start = pos + CENTRAL_STRUCT.size
+                raw_name = mm[name_start:name_start + name_len]
+                if size == 0xFFFFFFFF:
+                    extra_start = name_start + name_len
+                    size = _zip64_size(mm[extra_start:extra_start + extra_len], size)
+                # 与 zipfile 一致：未设置 UTF-8 标志时按 cp437 解码
+                yield (raw_name.decode('utf-8' if flags & FLAG_UTF8 else 'cp437',
+                                       errors='replace'), size)
+                pos = name_start + name_len + extra_len + comment_len